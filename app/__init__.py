@@ -1,16 +1,19 @@
 from flask import Flask, g, render_template
 from flask_login import LoginManager
-from flask_mysqldb import MySQL
 from flask_wtf.csrf import CSRFProtect
 import secrets
 import os
 from dotenv import load_dotenv
+from app.db import PooledMySQL
+from app.query_cache import QueryCache
+from app.sql_stats import instrumented_cursor_class, register_sql_stats
 
 # 加载环境变量
 load_dotenv()
 
 # 全局变量
-mysql = MySQL()
+mysql = PooledMySQL()
+query_cache = QueryCache()
 login_manager = LoginManager()
 csrf = CSRFProtect()
 
@@ -25,14 +28,42 @@ def create_app():
     app.config['MYSQL_USER'] = os.environ.get('MYSQL_USER', 'root')
     app.config['MYSQL_PASSWORD'] = os.environ.get('MYSQL_PASSWORD', '')
     app.config['MYSQL_DB'] = os.environ.get('MYSQL_DB', 'restaurant_db')
-    app.config['MYSQL_CURSORCLASS'] = 'DictCursor'
+    # 带统计的 DictCursor：记录每个请求的查询次数、耗时和慢查询（见 app/sql_stats.py）
+    app.config['MYSQL_CURSORCLASS'] = instrumented_cursor_class('DictCursor')
+    app.config['SQL_SLOW_QUERY_MS'] = float(os.environ.get('SQL_SLOW_QUERY_MS', 100))
+    app.config['SERVER_TIMING'] = os.environ.get('SERVER_TIMING', '1').lower() in ('1', 'true', 'yes')
+    app.config['SQL_CAPTURE_FILE'] = os.environ.get('SQL_CAPTURE_FILE')  # 记录执行过的语句，供 plan-check 使用
+    
+    # 连接池配置
+    app.config['MYSQL_POOL_MIN_SIZE'] = int(os.environ.get('MYSQL_POOL_MIN_SIZE', 2))
+    app.config['MYSQL_POOL_MAX_SIZE'] = int(os.environ.get('MYSQL_POOL_MAX_SIZE', 10))
+    app.config['MYSQL_POOL_IDLE_TIMEOUT'] = int(os.environ.get('MYSQL_POOL_IDLE_TIMEOUT', 300))  # 秒
+    app.config['MYSQL_POOL_WAIT_TIMEOUT'] = int(os.environ.get('MYSQL_POOL_WAIT_TIMEOUT', 5))  # 秒
+    
+    # 列表分页大小
+    app.config['PAGE_SIZE'] = int(os.environ.get('PAGE_SIZE', 20))
     
     # 文件上传配置
     app.config['UPLOAD_FOLDER'] = os.path.join(app.root_path, 'static', 'uploads')
+    # 上传的原图在处理完成前暂存在静态目录之外，不对外提供
+    app.config['UPLOAD_STAGING_FOLDER'] = os.environ.get('UPLOAD_STAGING_FOLDER', os.path.join(app.instance_path, 'staging'))
     app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB
     
+    # 只读查询结果缓存（分类、商家列表等）
+    app.config['QUERY_CACHE_MAX_BYTES'] = int(os.environ.get('QUERY_CACHE_MAX_BYTES', 8 * 1024 * 1024))
+    app.config['QUERY_CACHE_TTL'] = int(os.environ.get('QUERY_CACHE_TTL', 300))  # 秒
+    
+    # 按需性能剖析：管理员请求带 X-Profile: 1，或按比例抽样；最先注册，覆盖其他钩子的耗时
+    app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+    app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+    app.config['PROFILE_KEEP'] = int(os.environ.get('PROFILE_KEEP', 50))
+    from app.profiler import register_profiler
+    register_profiler(app)
+    
     # 初始化扩展
     mysql.init_app(app)
+    query_cache.init_app(app)
+    register_sql_stats(app)
     login_manager.init_app(app)
     csrf.init_app(app)
     
@@ -45,25 +76,39 @@ def create_app():
     @login_manager.user_loader
     def load_user(user_id):
         from app.models.user import User
-        return User.get(user_id)
+        return User.load(user_id)
+    
+    # 响应式图片模板过滤器
+    from app.images import register_template_helpers
+    register_template_helpers(app)
+    
+    # 静态文件地址指纹与缓存响应头
+    from app.static_cache import register_static_caching
+    register_static_caching(app)
+    
+    # 与用户无关的页面外壳（个人状态由 /api/user_state 填充）
+    app.config['SHELL_MAX_AGE'] = int(os.environ.get('SHELL_MAX_AGE', 60))  # 秒
+    from app.shell import register_shell_helpers
+    register_shell_helpers(app)
+    
+    # 匿名页面的整页缓存：memory（进程内）、file（本机多进程共享）或 none
+    app.config['PAGE_CACHE_BACKEND'] = os.environ.get('PAGE_CACHE_BACKEND', 'memory')
+    app.config['PAGE_CACHE_DIR'] = os.environ.get('PAGE_CACHE_DIR', os.path.join(app.instance_path, 'page_cache'))
+    app.config['PAGE_CACHE_TTL'] = int(os.environ.get('PAGE_CACHE_TTL', 300))  # 秒
+    app.config['PAGE_CACHE_MAXSIZE'] = int(os.environ.get('PAGE_CACHE_MAXSIZE', 512))
+    
+    # Prometheus 指标（/metrics），设置 METRICS_TOKEN 时抓取需要带 Bearer 令牌，未设置时只允许本机（或调试模式）访问
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+    from app.metrics import register_metrics
+    register_metrics(app)
     
     # 添加全局上下文处理器
     @app.context_processor
     def inject_categories():
         """为所有模板提供分类数据"""
         try:
-            from app import mysql
-            cur = mysql.connection.cursor()
-            cur.execute("""
-                SELECT category_id, category_name 
-                FROM restaurantcategories 
-                WHERE is_active = 1 
-                ORDER BY category_name 
-                LIMIT 10
-            """)
-            nav_categories = cur.fetchall()
-            cur.close()
-            return {'nav_categories': nav_categories}
+            from app.categories import get_nav_categories
+            return {'nav_categories': get_nav_categories()}
         except:
             return {'nav_categories': []}
     # 注册蓝图
@@ -151,6 +196,29 @@ def create_app():
         except:
             return '<h1>403 - 访问被拒绝</h1>', 403
     
+    # 命令行命令
+    from app.commands import register_commands
+    register_commands(app)
+    
+    # 启动时自动执行未执行的迁移（默认关闭，也可以部署时手动执行 flask migrate）
+    app.config['AUTO_MIGRATE'] = os.environ.get('AUTO_MIGRATE', '').lower() in ('1', 'true', 'yes')
+    if app.config['AUTO_MIGRATE']:
+        from app.migrations import bootstrap
+        bootstrap(app)
+    
+    # 聚合数据定期对账（秒，0 表示关闭，建议用定时任务执行 flask reconcile-aggregates）
+    app.config['AGGREGATE_RECONCILE_INTERVAL'] = int(os.environ.get('AGGREGATE_RECONCILE_INTERVAL', 0))
+    if app.config['AGGREGATE_RECONCILE_INTERVAL'] > 0:
+        from app.aggregates import start_reconciler
+        start_reconciler(app, app.config['AGGREGATE_RECONCILE_INTERVAL'])
+    
+    # 后台任务工作线程（图片处理等），0 表示不在 Web 进程中执行，改用 flask run-jobs
+    app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 2))
+    app.config['JOB_POLL_INTERVAL'] = float(os.environ.get('JOB_POLL_INTERVAL', 1.0))  # 秒
+    if app.config['JOB_WORKERS'] > 0:
+        from app.jobs import ensure_workers
+        app.before_request(lambda: ensure_workers(app))
+    
     # 创建上传目录
     upload_dir = os.path.join(app.root_path, 'static', 'uploads')
     if not os.path.exists(upload_dir):
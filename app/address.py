@@ -0,0 +1,55 @@
+import re
+from collections import namedtuple
+
+# 结构化地址：省 / 市 / 区县，无法识别的部分为 None
+Address = namedtuple('Address', ['province', 'city', 'district'])
+
+# 直辖市：省和市相同
+MUNICIPALITIES = ('北京', '上海', '天津', '重庆')
+
+_PROVINCE = re.compile(r'^(.{2,10}?(?:省|自治区|特别行政区))')
+_CITY = re.compile(r'^(.{2,10}?(?:自治州|地区|盟|市))')
+_DISTRICT = re.compile(r'^(.{1,10}?(?:区|县|旗|市))')
+
+
+def parse_address(address):
+    """把中文地址解析为 (省, 市, 区县)
+
+    只识别地址开头按“省 → 市 → 区县”顺序书写的部分，例如：
+        广东省广州市越秀区北京路123号 -> ('广东省', '广州市', '越秀区')
+        北京市海淀区中关村大街1号     -> ('北京市', '北京市', '海淀区')
+    """
+    rest = (address or '').strip()
+    province = city = district = None
+
+    for name in MUNICIPALITIES:
+        if rest.startswith(name):
+            province = city = name + '市'
+            rest = rest[len(name):]
+            if rest.startswith('市'):
+                rest = rest[1:]
+            break
+    else:
+        match = _PROVINCE.match(rest)
+        if match:
+            province = match.group(1)
+            rest = rest[match.end():]
+        match = _CITY.match(rest)
+        if match:
+            city = match.group(1)
+            rest = rest[match.end():]
+
+    if city:
+        match = _DISTRICT.match(rest)
+        if match:
+            district = match.group(1)
+
+    return Address(province, city, district)
+
+
+def normalize_city(name):
+    """把用户输入的城市名规范为库中存储的形式，如“北京” -> “北京市”"""
+    name = (name or '').strip()
+    if not name:
+        return name
+    return parse_address(name).city or parse_address(name + '市').city or name
@@ -0,0 +1,98 @@
+import threading
+import time
+
+from app import mysql
+
+# 聚合列由触发器增量维护（见 app/sql/triggers.sql），这里负责定期对账：
+# 找出与子表实际统计不一致的行，并在同一条 UPDATE 中按子表重新计算，避免覆盖并发写入。
+
+_RESTAURANT_DRIFT_SQL = """
+    SELECT r.rest_id,
+           r.rating_sum, COALESCE(rv.total, 0) as actual_rating_sum,
+           r.review_count, COALESCE(rv.cnt, 0) as actual_review_count,
+           r.star_count, COALESCE(f.cnt, 0) as actual_star_count
+    FROM Restaurants r
+    LEFT JOIN (
+        SELECT rest_id, SUM(rating) as total, COUNT(*) as cnt
+        FROM Reviews
+        GROUP BY rest_id
+    ) rv ON rv.rest_id = r.rest_id
+    LEFT JOIN (
+        SELECT rest_id, COUNT(*) as cnt
+        FROM Favourites
+        GROUP BY rest_id
+    ) f ON f.rest_id = r.rest_id
+    WHERE NOT (r.rating_sum <=> COALESCE(rv.total, 0))
+       OR NOT (r.review_count <=> COALESCE(rv.cnt, 0))
+       OR NOT (r.star_count <=> COALESCE(f.cnt, 0))
+"""
+
+_DISH_DRIFT_SQL = """
+    SELECT d.dish_id, d.rest_id,
+           d.rec_count, COALESCE(rec.cnt, 0) as actual_rec_count
+    FROM Dishes d
+    LEFT JOIN (
+        SELECT dish_id, COUNT(*) as cnt
+        FROM Recommendations
+        GROUP BY dish_id
+    ) rec ON rec.dish_id = d.dish_id
+    WHERE NOT (d.rec_count <=> COALESCE(rec.cnt, 0))
+"""
+
+_REPAIR_RESTAURANT_SQL = """
+    UPDATE Restaurants r
+    SET rating_sum = (SELECT COALESCE(SUM(rating), 0) FROM Reviews WHERE rest_id = r.rest_id),
+        review_count = (SELECT COUNT(*) FROM Reviews WHERE rest_id = r.rest_id),
+        star_count = (SELECT COUNT(*) FROM Favourites WHERE rest_id = r.rest_id),
+        rating = IF(review_count > 0, ROUND(rating_sum / review_count, 4), 0)
+    WHERE r.rest_id = %s
+"""
+
+_REPAIR_DISH_SQL = """
+    UPDATE Dishes d
+    SET rec_count = (SELECT COUNT(*) FROM Recommendations WHERE dish_id = d.dish_id)
+    WHERE d.dish_id = %s
+"""
+
+
+def reconcile(repair=True):
+    """检查聚合列偏差，repair 为 True 时逐行修复；返回偏差明细"""
+    cur = mysql.connection.cursor()
+    try:
+        cur.execute(_RESTAURANT_DRIFT_SQL)
+        restaurant_drift = list(cur.fetchall())
+        cur.execute(_DISH_DRIFT_SQL)
+        dish_drift = list(cur.fetchall())
+
+        if repair and (restaurant_drift or dish_drift):
+            for row in restaurant_drift:
+                cur.execute(_REPAIR_RESTAURANT_SQL, (row['rest_id'],))
+            for row in dish_drift:
+                cur.execute(_REPAIR_DISH_SQL, (row['dish_id'],))
+            mysql.connection.commit()
+
+        return {'restaurants': restaurant_drift, 'dishes': dish_drift}
+    except Exception:
+        mysql.connection.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def start_reconciler(app, interval):
+    """后台线程每隔 interval 秒对账一次（多进程部署建议改用定时任务执行 CLI 命令）"""
+    def run():
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                try:
+                    drift = reconcile(repair=True)
+                    if drift['restaurants'] or drift['dishes']:
+                        app.logger.info('聚合对账修复: 餐厅 %s 行, 菜品 %s 行',
+                                        len(drift['restaurants']), len(drift['dishes']))
+                except Exception:
+                    app.logger.exception('聚合对账失败')
+
+    thread = threading.Thread(target=run, name='aggregate-reconciler', daemon=True)
+    thread.start()
+    return thread
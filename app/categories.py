@@ -0,0 +1,72 @@
+from app import mysql, query_cache
+from app.cache import TTLCache
+
+# 导航栏分类缓存，分类增删改时显式失效
+nav_categories_cache = TTLCache(ttl=600)
+
+
+def _load_nav_categories():
+    cur = mysql.connection.cursor()
+    try:
+        cur.execute("""
+            SELECT category_id, category_name
+            FROM restaurantcategories
+            WHERE is_active = 1
+            ORDER BY category_name
+            LIMIT 10
+        """)
+        return list(cur.fetchall())
+    finally:
+        cur.close()
+
+
+def _load_active_categories():
+    cur = mysql.connection.cursor()
+    try:
+        cur.execute("""
+            SELECT category_name, description
+            FROM RestaurantCategories
+            WHERE is_active = TRUE
+            ORDER BY category_name
+        """)
+        return list(cur.fetchall())
+    finally:
+        cur.close()
+
+
+def get_nav_categories():
+    """获取导航栏分类（带缓存）"""
+    return nav_categories_cache.get_or_load('nav', _load_nav_categories)
+
+
+def get_active_categories():
+    """获取所有活跃分类（带缓存），供餐厅表单的分类下拉框使用"""
+    return nav_categories_cache.get_or_load('active', _load_active_categories)
+
+
+def sync_categories():
+    """把餐厅表中出现过、但还没有登记的类型补充到分类表，返回新增的分类数"""
+    cur = mysql.connection.cursor()
+    try:
+        cur.execute("""
+            INSERT IGNORE INTO RestaurantCategories (category_name, description)
+            SELECT DISTINCT type, CONCAT(type, '类型餐厅')
+            FROM Restaurants
+            WHERE type IS NOT NULL AND type != ''
+        """)
+        added = cur.rowcount
+        mysql.connection.commit()
+    except Exception:
+        mysql.connection.rollback()
+        raise
+    finally:
+        cur.close()
+
+    invalidate_categories()
+    return added
+
+
+def invalidate_categories():
+    """分类数据变更后调用，使缓存失效"""
+    nav_categories_cache.invalidate()
+    query_cache.bump('restaurantcategories')
@@ -0,0 +1,54 @@
+from app import mysql
+from app.cache import TTLCache
+
+# 城市列表缓存，餐厅增删改时显式失效
+city_list_cache = TTLCache(ttl=600)
+
+
+def _load_cities():
+    cur = mysql.connection.cursor()
+    try:
+        cur.execute("""
+            SELECT DISTINCT city
+            FROM Restaurants
+            WHERE city IS NOT NULL
+            ORDER BY city
+        """)
+        return [row['city'] for row in cur.fetchall()]
+    finally:
+        cur.close()
+
+
+def get_cities():
+    """获取有餐厅的城市列表（带缓存）"""
+    return city_list_cache.get_or_load('cities', _load_cities)
+
+
+def invalidate_cities():
+    """餐厅地址变更或餐厅增删后调用，使缓存失效"""
+    city_list_cache.invalidate()
+
+
+def backfill_cities(only_missing=True):
+    """按 address 重新解析并写入 province/city/district，返回更新的行数"""
+    from app.address import parse_address
+
+    cur = mysql.connection.cursor()
+    try:
+        where = "WHERE city IS NULL AND address IS NOT NULL AND address != ''" if only_missing else ""
+        cur.execute(f"SELECT rest_id, address FROM Restaurants {where}")
+        values = [(*parse_address(row['address']), row['rest_id']) for row in cur.fetchall()]
+        if values:
+            cur.executemany("""
+                UPDATE Restaurants SET province = %s, city = %s, district = %s
+                WHERE rest_id = %s
+            """, values)
+        mysql.connection.commit()
+    except Exception:
+        mysql.connection.rollback()
+        raise
+    finally:
+        cur.close()
+
+    invalidate_cities()
+    return len(values)
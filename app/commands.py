@@ -0,0 +1,192 @@
+import os
+
+import click
+
+
+def register_commands(app):
+    """注册 flask 命令行命令"""
+
+    @app.cli.command('reconcile-aggregates')
+    @click.option('--dry-run', is_flag=True, help='只检查偏差，不修复')
+    def reconcile_aggregates(dry_run):
+        """对账餐厅评分/评论数/收藏数和菜品推荐数，修复与子表不一致的行"""
+        from app.aggregates import reconcile
+
+        drift = reconcile(repair=not dry_run)
+        for row in drift['restaurants']:
+            click.echo(
+                f"餐厅 {row['rest_id']}: rating_sum {row['rating_sum']} -> {row['actual_rating_sum']}, "
+                f"review_count {row['review_count']} -> {row['actual_review_count']}, "
+                f"star_count {row['star_count']} -> {row['actual_star_count']}"
+            )
+        for row in drift['dishes']:
+            click.echo(f"菜品 {row['dish_id']}: rec_count {row['rec_count']} -> {row['actual_rec_count']}")
+
+        total = len(drift['restaurants']) + len(drift['dishes'])
+        if total == 0:
+            click.echo('聚合数据一致')
+        elif dry_run:
+            click.echo(f'发现 {total} 行偏差（未修复）')
+        else:
+            click.echo(f'已修复 {total} 行偏差')
+
+    @app.cli.command('migrate')
+    @click.option('--fake', is_flag=True, help='只登记为已执行，不实际执行（用 schema.sql 新建的数据库）')
+    @click.option('--target', default=None, help='只执行到该版本号为止，例如 002')
+    def migrate_command(fake, target):
+        """按编号顺序执行 app/sql/migrations 中尚未执行的迁移"""
+        from app.migrations import migrate
+
+        done = migrate(fake=fake, target=target)
+        for version, name in done:
+            click.echo(f"{'已登记' if fake else '已执行'} {version}_{name}")
+        if not done:
+            click.echo('没有待执行的迁移')
+
+    @app.cli.command('sync-categories')
+    def sync_categories_command():
+        """把餐厅表中新出现的类型同步到分类表"""
+        from app.categories import sync_categories
+
+        added = sync_categories()
+        click.echo(f'新增 {added} 个分类' if added else '分类已是最新')
+
+    @app.cli.command('backfill-cities')
+    @click.option('--all', 'all_rows', is_flag=True, help='重新解析所有餐厅（默认只处理 city 为空的）')
+    def backfill_cities_command(all_rows):
+        """按地址解析餐厅的省/市/区县"""
+        from app.cities import backfill_cities
+
+        updated = backfill_cities(only_missing=not all_rows)
+        click.echo(f'已更新 {updated} 家餐厅')
+
+    @app.cli.command('explain-check')
+    @click.option('--min-rows', default=100, show_default=True, help='全表扫描预估行数达到该值才视为问题')
+    @click.option('--verbose', is_flag=True, help='输出每条查询的完整执行计划')
+    def explain_check(min_rows, verbose):
+        """对各路由的热点查询执行 EXPLAIN，存在全表扫描时以非零状态退出"""
+        from app.explain import check_plans
+
+        failed = 0
+        for name, plan, problems in check_plans(min_rows=min_rows):
+            status = '失败' if problems else '通过'
+            access = ', '.join(f"{row.get('table')}:{row.get('type')}/{row.get('key') or '-'}" for row in plan)
+            click.echo(f"[{status}] {name}  {access}")
+            for problem in problems:
+                click.echo(f"    {problem}")
+            if verbose:
+                for row in plan:
+                    click.echo(f"    {row}")
+            if problems:
+                failed += 1
+
+        if failed:
+            click.echo(f'{failed} 条查询存在全表扫描')
+            raise SystemExit(1)
+        click.echo('所有查询均走索引')
+
+    @app.cli.command('plan-check')
+    @click.option('--baseline', 'baseline_path', type=click.Path(dir_okay=False),
+                  default=lambda: os.path.join(os.path.dirname(app.root_path), 'benchmarks', 'plan_baseline.json'),
+                  help='基线文件（默认 benchmarks/plan_baseline.json）')
+    @click.option('--captured', type=click.Path(exists=True, dir_okay=False), default=None,
+                  help='SQL_CAPTURE_FILE 记录的语句（默认使用配置中的文件）')
+    @click.option('--update', is_flag=True, help='用当前的执行计划覆盖基线')
+    @click.option('--rows-factor', default=2.0, show_default=True, help='预估扫描行数超过基线的倍数视为退化')
+    @click.option('--min-rows', default=100, show_default=True, help='预估扫描行数低于该值时不视为退化')
+    def plan_check(baseline_path, captured, update, rows_factor, min_rows):
+        """用 EXPLAIN FORMAT=JSON 比较各语句的执行计划与基线，出现退化时以非零状态退出
+
+        应在 benchmarks.datagen 生成的大规模数据上执行，基线与数据规模对应。
+        """
+        from app.explain import capture_plans, compare_plans, load_baseline, plan_statements, save_baseline
+
+        if captured is None:
+            captured = app.config.get('SQL_CAPTURE_FILE')
+            if captured and not os.path.exists(captured):
+                captured = None
+        current, errors = capture_plans(plan_statements(captured))
+        for name, error in errors.items():
+            click.echo(f'[跳过] {name}  EXPLAIN 失败: {error}')
+
+        if update:
+            save_baseline(baseline_path, current)
+            click.echo(f"已写入 {len(current['plans'])} 条语句的基线: {baseline_path}")
+            return
+        if not os.path.exists(baseline_path):
+            click.echo(f'没有基线文件 {baseline_path}，先执行 flask plan-check --update')
+            raise SystemExit(1)
+
+        baseline = load_baseline(baseline_path)
+        for table, count in current['dataset'].items():
+            base_count = baseline['dataset'].get(table, 0)
+            if base_count and not base_count / 2 <= count <= base_count * 2:
+                click.echo(f'注意: {table} 约 {count} 行，基线生成时约 {base_count} 行，数据规模不同时比较意义不大')
+
+        regressions = compare_plans(baseline, current, rows_factor=rows_factor, min_rows=min_rows)
+        for name, plan in current['plans'].items():
+            access = ', '.join(f"{t['table']}:{t['access_type']}/{t['key'] or '-'}/{t['rows']}" for t in plan['tables'])
+            if name not in baseline['plans']:
+                status = '新增'
+            else:
+                status = '退化' if name in regressions else '通过'
+            click.echo(f'[{status}] {name}  {access}')
+            for problem in regressions.get(name, []):
+                click.echo(f'    {problem}')
+        missing = [name for name in baseline['plans'] if name not in current['plans'] and name not in errors]
+        for name in missing:
+            click.echo(f'[缺失] {name}  基线中有，本次未检查')
+
+        if regressions:
+            click.echo(f'{len(regressions)} 条语句的执行计划退化；确认是预期的改动后用 --update 更新基线')
+            raise SystemExit(1)
+        click.echo('执行计划没有退化')
+
+    @app.cli.command('gc-uploads')
+    @click.option('--grace', default=3600, show_default=True, help='只清理超过该秒数的文件')
+    @click.option('--dry-run', is_flag=True, help='只统计，不删除')
+    def gc_uploads_command(grace, dry_run):
+        """清理上传目录中不再被引用的图片文件"""
+        from app.storage import collect_garbage
+
+        stats = collect_garbage(grace=grace, dry_run=dry_run)
+        click.echo(
+            f"{'可清理' if dry_run else '已清理'}：无引用 {stats['blobs']} 个，未登记 {stats['orphans']} 个，"
+            f"旧文件 {stats['legacy']} 个，共 {stats['bytes'] / 1024 / 1024:.1f} MB"
+        )
+
+    @app.cli.command('purge-page-cache')
+    @click.argument('tags', nargs=-1)
+    @click.option('--all', 'clear_all', is_flag=True, help='清空所有条目')
+    def purge_page_cache_command(tags, clear_all):
+        """使带有指定标签的缓存页面失效，例如 restaurant:12 reviews（只对 file 后端的其他进程有效）"""
+        from app.page_cache import get_backend, purge
+
+        backend = get_backend()
+        if backend is None:
+            click.echo('页面缓存未启用')
+            return
+        if clear_all:
+            backend.clear()
+            click.echo('已清空页面缓存')
+        elif tags:
+            purge(*tags)
+            click.echo(f"已失效标签: {' '.join(tags)}")
+        else:
+            click.echo('请指定标签或 --all')
+
+    @app.cli.command('run-jobs')
+    @click.option('--workers', default=2, show_default=True, help='工作线程数')
+    def run_jobs_command(workers):
+        """以独立进程运行后台任务工作线程（Web 进程设置 JOB_WORKERS=0 时使用）"""
+        import time
+
+        from app.jobs import start_workers
+
+        pool = start_workers(app, workers)
+        click.echo(f'已启动 {workers} 个工作线程，Ctrl+C 退出')
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pool.stop(timeout=10)
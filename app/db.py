@@ -0,0 +1,238 @@
+import threading
+import time
+from collections import deque
+
+import MySQLdb
+import MySQLdb.cursors
+from flask import g, has_app_context
+
+
+class PoolTimeout(Exception):
+    """等待空闲连接超时"""
+
+
+class ConnectionPool:
+    """有界、线程安全的MySQL连接池"""
+
+    def __init__(self, connect_kwargs, min_size=1, max_size=10,
+                 idle_timeout=300, wait_timeout=5):
+        self.connect_kwargs = connect_kwargs
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.wait_timeout = wait_timeout
+
+        self._idle = deque()  # (connection, 归还时间)
+        self._size = 0        # 已创建且未关闭的连接数
+        self._cond = threading.Condition()
+        self._warmed = False
+
+        # 统计信息
+        self._stats = {
+            'created': 0,
+            'closed': 0,
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'timeouts': 0,
+            'health_check_failures': 0,
+        }
+
+    def _connect(self):
+        return MySQLdb.connect(**self.connect_kwargs)
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._stats['closed'] += 1
+            self._cond.notify()
+
+    def _warm_up(self):
+        """首次取连接时预建最小数量的连接，数据库不可用时不影响启动"""
+        self._warmed = True
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                return
+            with self._cond:
+                self._stats['created'] += 1
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def _is_healthy(self, conn):
+        try:
+            conn.ping()
+            return True
+        except Exception:
+            self._stats['health_check_failures'] += 1
+            return False
+
+    def acquire(self):
+        """取出一个可用连接，池满时最多等待 wait_timeout 秒"""
+        if not self._warmed:
+            self._warm_up()
+
+        deadline = None
+        waited_from = None
+        while True:
+            conn = None
+            create = False
+            with self._cond:
+                while True:
+                    if self._idle:
+                        conn, released_at = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        create = True
+                        break
+                    # 池已满，等待其他请求归还
+                    now = time.monotonic()
+                    if deadline is None:
+                        deadline = now + self.wait_timeout
+                        waited_from = now
+                        self._stats['waits'] += 1
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        self._stats['wait_time_total'] += now - waited_from
+                        raise PoolTimeout(f'等待数据库连接超时（{self.wait_timeout}秒）')
+                    self._cond.wait(remaining)
+                if waited_from is not None:
+                    self._stats['wait_time_total'] += time.monotonic() - waited_from
+                    waited_from = None
+
+            if create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._stats['created'] += 1
+                    self._stats['checkouts'] += 1
+                return conn
+
+            # 空闲过久或健康检查失败的连接直接丢弃
+            if time.monotonic() - released_at > self.idle_timeout or not self._is_healthy(conn):
+                self._close(conn)
+                continue
+
+            with self._cond:
+                self._stats['checkouts'] += 1
+            return conn
+
+    def release(self, conn):
+        """归还连接，未提交的事务会被回滚"""
+        try:
+            conn.rollback()
+        except Exception:
+            self._close(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def close_all(self):
+        """关闭所有空闲连接"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn, _ in idle:
+            self._close(conn)
+
+    def stats(self):
+        """返回连接池统计信息"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+            })
+        return stats
+
+
+class PooledMySQL:
+    """Flask-MySQLdb 的替代品：mysql.connection 从连接池中取连接，请求结束时归还"""
+
+    def __init__(self, app=None):
+        self.pool = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('MYSQL_HOST', 'localhost')
+        app.config.setdefault('MYSQL_USER', None)
+        app.config.setdefault('MYSQL_PASSWORD', None)
+        app.config.setdefault('MYSQL_DB', None)
+        app.config.setdefault('MYSQL_PORT', 3306)
+        app.config.setdefault('MYSQL_UNIX_SOCKET', None)
+        app.config.setdefault('MYSQL_CONNECT_TIMEOUT', 10)
+        app.config.setdefault('MYSQL_CHARSET', 'utf8mb4')
+        app.config.setdefault('MYSQL_CURSORCLASS', None)
+        app.config.setdefault('MYSQL_POOL_MIN_SIZE', 1)
+        app.config.setdefault('MYSQL_POOL_MAX_SIZE', 10)
+        app.config.setdefault('MYSQL_POOL_IDLE_TIMEOUT', 300)
+        app.config.setdefault('MYSQL_POOL_WAIT_TIMEOUT', 5)
+
+        kwargs = {
+            'host': app.config['MYSQL_HOST'],
+            'port': app.config['MYSQL_PORT'],
+            'connect_timeout': app.config['MYSQL_CONNECT_TIMEOUT'],
+            'charset': app.config['MYSQL_CHARSET'],
+            'use_unicode': True,
+        }
+        if app.config['MYSQL_USER']:
+            kwargs['user'] = app.config['MYSQL_USER']
+        if app.config['MYSQL_PASSWORD']:
+            kwargs['passwd'] = app.config['MYSQL_PASSWORD']
+        if app.config['MYSQL_DB']:
+            kwargs['db'] = app.config['MYSQL_DB']
+        if app.config['MYSQL_UNIX_SOCKET']:
+            kwargs['unix_socket'] = app.config['MYSQL_UNIX_SOCKET']
+        cursorclass = app.config['MYSQL_CURSORCLASS']
+        if isinstance(cursorclass, str):
+            cursorclass = getattr(MySQLdb.cursors, cursorclass)
+        if cursorclass:
+            kwargs['cursorclass'] = cursorclass
+
+        self.pool = ConnectionPool(
+            kwargs,
+            min_size=int(app.config['MYSQL_POOL_MIN_SIZE']),
+            max_size=int(app.config['MYSQL_POOL_MAX_SIZE']),
+            idle_timeout=float(app.config['MYSQL_POOL_IDLE_TIMEOUT']),
+            wait_timeout=float(app.config['MYSQL_POOL_WAIT_TIMEOUT']),
+        )
+        app.teardown_appcontext(self.teardown)
+
+    @property
+    def connection(self):
+        """当前应用上下文绑定的连接，首次访问时从池中取出"""
+        if not has_app_context():
+            return None
+        conn = g.get('_mysql_conn')
+        if conn is None:
+            conn = self.pool.acquire()
+            g._mysql_conn = conn
+        return conn
+
+    def teardown(self, exception):
+        conn = g.pop('_mysql_conn', None)
+        if conn is not None:
+            self.pool.release(conn)
@@ -0,0 +1,382 @@
+import json
+
+from app import mysql
+from app.sql_stats import captured_statements, fingerprint, fingerprint_id
+
+# 各蓝图热点查询的执行计划检查，供 `flask explain-check` 和 `flask plan-check` 使用。
+# SQL 与路由中的写法保持一致（分页查询取第一页的形式），参数取代表性的值；
+# 路由中的查询有改动时需同步更新这里。
+#
+# plan-check 在此基础上加入 SQL_CAPTURE_FILE 中记录的、路由实际执行过的语句，
+# 用 EXPLAIN FORMAT=JSON 取得每张表的访问方式和预估扫描行数，与保存的基线比较。
+
+# (名称, SQL, 参数)
+ROUTE_QUERIES = [
+    ('main.index 排行榜分数线', """
+        SELECT r.rating
+        FROM Restaurants r
+        WHERE r.review_count > 0
+        ORDER BY r.rating DESC
+        LIMIT 1 OFFSET %s
+    """, (2,)),
+    ('main.index 排行榜', """
+        SELECT r.rest_id, r.name, r.type, r.address, r.opening_hours, r.img_url, r.img_variants,
+               r.rating, r.review_count
+        FROM Restaurants r
+        WHERE r.review_count > 0 AND r.rating >= %s
+        ORDER BY r.rating DESC, r.review_count DESC, r.name, r.rest_id
+    """, (9,)),
+    ('main.search 餐厅', """
+        SELECT r.*, MATCH(r.name, r.type, r.address) AGAINST (%s IN NATURAL LANGUAGE MODE) as relevance
+        FROM Restaurants r
+        WHERE MATCH(r.name, r.type, r.address) AGAINST (%s IN NATURAL LANGUAGE MODE)
+        ORDER BY relevance DESC, r.rating DESC, r.name
+        LIMIT 20
+    """, ('火锅', '火锅')),
+    ('main.search 菜品', """
+        SELECT d.*, r.name as restaurant_name, r.rest_id,
+               MATCH(d.name, d.description) AGAINST (%s IN NATURAL LANGUAGE MODE) as relevance
+        FROM Dishes d
+        JOIN Restaurants r ON d.rest_id = r.rest_id
+        WHERE MATCH(d.name, d.description) AGAINST (%s IN NATURAL LANGUAGE MODE)
+        ORDER BY relevance DESC, d.rec_count DESC, d.name
+        LIMIT 20
+    """, ('牛肉', '牛肉')),
+    ('main.city_restaurants', """
+        SELECT r.*
+        FROM Restaurants r
+        WHERE r.city = %s
+        ORDER BY r.rating DESC, r.name
+    """, ('北京市',)),
+    ('restaurant.restaurant_list 按评分', """
+        SELECT r.*, rc.category_name, rc.description as category_description
+        FROM restaurants r
+        LEFT JOIN restaurantcategories rc ON r.type = rc.category_name
+        ORDER BY r.rating DESC, r.name ASC, r.rest_id ASC
+        LIMIT 21
+    """, ()),
+    ('restaurant.restaurant_list 按名称', """
+        SELECT r.*, rc.category_name, rc.description as category_description
+        FROM restaurants r
+        LEFT JOIN restaurantcategories rc ON r.type = rc.category_name
+        ORDER BY r.name ASC, r.rest_id ASC
+        LIMIT 21
+    """, ()),
+    ('restaurant.restaurant_list 按评论数', """
+        SELECT r.*, rc.category_name, rc.description as category_description
+        FROM restaurants r
+        LEFT JOIN restaurantcategories rc ON r.type = rc.category_name
+        ORDER BY r.review_count DESC, r.rating DESC, r.rest_id ASC
+        LIMIT 21
+    """, ()),
+    ('restaurant.restaurant_list 分类筛选', """
+        SELECT r.*, rc.category_name, rc.description as category_description
+        FROM restaurants r
+        LEFT JOIN restaurantcategories rc ON r.type = rc.category_name
+        WHERE r.type = %s
+        ORDER BY r.rating DESC, r.name ASC, r.rest_id ASC
+        LIMIT 21
+    """, ('川菜',)),
+    ('restaurant.detail 菜品', """
+        SELECT d.*
+        FROM Dishes d
+        WHERE d.rest_id = %s
+        ORDER BY d.name
+    """, (1,)),
+    ('restaurant.detail 评论', """
+        SELECT r.*, u.username
+        FROM Reviews r
+        JOIN Users u ON r.user_id = u.user_id
+        WHERE r.rest_id = %s
+        ORDER BY r.review_time DESC
+    """, (1,)),
+    ('restaurant.detail 回复', """
+        SELECT review_id, content, reply_time
+        FROM Replies
+        WHERE review_id IN (%s, %s, %s)
+        ORDER BY reply_time ASC
+    """, (1, 2, 3)),
+    ('main.api_user_state 收藏状态', """
+        SELECT rest_id FROM Favourites
+        WHERE user_id = %s AND rest_id IN (%s, %s, %s)
+    """, (1, 1, 2, 3)),
+    ('main.api_user_state 推荐状态', """
+        SELECT dish_id FROM Recommendations
+        WHERE user_id = %s AND dish_id IN (%s, %s, %s)
+    """, (1, 1, 2, 3)),
+    ('restaurant.toggle_favorite', """
+        DELETE FROM Favourites WHERE user_id = %s AND rest_id = %s
+    """, (1, 1)),
+    ('restaurant.favorites', """
+        SELECT r.*, f.timestamp
+        FROM Favourites f
+        JOIN Restaurants r ON f.rest_id = r.rest_id
+        WHERE f.user_id = %s
+        ORDER BY f.timestamp DESC
+    """, (1,)),
+    ('review.my_reviews', """
+        SELECT r.*, rest.name as restaurant_name
+        FROM reviews r
+        JOIN restaurants rest ON r.rest_id = rest.rest_id
+        WHERE r.user_id = %s
+        ORDER BY r.review_time DESC
+    """, (1,)),
+    ('review.recommend_dish', """
+        DELETE FROM recommendations WHERE user_id = %s AND dish_id = %s
+    """, (1, 1)),
+    ('user.edit_profile 邮箱查重', """
+        SELECT COUNT(*) as count FROM users WHERE email = %s AND user_id != %s
+    """, ('user@example.com', 1)),
+    ('auth 按邮箱查用户', """
+        SELECT * FROM users WHERE email = %s AND is_deleted = 0
+    """, ('user@example.com',)),
+    ('merchant.my_restaurants', """
+        SELECT r.*, r.rating as avg_rating
+        FROM Restaurants r
+        JOIN MerchantRestaurant mr ON r.rest_id = mr.restaurant_id
+        WHERE mr.merchant_id = %s
+        ORDER BY r.name
+    """, (1,)),
+    ('merchant.manage_dishes', """
+        SELECT r.rest_id, r.name as restaurant_name,
+               d.dish_id, d.name as dish_name, d.price, d.description, d.img_url,
+               COALESCE(d.rec_count, 0) as rec_count
+        FROM Restaurants r
+        JOIN MerchantRestaurant mr ON r.rest_id = mr.restaurant_id
+        LEFT JOIN Dishes d ON r.rest_id = d.rest_id
+        WHERE mr.merchant_id = %s
+        ORDER BY r.name, d.name
+    """, (1,)),
+    ('merchant.replies', """
+        SELECT rv.review_id, rv.rating, rv.comment as review_text, rv.timestamp as review_date,
+               u.username as reviewer_name,
+               rest.name as restaurant_name, rest.rest_id,
+               r.reply_id, r.content as reply_text, r.reply_time as reply_date
+        FROM Reviews rv
+        JOIN Restaurants rest ON rv.rest_id = rest.rest_id
+        JOIN MerchantRestaurant mr ON rest.rest_id = mr.restaurant_id
+        LEFT JOIN Users u ON rv.user_id = u.user_id
+        LEFT JOIN Replies r ON rv.review_id = r.review_id
+        WHERE mr.merchant_id = %s
+        ORDER BY rv.timestamp DESC, rv.review_id DESC
+        LIMIT 21
+    """, (1,)),
+    ('admin.dashboard 最近用户', """
+        SELECT username, email, user_type, join_date
+        FROM Users
+        WHERE is_deleted = FALSE
+        ORDER BY join_date DESC
+        LIMIT 10
+    """, ()),
+    ('admin.dashboard 最近评论', """
+        SELECT r.comment, r.rating, r.review_time, u.username, rest.name as restaurant_name
+        FROM Reviews r
+        JOIN Users u ON r.user_id = u.user_id
+        JOIN Restaurants rest ON r.rest_id = rest.rest_id
+        ORDER BY r.review_time DESC
+        LIMIT 10
+    """, ()),
+    ('admin.manage_restaurants', """
+        SELECT r.*, r.rating as avg_rating
+        FROM Restaurants r
+        ORDER BY r.name ASC, r.rest_id ASC
+        LIMIT 21
+    """, ()),
+    ('admin.manage_restaurants 商家', """
+        SELECT user_id, username
+        FROM Users
+        WHERE user_type = 'merchant' AND is_deleted = FALSE
+        ORDER BY username
+    """, ()),
+    ('admin.manage_reviews', """
+        SELECT r.*, u.username, rest.name as restaurant_name,
+               rep.reply_id, rep.content as reply_content, rep.reply_time
+        FROM Reviews r
+        JOIN Users u ON r.user_id = u.user_id
+        JOIN Restaurants rest ON r.rest_id = rest.rest_id
+        LEFT JOIN Replies rep ON r.review_id = rep.review_id
+        ORDER BY r.review_time DESC, r.review_id DESC
+        LIMIT 21
+    """, ()),
+    ('admin.manage_users', """
+        SELECT user_id, username, email, phone, join_date, user_type, is_deleted
+        FROM Users
+        ORDER BY join_date DESC, user_id DESC
+        LIMIT 21
+    """, ()),
+]
+
+# 允许全表扫描的表：分类表很小且整表读取；IssueReports 的列表页本身就按状态整表排序
+FULL_SCAN_ALLOWED = {'restaurantcategories', 'rc', 'issuereports', 'ir'}
+
+
+def explain(cur, sql, params):
+    cur.execute("EXPLAIN " + sql, params or None)
+    return list(cur.fetchall())
+
+
+def check_plans(min_rows=100):
+    """对 ROUTE_QUERIES 逐条执行 EXPLAIN
+
+    access type 为 ALL（全表扫描）且预估扫描行数不少于 min_rows 的视为问题；
+    数据量很小时优化器会倾向于直接全表扫描，所以应在接近生产规模的数据上检查，
+    min_rows=0 时任何全表扫描都算问题。
+    返回 [(名称, 执行计划行, 问题列表), ...]
+    """
+    results = []
+    cur = mysql.connection.cursor()
+    try:
+        for name, sql, params in ROUTE_QUERIES:
+            plan = explain(cur, sql, params)
+            problems = []
+            for row in plan:
+                table = (row.get('table') or '').lower()
+                if row.get('type') != 'ALL' or table in FULL_SCAN_ALLOWED or table.startswith('<'):
+                    continue
+                if (row.get('rows') or 0) >= min_rows:
+                    problems.append(f"{row.get('table')} 全表扫描（约 {row.get('rows')} 行）")
+            results.append((name, plan, problems))
+    finally:
+        cur.close()
+    return results
+
+
+# 访问方式从好到差（MySQL EXPLAIN 的 access_type）
+ACCESS_RANK = ['system', 'const', 'eq_ref', 'ref', 'fulltext', 'ref_or_null', 'index_merge',
+               'unique_subquery', 'index_subquery', 'range', 'index', 'ALL']
+BASELINE_FORMAT = 1
+BASELINE_TABLES = ('Users', 'Restaurants', 'Dishes', 'Reviews', 'Replies', 'Favourites', 'Recommendations')
+
+
+def explain_json(cur, sql, params):
+    cur.execute("EXPLAIN FORMAT=JSON " + sql, params or None)
+    row = cur.fetchone()
+    return json.loads(row['EXPLAIN'] if isinstance(row, dict) else row[0])
+
+
+def plan_tables(plan):
+    """按出现顺序取出 JSON 执行计划中每张表的访问方式、索引和每次扫描的预估行数"""
+    tables = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            table = node.get('table')
+            if isinstance(table, dict) and 'table_name' in table:
+                tables.append({
+                    'table': table['table_name'],
+                    'access_type': table.get('access_type'),
+                    'key': table.get('key'),
+                    'rows': table.get('rows_examined_per_scan'),
+                })
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(plan)
+    return tables
+
+
+def plan_statements(capture_file=None):
+    """ROUTE_QUERIES 加上 SQL_CAPTURE_FILE 中记录的语句（与 ROUTE_QUERIES 指纹相同的不重复检查）
+
+    返回 [(名称, 指纹 ID, SQL, 参数), ...]；记录的语句已带实际参数，名称为 "端点 [指纹 ID]"。
+    """
+    statements = []
+    seen = set()
+    for name, sql, params in ROUTE_QUERIES:
+        key = fingerprint_id(fingerprint(sql))
+        seen.add(key)
+        statements.append((name, key, sql, params))
+    if capture_file:
+        for entry in captured_statements(capture_file):
+            if entry['id'] in seen:
+                continue
+            seen.add(entry['id'])
+            statements.append((f"{entry.get('endpoint') or '-'} [{entry['id']}]", entry['id'], entry['sql'], None))
+    return statements
+
+
+def dataset_size(cur):
+    """主要表的行数（information_schema 中的估计值，大表上不需要 COUNT(*)）"""
+    cur.execute("""
+        SELECT table_name AS name, table_rows AS row_count
+        FROM information_schema.tables
+        WHERE table_schema = DATABASE()
+    """)
+    rows = {row['name'].lower(): row['row_count'] or 0 for row in cur.fetchall()}
+    return {table: rows.get(table.lower(), 0) for table in BASELINE_TABLES}
+
+
+def capture_plans(statements):
+    """对每条语句执行 EXPLAIN FORMAT=JSON，返回基线格式的字典"""
+    plans = {}
+    errors = {}
+    cur = mysql.connection.cursor()
+    try:
+        size = dataset_size(cur)
+        for name, key, sql, params in statements:
+            try:
+                tables = plan_tables(explain_json(cur, sql, params))
+            except Exception as e:
+                # 记录的语句引用的数据可能已不存在，或 SQL 与当前表结构不再匹配
+                errors[name] = str(e)
+                continue
+            plans[name] = {'id': key, 'tables': tables}
+    finally:
+        cur.close()
+    return {'format': BASELINE_FORMAT, 'dataset': size, 'plans': plans}, errors
+
+
+def _rank(access_type):
+    return ACCESS_RANK.index(access_type) if access_type in ACCESS_RANK else len(ACCESS_RANK)
+
+
+def compare_plans(baseline, current, rows_factor=2.0, min_rows=100):
+    """与基线逐条比较，返回 {名称: [问题, ...]}
+
+    同一语句中按表名和出现顺序对应。以下情况视为退化：
+    - 访问方式变差（如 ref -> ALL），或不再使用索引
+    - 预估扫描行数超过基线的 rows_factor 倍，且不少于 min_rows（数据量小时的波动不算）
+    - 出现基线中没有的全表扫描（不少于 min_rows 行）
+    """
+    regressions = {}
+    for name, plan in current['plans'].items():
+        base = baseline['plans'].get(name)
+        if base is None:
+            continue
+        remaining = list(base['tables'])
+        problems = []
+        for table in plan['tables']:
+            match = next((t for t in remaining if t['table'] == table['table']), None)
+            rows = table['rows'] or 0
+            if match is None:
+                if table['access_type'] == 'ALL' and rows >= min_rows:
+                    problems.append(f"{table['table']}: 新增全表扫描（约 {rows} 行）")
+                continue
+            remaining.remove(match)
+            if _rank(table['access_type']) > _rank(match['access_type']):
+                problems.append(f"{table['table']}: 访问方式 {match['access_type']} -> {table['access_type']}")
+            elif match['key'] and not table['key']:
+                problems.append(f"{table['table']}: 不再使用索引 {match['key']}")
+            base_rows = match['rows'] or 0
+            if rows >= min_rows and rows > max(base_rows, 1) * rows_factor:
+                problems.append(f"{table['table']}: 预估扫描 {base_rows} -> {rows} 行")
+        if problems:
+            regressions[name] = problems
+    return regressions
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('format') != BASELINE_FORMAT:
+        raise ValueError(f'不支持的基线格式 {baseline.get("format")}')
+    return baseline
+
+
+def save_baseline(path, baseline):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write('\n')
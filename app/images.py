@@ -0,0 +1,356 @@
+import io
+import json
+import os
+import uuid
+
+from flask import current_app
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from app import metrics, mysql, storage
+from app.jobs import enqueue, on_failed, register
+from app.page_cache import purge, tag
+
+# 生成的尺寸：名称 -> 最大宽度（等比缩放，不放大）
+VARIANTS = {
+    'thumb': 320,
+    'card': 640,
+    'full': 1280,
+}
+
+# 输出格式：格式名 -> (扩展名, Pillow 保存参数)
+FORMATS = {
+    'webp': ('webp', {'format': 'WEBP', 'quality': 80, 'method': 6}),
+    'jpeg': ('jpg', {'format': 'JPEG', 'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+# 没有 img_variants 的旧图片、或不支持 srcset 时使用的尺寸
+FALLBACK_VARIANT = 'full'
+
+# 可以挂图片的表：表名 -> 主键列
+IMAGE_TABLES = {
+    'Restaurants': 'rest_id',
+    'Dishes': 'dish_id',
+}
+
+
+class ImageError(ValueError):
+    """上传的文件不是可处理的图片"""
+
+
+def _open(file):
+    try:
+        image = Image.open(file)
+        image.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise ImageError(f'无法识别的图片文件: {e}')
+
+    # 按 EXIF 方向旋转后丢弃原图的元数据（EXIF 只在保存时显式传入才会写出）
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+    return image
+
+
+def _resize(image, max_width):
+    if image.width <= max_width:
+        return image
+    height = round(image.height * max_width / image.width)
+    return image.resize((max_width, height), Image.LANCZOS)
+
+
+def _encode(image, fmt):
+    buffer = io.BytesIO()
+    image.save(buffer, **FORMATS[fmt][1])
+    return buffer.getvalue()
+
+
+def process_image(file):
+    """把上传的图片处理成各尺寸、各格式的数据
+
+    返回 {尺寸名: {'w': 宽度, 'h': 高度, 格式名: bytes, ...}, ...}
+    """
+    image = _open(file)
+    result = {}
+    for name, max_width in VARIANTS.items():
+        resized = _resize(image, max_width)
+        entry = {'w': resized.width, 'h': resized.height}
+        for fmt in FORMATS:
+            entry[fmt] = _encode(resized, fmt)
+        result[name] = entry
+    return result
+
+
+def stage_upload(file):
+    """请求中只做的部分：检查文件确实是图片并原样暂存到暂存目录
+
+    返回 (暂存路径, 暂存标记)。暂存目录（UPLOAD_STAGING_FOLDER）在静态目录之外：原图可能很大且带有
+    EXIF（含定位），不对外提供；处理完成前记录仍显示原来的图片（新记录没有图片）。
+    """
+    try:
+        with Image.open(file) as image:
+            fmt = (image.format or '').lower()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise ImageError(f'无法识别的图片文件: {e}')
+    file.seek(0)
+
+    staging_folder = current_app.config['UPLOAD_STAGING_FOLDER']
+    os.makedirs(staging_folder, exist_ok=True)
+    ext = {'jpeg': 'jpg'}.get(fmt, fmt or 'img')
+    token = uuid.uuid4().hex
+    path = os.path.join(staging_folder, f'{token}_upload.{ext}')
+    file.save(path)
+    metrics.inc('upload_bytes_total', os.path.getsize(path))
+    return path, token
+
+
+def discard_upload(staged):
+    """业务事务回滚时删除已暂存的原图"""
+    if staged:
+        try:
+            os.remove(staged[0])
+        except OSError:
+            pass
+
+
+def encode_variants(path):
+    """处理暂存的图片，返回 (img_url, img_variants, blobs)
+
+    img_url 为兼容旧模板的默认图片地址，img_variants 为写入数据库的 JSON 字符串，
+    记录各尺寸各格式的地址和宽高；blobs 为待写入存储的 [(数据, 扩展名), ...]。
+    地址由内容哈希决定，相同的图片得到相同的地址，任务重试也不会产生新文件。
+    """
+    with open(path, 'rb') as f:
+        processed = process_image(f)
+
+    variants = {}
+    blobs = {}
+    for name, entry in processed.items():
+        record = {'w': entry['w'], 'h': entry['h']}
+        for fmt, (ext, _) in FORMATS.items():
+            # 原图较小时几个尺寸的数据相同，每个地址只登记一次引用（与 image_urls 一致）
+            digest = storage.content_hash(entry[fmt])
+            record[fmt] = storage.blob_url(digest, ext)
+            blobs[digest] = (entry[fmt], ext)
+        variants[name] = record
+
+    return variants[FALLBACK_VARIANT]['jpeg'], json.dumps(variants), list(blobs.values())
+
+
+def image_urls(img_url, img_variants=None):
+    """图片及其所有尺寸的地址（去重）"""
+    urls = {img_url}
+    for record in (load_variants(img_variants) or {}).values():
+        urls.update(record.get(fmt) for fmt in FORMATS)
+    urls.discard(None)
+    return urls
+
+
+def release_image(img_url, img_variants=None):
+    """在业务事务中释放图片的引用（替换或删除记录时调用，随业务数据一起提交）
+
+    内容寻址存储中的文件只减少引用计数，由 flask gc-uploads 统一清理；
+    旧的 uuid 文件名登记后台删除任务。
+    """
+    if not img_url:
+        return
+    cur = mysql.connection.cursor()
+    try:
+        legacy = storage.release(cur, image_urls(img_url, img_variants))
+    finally:
+        cur.close()
+    if legacy:
+        enqueue('image.delete', {'img_url': img_url, 'img_variants': img_variants}, commit=False)
+
+
+def queue_image_jobs(table, row_id, staged):
+    """在业务事务中登记图片的后台任务（随业务数据一起提交）
+
+    staged 为 stage_upload 的返回值。记录的 img_pending 设为这次上传的暂存标记，
+    处理完成后才替换 img_url、img_variants 并释放原来的图片；期间再次上传会覆盖标记，较早的任务写回时放弃。
+    """
+    path, token = staged
+    cur = mysql.connection.cursor()
+    try:
+        cur.execute(f"UPDATE {table} SET img_pending = %s WHERE {IMAGE_TABLES[table]} = %s", (token, row_id))
+    finally:
+        cur.close()
+    enqueue('image.process', {'table': table, 'id': row_id, 'path': path, 'token': token}, commit=False)
+
+
+def load_variants(value):
+    """解析数据库中的 img_variants，无效时返回 None"""
+    if not value:
+        return None
+    if isinstance(value, dict):
+        return value
+    try:
+        return json.loads(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def upload_path(url):
+    """上传图片地址对应的本地文件路径，不是上传目录中的文件时返回 None"""
+    parsed = storage.parse_blob_url(url)
+    if parsed:
+        return storage.blob_path(*parsed)
+    if url and url.startswith('/static/uploads/'):
+        return os.path.join(current_app.config['UPLOAD_FOLDER'], url.split('/')[-1])
+    return None
+
+
+def delete_image(img_url, img_variants=None):
+    """删除上传目录中旧文件名（非内容寻址）的图片及其所有尺寸，忽略删除失败"""
+    for url in image_urls(img_url, img_variants):
+        path = upload_path(url)
+        if path and not storage.parse_blob_url(url):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def srcset(variants, fmt):
+    """生成 srcset 属性值，相同宽度（原图较小时）只保留一个"""
+    variants = load_variants(variants) or {}
+    seen = set()
+    parts = []
+    for record in sorted(variants.values(), key=lambda r: r['w']):
+        if record['w'] in seen or not record.get(fmt):
+            continue
+        seen.add(record['w'])
+        parts.append(f"{record[fmt]} {record['w']}w")
+    return ', '.join(parts)
+
+
+def _image_tags(cur, table, row_id):
+    """记录的图片变化后需要清除的页面缓存标签"""
+    if table == 'Restaurants':
+        return [tag('restaurant', row_id), 'restaurants']
+    cur.execute("SELECT rest_id FROM Dishes WHERE dish_id = %s", (row_id,))
+    dish = cur.fetchone()
+    return [tag('restaurant', dish['rest_id']) if dish else None, 'dishes']
+
+
+def _pending_guard(payload):
+    """image.process 任务对应的记录条件：img_pending 等于暂存标记
+
+    迁移 013 之前登记的任务没有暂存标记，记录的 img_url 直接指向暂存的原图（旧图片已在请求中释放）。
+    """
+    if 'token' in payload:
+        return 'img_pending = %s', payload['token']
+    return 'img_url = %s', payload['staged_url']
+
+
+@register('image.process')
+def process_uploaded_image(payload):
+    """后台任务：生成各尺寸图片写入存储，写回数据库并释放原来的图片，最后删除暂存的原图"""
+    path = payload['path']
+    if not os.path.exists(path):
+        return  # 之前的执行已经完成，或图片已被删除
+
+    table = payload['table']
+    key = IMAGE_TABLES[table]
+    img_url, img_variants, blobs = encode_variants(path)
+
+    guard, guard_value = _pending_guard(payload)
+    tags = []
+    cur = mysql.connection.cursor()
+    try:
+        # 只在记录仍在等待这次上传时写回，期间又换了图或记录被删除时放弃；
+        # 引用计数的登记和释放与写回在同一事务中，放弃时都不执行
+        cur.execute(f"""
+            SELECT img_url, img_variants FROM {table}
+            WHERE {key} = %s AND {guard}
+            FOR UPDATE
+        """, (payload['id'], guard_value))
+        replaced = cur.fetchone()
+        if replaced:
+            cur.execute(f"""
+                UPDATE {table} SET img_url = %s, img_variants = %s, img_pending = NULL
+                WHERE {key} = %s
+            """, (img_url, img_variants, payload['id']))
+            for data, ext in blobs:
+                storage.store(cur, data, ext)
+            if 'token' in payload:
+                release_image(replaced['img_url'], replaced['img_variants'])
+            enqueue('image.verify', {'table': table, 'id': payload['id']}, commit=False)
+            tags = _image_tags(cur, table, payload['id'])
+        mysql.connection.commit()
+    finally:
+        cur.close()
+
+    purge(*tags)
+    discard_upload((path, guard_value))
+
+
+@on_failed('image.process')
+def drop_unprocessed_image(payload):
+    """图片处理最终失败时删除暂存的原图并清除等待标记，记录保留原来的图片，商家可以重新上传"""
+    table = payload['table']
+    guard, guard_value = _pending_guard(payload)
+    tags = []
+    cur = mysql.connection.cursor()
+    try:
+        if 'token' in payload:
+            cur.execute(f"""
+                UPDATE {table} SET img_pending = NULL
+                WHERE {IMAGE_TABLES[table]} = %s AND {guard}
+            """, (payload['id'], guard_value))
+        else:
+            # 升级前的任务：记录直接显示暂存的原图，只能清空图片
+            cur.execute(f"""
+                UPDATE {table} SET img_url = NULL, img_variants = NULL
+                WHERE {IMAGE_TABLES[table]} = %s AND {guard}
+            """, (payload['id'], guard_value))
+            if cur.rowcount > 0:
+                tags = _image_tags(cur, table, payload['id'])
+        mysql.connection.commit()
+    finally:
+        cur.close()
+    purge(*tags)
+    discard_upload((payload['path'], guard_value))
+
+
+@register('image.delete')
+def delete_replaced_image(payload):
+    """后台任务：删除被替换或随记录删除的图片文件"""
+    delete_image(payload['img_url'], payload.get('img_variants'))
+
+
+@register('image.verify')
+def verify_image(payload):
+    """后台任务：检查记录引用的各尺寸文件都存在且能解码，有问题时抛出异常（重试后标记失败供排查）"""
+    table = payload['table']
+    key = IMAGE_TABLES[table]
+    cur = mysql.connection.cursor()
+    try:
+        cur.execute(f"SELECT img_url, img_variants FROM {table} WHERE {key} = %s", (payload['id'],))
+        row = cur.fetchone()
+    finally:
+        cur.close()
+    if not row:
+        return
+
+    problems = []
+    for name, record in (load_variants(row['img_variants']) or {}).items():
+        for fmt in FORMATS:
+            path = upload_path(record.get(fmt))
+            try:
+                with Image.open(path) as image:
+                    image.verify()
+            except Exception as e:
+                problems.append(f'{name}/{fmt}: {e}')
+    if problems:
+        raise ImageError(f"{table} {payload['id']} 的图片损坏或缺失: " + '; '.join(problems))
+
+
+def register_template_helpers(app):
+    """注册模板中使用的过滤器，配合 templates/_image.html 中的宏"""
+    app.add_template_filter(load_variants, 'image_variants')
+    app.add_template_filter(srcset, 'srcset')
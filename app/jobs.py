@@ -0,0 +1,296 @@
+import json
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+import uuid
+
+from app import mysql
+
+# 后台任务队列：任务持久化在 MySQL 的 Jobs 表中（见 app/sql/migrations/007_jobs.sql），
+# 由进程内的工作线程领取执行。多个进程各自的工作线程通过原子的 UPDATE ... LIMIT 1 领取，
+# 同一任务不会被重复领取；失败后按指数退避重试，超过最大次数标记为 failed。
+
+DEFAULT_MAX_ATTEMPTS = 5
+BACKOFF_BASE = 5      # 秒，第 n 次失败后等待约 BACKOFF_BASE * 2^(n-1) 秒
+BACKOFF_MAX = 600     # 秒
+STALE_AFTER = 600     # 秒，running 状态超过该时间视为工作线程已崩溃，重新放回队列
+KEEP_DONE_DAYS = 7    # 已完成的任务保留天数
+
+_handlers = {}
+_failure_handlers = {}
+
+
+def register(job_type):
+    """注册任务处理函数：处理函数接收 payload 字典，抛出异常表示失败"""
+    def decorator(func):
+        _handlers[job_type] = func
+        return func
+    return decorator
+
+
+def on_failed(job_type):
+    """注册任务最终失败（超过最大重试次数）时的清理函数，接收 payload 字典"""
+    def decorator(func):
+        _failure_handlers[job_type] = func
+        return func
+    return decorator
+
+
+def enqueue(job_type, payload, max_attempts=DEFAULT_MAX_ATTEMPTS, delay=0, commit=True):
+    """添加任务，返回 job_id
+
+    在业务事务中调用时传 commit=False，任务与业务数据一起提交或回滚，
+    工作线程只能在提交后看到它。
+    """
+    cur = mysql.connection.cursor()
+    try:
+        cur.execute("""
+            INSERT INTO Jobs (job_type, payload, max_attempts, run_at)
+            VALUES (%s, %s, %s, NOW(3) + INTERVAL %s SECOND)
+        """, (job_type, json.dumps(payload), max_attempts, delay))
+        job_id = cur.lastrowid
+        if commit:
+            mysql.connection.commit()
+        return job_id
+    finally:
+        cur.close()
+
+
+def backoff_delay(attempts):
+    """第 attempts 次失败后的重试等待秒数（带抖动，避免同时重试）"""
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return delay * (0.5 + random.random() / 2)
+
+
+def _claim(cur, worker_id):
+    """领取一个到期的任务，返回 (任务, 领取标记)，没有时返回 (None, None)
+
+    领取标记由调用方保存并在 _finish 时传回：requeue_stale 会清空 locked_by，
+    之后不能再按标记查回任务。
+    """
+    token = f'{worker_id}:{uuid.uuid4().hex[:8]}'
+    cur.execute("""
+        UPDATE Jobs
+        SET status = 'running', locked_by = %s, locked_at = NOW(3), attempts = attempts + 1
+        WHERE status = 'pending' AND run_at <= NOW(3)
+        ORDER BY run_at, job_id
+        LIMIT 1
+    """, (token,))
+    claimed = cur.rowcount
+    mysql.connection.commit()
+    if claimed == 0:
+        return None, None
+    cur.execute("SELECT * FROM Jobs WHERE locked_by = %s AND status = 'running'", (token,))
+    return cur.fetchone(), token
+
+
+def _finish(cur, job, token, error=None):
+    """写回执行结果，返回写回后的状态
+
+    只在任务仍由本次领取持有时写回：执行超时被 requeue_stale 放回队列、
+    又被其他工作线程领取的任务，结果以后来者为准，此时返回 None。
+    """
+    if error is None:
+        status = 'done'
+        cur.execute("""
+            UPDATE Jobs SET status = 'done', locked_by = NULL, last_error = NULL
+            WHERE job_id = %s AND locked_by = %s AND status = 'running'
+        """, (job['job_id'], token))
+    elif job['attempts'] >= job['max_attempts']:
+        status = 'failed'
+        cur.execute("""
+            UPDATE Jobs SET status = 'failed', locked_by = NULL, last_error = %s
+            WHERE job_id = %s AND locked_by = %s AND status = 'running'
+        """, (error, job['job_id'], token))
+    else:
+        status = 'pending'
+        cur.execute("""
+            UPDATE Jobs SET status = 'pending', locked_by = NULL, last_error = %s,
+                   run_at = NOW(3) + INTERVAL %s SECOND
+            WHERE job_id = %s AND locked_by = %s AND status = 'running'
+        """, (error, backoff_delay(job['attempts']), job['job_id'], token))
+    updated = cur.rowcount
+    mysql.connection.commit()
+    return status if updated else None
+
+
+def requeue_stale(cur):
+    """把长时间处于 running 的任务放回队列（领取它的进程可能已经退出）"""
+    cur.execute("""
+        UPDATE Jobs SET status = 'pending', locked_by = NULL, last_error = '执行超时，重新入队'
+        WHERE status = 'running' AND locked_at < NOW(3) - INTERVAL %s SECOND
+    """, (STALE_AFTER,))
+    mysql.connection.commit()
+    return cur.rowcount
+
+
+def purge_done(cur):
+    """删除保留期之外的已完成任务"""
+    cur.execute("""
+        DELETE FROM Jobs WHERE status = 'done' AND updated_at < NOW() - INTERVAL %s DAY
+    """, (KEEP_DONE_DAYS,))
+    mysql.connection.commit()
+    return cur.rowcount
+
+
+def run_one(app, worker_id):
+    """领取并执行一个任务，返回是否执行了任务"""
+    with app.app_context():
+        cur = mysql.connection.cursor()
+        try:
+            job, token = _claim(cur, worker_id)
+        finally:
+            cur.close()
+    if job is None:
+        return False
+
+    # 每个任务使用独立的应用上下文，执行完归还数据库连接
+    error = None
+    with app.app_context():
+        handler = _handlers.get(job['job_type'])
+        try:
+            if handler is None:
+                raise LookupError(f"未注册的任务类型: {job['job_type']}")
+            handler(json.loads(job['payload']))
+        except Exception:
+            mysql.connection.rollback()
+            error = traceback.format_exc(limit=5)
+            app.logger.warning('任务 %s (%s) 第 %s 次执行失败', job['job_id'], job['job_type'], job['attempts'])
+
+    with app.app_context():
+        cur = mysql.connection.cursor()
+        try:
+            status = _finish(cur, job, token, error)
+        finally:
+            cur.close()
+        if status is None:
+            app.logger.warning('任务 %s (%s) 执行期间已被重新领取，丢弃本次结果', job['job_id'], job['job_type'])
+        elif status == 'failed' and job['job_type'] in _failure_handlers:
+            try:
+                _failure_handlers[job['job_type']](json.loads(job['payload']))
+            except Exception:
+                mysql.connection.rollback()
+                app.logger.exception('任务 %s (%s) 失败后的清理出错', job['job_id'], job['job_type'])
+    return True
+
+
+class WorkerPool:
+    """进程内的任务工作线程池"""
+
+    def __init__(self, app, size=2, poll_interval=1.0):
+        self.app = app
+        self.size = size
+        self.poll_interval = poll_interval
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _run(self, index):
+        worker_id = f'{self.worker_id}:{index}'
+        last_stale_check = 0
+        while not self._stop.is_set():
+            try:
+                if index == 0 and time.monotonic() - last_stale_check > STALE_AFTER / 2:
+                    last_stale_check = time.monotonic()
+                    with self.app.app_context():
+                        cur = mysql.connection.cursor()
+                        try:
+                            requeue_stale(cur)
+                            purge_done(cur)
+                        finally:
+                            cur.close()
+                if run_one(self.app, worker_id):
+                    continue
+            except Exception:
+                self.app.logger.exception('任务工作线程出错')
+            self._stop.wait(self.poll_interval)
+
+    def start(self):
+        for index in range(self.size):
+            thread = threading.Thread(target=self._run, args=(index,), name=f'job-worker-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+
+def queue_depth():
+    """各类型各状态（未完成）的任务数及最早的计划执行时间"""
+    cur = mysql.connection.cursor()
+    try:
+        cur.execute("""
+            SELECT job_type, status, COUNT(*) as count, MIN(run_at) as oldest_run_at
+            FROM Jobs
+            WHERE status IN ('pending', 'running', 'failed')
+            GROUP BY job_type, status
+            ORDER BY job_type, status
+        """)
+        return list(cur.fetchall())
+    finally:
+        cur.close()
+
+
+def queue_stats():
+    """队列统计：各类型各状态的任务数、最早到期的待执行任务，以及最近失败的任务"""
+    by_type = queue_depth()
+    cur = mysql.connection.cursor()
+    try:
+        cur.execute("""
+            SELECT job_id, job_type, attempts, max_attempts, last_error, updated_at
+            FROM Jobs
+            WHERE status = 'failed'
+            ORDER BY updated_at DESC
+            LIMIT 20
+        """)
+        failed = list(cur.fetchall())
+    finally:
+        cur.close()
+
+    totals = {'pending': 0, 'running': 0, 'failed': 0}
+    for row in by_type:
+        totals[row['status']] += row['count']
+    return {'by_type': by_type, 'totals': totals, 'failed': failed}
+
+
+def retry_job(job_id):
+    """把失败的任务重新放回队列，返回是否成功"""
+    cur = mysql.connection.cursor()
+    try:
+        cur.execute("""
+            UPDATE Jobs SET status = 'pending', attempts = 0, run_at = NOW(3), last_error = NULL
+            WHERE job_id = %s AND status = 'failed'
+        """, (job_id,))
+        mysql.connection.commit()
+        return cur.rowcount > 0
+    finally:
+        cur.close()
+
+
+def start_workers(app, size):
+    """启动工作线程，返回 WorkerPool"""
+    return WorkerPool(app, size=size, poll_interval=app.config.get('JOB_POLL_INTERVAL', 1.0)).start()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def ensure_workers(app):
+    """在 Web 进程处理第一个请求时启动工作线程（JOB_WORKERS 大于 0 时由 create_app 注册）
+
+    不在 create_app 中直接启动：flask 命令行（migrate 等）也会创建应用，
+    多进程服务器预加载应用后 fork 出的子进程也不会继承线程。
+    """
+    global _pool
+    if _pool is not None:
+        return
+    with _pool_lock:
+        if _pool is None:
+            _pool = start_workers(app, app.config['JOB_WORKERS'])
@@ -0,0 +1,150 @@
+import threading
+import time
+
+from app import mysql
+from app.page_cache import purge, tag_versions
+
+# rating / review_count 由触发器维护在 Restaurants 表上，直接读取；只取首页用到的列
+_COLUMNS = """
+    r.rest_id, r.name, r.type, r.address, r.opening_hours, r.img_url, r.img_variants,
+    r.rating, r.review_count
+"""
+
+# 排序完全由 SQL 决定（名称按列的排序规则比较），与列表页的顺序一致
+_ORDER_BY = "ORDER BY r.rating DESC, r.review_count DESC, r.name, r.rest_id"
+
+# 第 size 名的评分（idx_restaurants_rating 按评分顺序扫描，读到第 size 家有评论的餐厅即停止）
+_CUTOFF_SQL = """
+    SELECT r.rating
+    FROM Restaurants r
+    WHERE r.review_count > 0
+    ORDER BY r.rating DESC
+    LIMIT 1 OFFSET %s
+"""
+
+# 其他进程改变了排行榜时 purge 这个标签，各进程据此重新加载（见 Leaderboard.top）
+LEADERBOARD_TAG = 'leaderboard'
+
+
+class Leaderboard:
+    """首页的餐厅评分排行榜
+
+    只保存前 size 名以及与第 size 名评分相同的餐厅（第 size 名的评分即 cutoff），顺序由 SQL 排出。
+    评论或餐厅变更时由写入方调用 update()：变更的餐厅不在榜上、且新评分低于 cutoff 时
+    （绝大多数餐厅的评论都是这种情况）什么都不用做；否则标记失效，下次读取时重新加载。
+    重新加载只读取榜上的几行，代价很小。
+
+    标记失效的同时 purge LEADERBOARD_TAG，使用 file 页面缓存后端时其他进程也会重新加载；
+    没有共享的失效标记时，每个进程超过 reload_interval 秒也会重新加载一次。
+    """
+
+    def __init__(self, size=3, reload_interval=300):
+        self.size = size
+        self.reload_interval = reload_interval
+        self._rows = []         # 按排名顺序的餐厅
+        self._ids = set()
+        self._cutoff = None     # 第 size 名的评分；有评论的餐厅不足 size 家时为 None（全部在榜上）
+        self._loaded_at = None
+        self._loaded_generation = None
+        self._loaded_versions = None
+        self._generation = 0    # 每次标记失效加 1，加载期间有变更时加载结果随即作废
+        self._lock = threading.Lock()
+
+    def _query(self, size):
+        """返回 (前 size 名及并列的餐厅, cutoff)"""
+        cur = mysql.connection.cursor()
+        try:
+            cur.execute(_CUTOFF_SQL, (size - 1,))
+            row = cur.fetchone()
+            cutoff = row['rating'] if row else None
+            if cutoff is None:
+                cur.execute(f"SELECT {_COLUMNS} FROM Restaurants r WHERE r.review_count > 0 {_ORDER_BY}")
+            else:
+                cur.execute(f"""
+                    SELECT {_COLUMNS} FROM Restaurants r
+                    WHERE r.review_count > 0 AND r.rating >= %s
+                    {_ORDER_BY}
+                """, (cutoff,))
+            return [dict(row) for row in cur.fetchall()], cutoff
+        finally:
+            cur.close()
+
+    def _load(self):
+        # 先记下版本再查询：查询期间其他地方的变更会使版本不一致，下次读取时再加载
+        with self._lock:
+            generation = self._generation
+        versions = tag_versions(LEADERBOARD_TAG)
+        rows, cutoff = self._query(self.size)
+        with self._lock:
+            self._rows = rows
+            self._ids = {row['rest_id'] for row in rows}
+            self._cutoff = cutoff
+            self._loaded_at = time.monotonic()
+            self._loaded_generation = generation
+            self._loaded_versions = versions
+
+    def _stale(self):
+        if self._loaded_at is None or self._loaded_generation != self._generation:
+            return True
+        if time.monotonic() - self._loaded_at > self.reload_interval:
+            return True
+        return tag_versions(LEADERBOARD_TAG) != self._loaded_versions
+
+    def _invalidate(self):
+        with self._lock:
+            self._generation += 1
+        purge(LEADERBOARD_TAG)
+
+    def update(self, rest_id):
+        """评论或餐厅信息变更并提交后调用，变更可能影响排行榜时使其失效"""
+        cur = mysql.connection.cursor()
+        try:
+            cur.execute("SELECT rating, review_count FROM Restaurants WHERE rest_id = %s", (rest_id,))
+            row = cur.fetchone()
+        finally:
+            cur.close()
+
+        with self._lock:
+            if self._loaded_at is not None and rest_id not in self._ids:
+                qualifies = row is not None and row['review_count'] > 0 and (
+                    self._cutoff is None or row['rating'] >= self._cutoff)
+                if not qualifies:
+                    return
+        # 尚未加载（可能正在加载）、餐厅在榜上、或可能进入榜单
+        self._invalidate()
+
+    def remove(self, rest_id):
+        """餐厅被删除后调用"""
+        with self._lock:
+            if self._loaded_at is not None and rest_id not in self._ids:
+                return
+        self._invalidate()
+
+    def top(self, limit=3):
+        """返回前 limit 名，与第 limit 名评分相同的餐厅一并返回（并列排名）"""
+        if limit > self.size:
+            rows, _ = self._query(limit)
+        else:
+            if self._stale():
+                self._load()
+            with self._lock:
+                rows = self._rows
+
+        result = []
+        current_rank = 1
+        prev_rating = None
+        for i, row in enumerate(rows):
+            if len(result) >= limit and row['rating'] != prev_rating:
+                break
+
+            if prev_rating is not None and row['rating'] != prev_rating:
+                current_rank = i + 1
+
+            restaurant = dict(row)
+            restaurant['rank'] = current_rank
+            result.append(restaurant)
+            prev_rating = row['rating']
+        return result
+
+
+leaderboard = Leaderboard()
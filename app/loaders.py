@@ -0,0 +1,50 @@
+class BatchLoader:
+    """一对多关联的批量加载器（DataLoader 风格）
+
+    把对每个父记录各查一次的循环，合并成一次 IN (...) 查询，再在内存中按 key 分组。
+    query 中用 {placeholders} 表示 IN 列表的位置，例如：
+
+        loader = BatchLoader(cur, '''
+            SELECT mr.restaurant_id, u.user_id, u.username
+            FROM MerchantRestaurant mr JOIN Users u ON u.user_id = mr.merchant_id
+            WHERE mr.restaurant_id IN ({placeholders})
+        ''', key_field='restaurant_id')
+        loader.attach(restaurants, 'rest_id', 'merchant_list')
+
+    同一个加载器内已加载过的 key 会被缓存，不会重复查询。
+    """
+
+    def __init__(self, cur, query, key_field, params=(), max_batch_size=500):
+        self.cur = cur
+        self.query = query
+        self.key_field = key_field
+        self.params = tuple(params)  # 追加在 IN 列表之后的额外参数
+        self.max_batch_size = max_batch_size
+        self._cache = {}
+
+    def load_many(self, keys):
+        """批量加载，返回 {key: [行, ...]}，没有关联记录的 key 对应空列表"""
+        keys = list(dict.fromkeys(k for k in keys if k is not None))
+        missing = [k for k in keys if k not in self._cache]
+
+        for start in range(0, len(missing), self.max_batch_size):
+            batch = missing[start:start + self.max_batch_size]
+            for key in batch:
+                self._cache[key] = []
+            placeholders = ', '.join(['%s'] * len(batch))
+            self.cur.execute(self.query.format(placeholders=placeholders), (*batch, *self.params))
+            for row in self.cur.fetchall():
+                self._cache.setdefault(row[self.key_field], []).append(row)
+
+        return {key: self._cache[key] for key in keys}
+
+    def load(self, key):
+        """加载单个 key 的关联记录"""
+        return self.load_many([key])[key]
+
+    def attach(self, parents, parent_key, attr):
+        """为每个父记录设置 parent[attr] = 关联记录列表"""
+        grouped = self.load_many(parent[parent_key] for parent in parents)
+        for parent in parents:
+            parent[attr] = grouped.get(parent[parent_key], [])
+        return parents
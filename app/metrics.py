@@ -0,0 +1,290 @@
+import bisect
+import hmac
+import ipaddress
+import threading
+import time
+
+from flask import Response, abort, current_app, g, request
+
+from app import mysql, query_cache
+from app.cache import TTLCache
+
+# /metrics：Prometheus 文本格式（text/plain; version=0.0.4）的运行指标。
+#
+# 请求路径上只做无锁的计数：每个线程写自己的计数表，抓取时再把所有线程的表相加；
+# 新线程第一次记录时才登记（此时加一次锁）。Werkzeug 的多线程服务器每个请求一个线程，
+# 所以登记新线程和抓取时都会把已结束线程的计数表并入 _retired 后丢弃，计数表的数量只与存活线程数有关。
+# 连接池、缓存和任务队列的数据在抓取时读取，
+# 任务队列需要查数据库，结果缓存 QUEUE_DEPTH_TTL 秒，频繁抓取也只偶尔查询一次。
+
+# 请求耗时直方图的分桶上界（秒）
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+QUEUE_DEPTH_TTL = 10  # 秒
+
+_local = threading.local()
+_shards = []  # 存活线程的 (线程, 计数表)
+_shards_lock = threading.Lock()
+
+_queue_depth_cache = TTLCache(ttl=QUEUE_DEPTH_TTL)
+
+# 需要导出统计的进程内缓存：名称 -> 返回 stats() 字典的函数
+_caches = {}
+
+
+def _new_shard():
+    return {'requests': {}, 'latency': {}, 'db': {}, 'counters': {}}
+
+
+_retired = _new_shard()  # 已结束线程的计数之和
+
+
+def _fold(target, shard):
+    """把计数表 shard 加到 target 上（shard 可能正被其所属线程写入，只读取快照）"""
+    for key, count in list(shard['requests'].items()):
+        target['requests'][key] = target['requests'].get(key, 0) + count
+    for key, (buckets, total) in list(shard['latency'].items()):
+        merged = target['latency'].setdefault(key, [[0] * (len(BUCKETS) + 1), 0.0])
+        for i, count in enumerate(list(buckets)):
+            merged[0][i] += count
+        merged[1] += total
+    for key, (seconds, queries) in list(shard['db'].items()):
+        merged = target['db'].setdefault(key, [0.0, 0])
+        merged[0] += seconds
+        merged[1] += queries
+    for name, value in list(shard['counters'].items()):
+        target['counters'][name] = target['counters'].get(name, 0) + value
+
+
+def _retire_finished_locked():
+    """已结束的线程不会再写入，把它们的计数表并入 _retired 后丢弃（调用方持有 _shards_lock）"""
+    alive = []
+    for thread, shard in _shards:
+        if thread.is_alive():
+            alive.append((thread, shard))
+        else:
+            _fold(_retired, shard)
+    _shards[:] = alive
+
+
+def _shard():
+    shard = getattr(_local, 'shard', None)
+    if shard is None:
+        shard = _local.shard = _new_shard()
+        with _shards_lock:
+            _retire_finished_locked()
+            _shards.append((threading.current_thread(), shard))
+    return shard
+
+
+def inc(name, value=1):
+    """增加一个全局计数器（如 upload_bytes_total）"""
+    counters = _shard()['counters']
+    counters[name] = counters.get(name, 0) + value
+
+
+def register_cache(name, stats):
+    """登记一个缓存，stats 为返回 {'size', 'hits', 'misses', ...} 的函数"""
+    _caches[name] = stats
+
+
+def observe_request(blueprint, endpoint, method, status, duration, db_time, db_queries):
+    shard = _shard()
+    key = (blueprint, endpoint, method, status)
+    shard['requests'][key] = shard['requests'].get(key, 0) + 1
+
+    latency = shard['latency'].get((blueprint, endpoint))
+    if latency is None:
+        latency = shard['latency'][(blueprint, endpoint)] = [[0] * (len(BUCKETS) + 1), 0.0]
+    latency[0][bisect.bisect_left(BUCKETS, duration)] += 1
+    latency[1] += duration
+
+    db = shard['db'].get((blueprint, endpoint))
+    if db is None:
+        db = shard['db'][(blueprint, endpoint)] = [0.0, 0]
+    db[0] += db_time
+    db[1] += db_queries
+
+
+def _merge():
+    """把所有线程的计数表相加（读取时其他线程可能正在写，单次抓取的数据允许有微小偏差）"""
+    total = _new_shard()
+    with _shards_lock:
+        _retire_finished_locked()
+        _fold(total, _retired)
+        for _, shard in _shards:
+            _fold(total, shard)
+    return total['requests'], total['latency'], total['db'], total['counters']
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _format_float(value):
+    return '+Inf' if value == float('inf') else repr(float(value))
+
+
+class _Writer:
+    def __init__(self):
+        self.lines = []
+
+    def metric(self, name, kind, help_text):
+        self.lines.append(f'# HELP {name} {help_text}')
+        self.lines.append(f'# TYPE {name} {kind}')
+
+    def sample(self, name, value, **labels):
+        self.lines.append(f'{name}{_labels(**labels) if labels else ""} {value}')
+
+    def text(self):
+        return '\n'.join(self.lines) + '\n'
+
+
+def _write_requests(out, requests, latency, db):
+    out.metric('http_requests_total', 'counter', '按端点、方法和状态码统计的请求数')
+    for (blueprint, endpoint, method, status), count in sorted(requests.items()):
+        out.sample('http_requests_total', count, blueprint=blueprint, endpoint=endpoint,
+                   method=method, status=status)
+
+    out.metric('http_request_duration_seconds', 'histogram', '按端点统计的请求耗时')
+    for (blueprint, endpoint), (buckets, total) in sorted(latency.items()):
+        cumulative = 0
+        for bound, count in zip(BUCKETS + (float('inf'),), buckets):
+            cumulative += count
+            out.sample('http_request_duration_seconds_bucket', cumulative, blueprint=blueprint,
+                       endpoint=endpoint, le=_format_float(bound))
+        out.sample('http_request_duration_seconds_sum', _format_float(total),
+                   blueprint=blueprint, endpoint=endpoint)
+        out.sample('http_request_duration_seconds_count', cumulative,
+                   blueprint=blueprint, endpoint=endpoint)
+
+    out.metric('http_request_db_seconds_total', 'counter', '按端点统计的数据库耗时')
+    for (blueprint, endpoint), (seconds, _) in sorted(db.items()):
+        out.sample('http_request_db_seconds_total', _format_float(seconds),
+                   blueprint=blueprint, endpoint=endpoint)
+    out.metric('http_request_db_queries_total', 'counter', '按端点统计的 SQL 语句数')
+    for (blueprint, endpoint), (_, queries) in sorted(db.items()):
+        out.sample('http_request_db_queries_total', queries, blueprint=blueprint, endpoint=endpoint)
+
+
+def _write_pool(out):
+    stats = mysql.pool.stats()
+    gauges = {
+        'size': '已创建的连接数', 'idle': '空闲连接数', 'in_use': '使用中的连接数', 'max_size': '连接数上限',
+    }
+    for key, help_text in gauges.items():
+        out.metric(f'db_pool_{key}', 'gauge', help_text)
+        out.sample(f'db_pool_{key}', stats[key])
+    counters = {
+        'created': '累计创建的连接数', 'closed': '累计关闭的连接数', 'checkouts': '累计取出连接次数',
+        'waits': '连接池已满需要等待的次数', 'timeouts': '等待连接超时次数',
+        'health_check_failures': '健康检查失败次数',
+    }
+    for key, help_text in counters.items():
+        out.metric(f'db_pool_{key}_total', 'counter', help_text)
+        out.sample(f'db_pool_{key}_total', stats[key])
+    out.metric('db_pool_wait_seconds_total', 'counter', '等待空闲连接的累计时间')
+    out.sample('db_pool_wait_seconds_total', _format_float(stats['wait_time_total']))
+
+
+def _write_caches(out):
+    stats = {name: loader() for name, loader in sorted(_caches.items())}
+    for key, kind, help_text in (('size', 'gauge', '缓存条目数'),
+                                 ('hits', 'counter', '缓存命中次数'),
+                                 ('misses', 'counter', '缓存未命中次数'),
+                                 ('evictions', 'counter', '容量满时淘汰的条目数')):
+        name = f'cache_{key}' if kind == 'gauge' else f'cache_{key}_total'
+        out.metric(name, kind, help_text)
+        for cache, values in stats.items():
+            if key in values:
+                out.sample(name, values[key], cache=cache)
+
+
+def _load_queue_depth():
+    from app.jobs import queue_depth
+    return queue_depth()
+
+
+def _write_jobs(out):
+    rows = _queue_depth_cache.get_or_load('depth', _load_queue_depth)
+    out.metric('jobs_queue_depth', 'gauge', '后台任务队列中各类型各状态的任务数')
+    for row in rows:
+        out.sample('jobs_queue_depth', row['count'], job_type=row['job_type'], status=row['status'])
+
+
+def render_metrics():
+    requests, latency, db, counters = _merge()
+    out = _Writer()
+    _write_requests(out, requests, latency, db)
+
+    out.metric('upload_bytes_total', 'counter', '用户上传的文件字节数')
+    out.sample('upload_bytes_total', counters.get('upload_bytes_total', 0))
+
+    _write_pool(out)
+    _write_caches(out)
+    try:
+        _write_jobs(out)
+    except Exception as e:
+        # 数据库不可用时仍然返回其他指标
+        current_app.logger.warning('读取任务队列深度失败: %s', e)
+    return out.text()
+
+
+def _is_loopback(addr):
+    try:
+        return ipaddress.ip_address(addr or '').is_loopback
+    except ValueError:
+        return False
+
+
+def register_metrics(app):
+    """注册请求计数钩子和 /metrics 地址（由 create_app 调用）
+
+    设置 METRICS_TOKEN 时，抓取请求需要带 Authorization: Bearer <token>。
+    """
+    from app.categories import nav_categories_cache
+    from app.cities import city_list_cache
+    from app.models.user import user_cache
+    from app.page_cache import cache_stats
+    from app.sql_stats import current_stats
+
+    register_cache('query', query_cache.stats)
+    register_cache('page', cache_stats)
+    register_cache('user', user_cache.stats)
+    register_cache('categories', nav_categories_cache.stats)
+    register_cache('cities', city_list_cache.stats)
+
+    @app.before_request
+    def start_metrics_timer():
+        g._metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.get('_metrics_started')
+        if started is None or request.endpoint == 'metrics':
+            return response
+        sql = current_stats() or {}
+        observe_request(request.blueprint or '', request.endpoint or 'unmatched', request.method,
+                        str(response.status_code), time.perf_counter() - started,
+                        sql.get('time', 0.0), sql.get('queries', 0))
+        return response
+
+    def metrics():
+        # 设置了令牌时按令牌校验；否则只允许调试模式或本机抓取，指标中有各端点流量、连接池和任务队列状态
+        token = app.config.get('METRICS_TOKEN')
+        if token:
+            supplied = request.headers.get('Authorization', '')
+            if not hmac.compare_digest(supplied, f'Bearer {token}'):
+                abort(401)
+        elif not app.debug and not _is_loopback(request.remote_addr):
+            abort(403)
+        response = Response(render_metrics(), mimetype='text/plain')
+        response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
+    app.add_url_rule('/metrics', 'metrics', metrics)
@@ -0,0 +1,133 @@
+import os
+import re
+
+from flask import current_app
+
+from app import mysql
+
+# 增量迁移脚本目录，文件名形如 003_query_indexes.sql，按编号顺序执行
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), 'sql', 'migrations')
+
+# 多进程同时启动时用于串行化迁移的命名锁
+_LOCK_NAME = 'restaurant_db.schema_migrations'
+_LOCK_TIMEOUT = 60  # 秒
+
+_MIGRATION_FILE = re.compile(r'^(\d+)_([\w-]+)\.sql$')
+
+_CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version    VARCHAR(20) PRIMARY KEY,
+        name       VARCHAR(255) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+def available_migrations():
+    """返回目录中的迁移脚本 [(版本号, 名称, 路径), ...]，按版本号排序"""
+    migrations = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = _MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((match.group(1), match.group(2), os.path.join(MIGRATIONS_DIR, filename)))
+    return sorted(migrations, key=lambda m: int(m[0]))
+
+
+def split_statements(script):
+    """把 SQL 脚本拆成单条语句
+
+    支持 mysql 客户端的 DELIMITER 指令（触发器定义中会用到），
+    跳过 USE 语句，连接已经指向 MYSQL_DB 配置的数据库。
+    """
+    statements = []
+    delimiter = ';'
+    buffer = []
+    for line in script.splitlines():
+        stripped = line.strip()
+        if not buffer and (not stripped or stripped.startswith('--')):
+            continue
+        if stripped.upper().startswith('DELIMITER '):
+            delimiter = stripped.split(None, 1)[1]
+            continue
+
+        buffer.append(line)
+        if stripped.endswith(delimiter):
+            statement = '\n'.join(buffer).rstrip()[:-len(delimiter)].strip()
+            buffer = []
+            if statement and not re.match(r'(?i)^USE\s', statement):
+                statements.append(statement)
+
+    tail = '\n'.join(buffer).strip()
+    if tail:
+        statements.append(tail)
+    return statements
+
+
+def applied_versions(cur):
+    cur.execute(_CREATE_TABLE_SQL)
+    cur.execute("SELECT version FROM schema_migrations")
+    return {row['version'] for row in cur.fetchall()}
+
+
+def pending_migrations():
+    cur = mysql.connection.cursor()
+    try:
+        applied = applied_versions(cur)
+    finally:
+        cur.close()
+    return [m for m in available_migrations() if m[0] not in applied]
+
+
+def apply_migration(version, name, path, fake=False):
+    """执行一个迁移脚本并记录版本；fake 为 True 时只记录不执行
+
+    MySQL 的 DDL 会隐式提交，脚本中途失败时前面的语句不会回滚，
+    修复后需手动处理已执行的部分再重新运行。
+    """
+    cur = mysql.connection.cursor()
+    try:
+        if not fake:
+            with open(path, encoding='utf-8') as f:
+                for statement in split_statements(f.read()):
+                    cur.execute(statement)
+        cur.execute(
+            "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+            (version, name)
+        )
+        mysql.connection.commit()
+    except Exception:
+        mysql.connection.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def migrate(fake=False, target=None):
+    """按顺序执行未执行的迁移（target 指定时只执行到该版本为止），返回本次执行的 [(版本号, 名称), ...]
+
+    用 MySQL 命名锁保证多个进程同时启动时只有一个在执行迁移。
+    """
+    cur = mysql.connection.cursor()
+    try:
+        cur.execute("SELECT GET_LOCK(%s, %s) as locked", (_LOCK_NAME, _LOCK_TIMEOUT))
+        if not cur.fetchone()['locked']:
+            raise RuntimeError('等待迁移锁超时，可能有其他进程正在执行迁移')
+        try:
+            done = []
+            for version, name, path in pending_migrations():
+                if target is not None and int(version) > int(target):
+                    break
+                apply_migration(version, name, path, fake=fake)
+                done.append((version, name))
+            return done
+        finally:
+            cur.execute("SELECT RELEASE_LOCK(%s)", (_LOCK_NAME,))
+    finally:
+        cur.close()
+
+
+def bootstrap(app):
+    """应用启动时执行未执行的迁移（AUTO_MIGRATE 开启时由 create_app 调用）"""
+    with app.app_context():
+        for version, name in migrate():
+            current_app.logger.info('已执行迁移 %s_%s', version, name)
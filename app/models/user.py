@@ -1,7 +1,24 @@
-from flask_login import UserMixin
-from app import mysql
+from app import mysql, query_cache
+from app.cache import TTLCache
+
+# user_loader 的用户缓存：按 user_id 缓存，容量有限（LRU），短 TTL 限制多进程间的不一致时间
+user_cache = TTLCache(ttl=60, maxsize=1024)
+
+
+class User:
+    """登录用户
+
+    使用 __slots__ 减少缓存中每个实例的内存占用，因此不继承 UserMixin（它没有 __slots__），
+    Flask-Login 需要的属性和方法在这里直接实现。
+    """
+
+    __slots__ = ('id', 'username', 'email', 'user_type', 'phone', 'join_date')
+
+    # 能加载到的用户都是未注销的有效用户
+    is_authenticated = True
+    is_active = True
+    is_anonymous = False
 
-class User(UserMixin):
     def __init__(self, user_id, username, email, user_type, phone=None, join_date=None):
         self.id = user_id
         self.username = username
@@ -10,12 +27,36 @@ class User(UserMixin):
         self.phone = phone
         self.join_date = join_date  # 添加这个参数
     
+    @staticmethod
+    def load(user_id):
+        """user_loader 使用的加载入口，先查缓存"""
+        try:
+            key = int(user_id)
+        except (TypeError, ValueError):
+            return None
+        user = user_cache.get(key)
+        if user is None:
+            # 不存在、已注销或查询失败时返回 None，不缓存，避免数据库短暂故障导致用户被登出
+            user = User.get(key)
+            if user is not None:
+                user_cache.set(key, user)
+        return user
+    
+    @staticmethod
+    def invalidate(user_id):
+        """用户资料或状态变更后调用，使缓存失效"""
+        user_cache.invalidate(int(user_id))
+        query_cache.bump('users')
+    
     @staticmethod
     def get(user_id):
         """根据用户ID获取用户对象"""
         try:
             cur = mysql.connection.cursor()
-            cur.execute("SELECT * FROM users WHERE user_id = %s AND is_deleted = 0", (user_id,))
+            cur.execute("""
+                SELECT user_id, username, email, user_type, phone, join_date
+                FROM users WHERE user_id = %s AND is_deleted = 0
+            """, (user_id,))
             user_data = cur.fetchone()
             cur.close()
             
@@ -106,6 +147,7 @@ class User(UserMixin):
                 VALUES (%s, %s, %s, %s, %s, 0)
             """, (username, email, password, user_type, phone))
             mysql.connection.commit()
+            query_cache.bump('users')
             user_id = cur.lastrowid
             cur.close()
             
@@ -118,6 +160,20 @@ class User(UserMixin):
         """Flask-Login要求的方法"""
         return str(self.id)
     
+    def __eq__(self, other):
+        if isinstance(other, User):
+            return self.get_id() == other.get_id()
+        return NotImplemented
+    
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+    
+    def __hash__(self):
+        return hash(self.get_id())
+    
     def is_admin(self):
         """检查是否为管理员"""
         return self.user_type == 'admin'
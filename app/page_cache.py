@@ -0,0 +1,222 @@
+import functools
+import hashlib
+import os
+import pickle
+import threading
+import time
+import uuid
+
+from flask import current_app, request, session
+
+from app.cache import TTLCache
+
+# 整页响应缓存：缓存与用户无关的外壳页面（见 app/shell.py）的完整响应。
+#
+# - 键为路径 + 规范化后的查询参数（去掉空值，按参数名和值排序）
+# - 每个条目带若干标签，例如 restaurant:<id>、category:<名称>、reviews、favourites；
+#   页面显示的每种数据都要有对应的标签，写入该数据的视图提交后 purge 它；
+#   purge(标签) 递增标签的版本号，读取时条目记录的标签版本与当前不一致即视为失效，
+#   不需要找出并删除具体条目
+# - 后端可选进程内（memory）或本机文件（file，多个进程共享，适合多进程部署）；
+#   memory 后端的 purge 只作用于当前进程，多进程部署时其他进程的条目要等 TTL 过期
+#
+# 只缓存 200 且 Cache-Control 为 public 的响应；带提示消息的页面（private）不缓存，
+# 会话中有待显示的提示消息时也不使用缓存。
+
+DEFAULT_TTL = 300  # 秒
+
+_CACHED_HEADERS = ('Content-Type', 'Cache-Control', 'ETag', 'Last-Modified')
+
+
+class MemoryBackend:
+    """进程内后端"""
+
+    def __init__(self, maxsize=512):
+        self.entries = TTLCache(maxsize=maxsize)
+        self._tags = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, entry, ttl):
+        self.entries.set(key, entry, ttl=ttl)
+
+    def tag_versions(self, tags):
+        return {tag: self._tags.get(tag, 0) for tag in tags}
+
+    def bump(self, tag):
+        with self._lock:
+            self._tags[tag] = self._tags.get(tag, 0) + 1
+
+    def clear(self):
+        self.entries.invalidate()
+
+    def stats(self):
+        return dict(self.entries.stats(), backend='memory', tags=len(self._tags))
+
+
+class FileBackend:
+    """本机文件后端：条目和标签版本各存一个文件，同一台机器上的进程共享
+
+    标签版本文件用递增的计数器，写入时先写临时文件再改名，并发 purge 可能丢失一次递增，
+    但版本号总会与条目记录的值不同，条目仍然失效。
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(os.path.join(directory, 'entries'), exist_ok=True)
+        os.makedirs(os.path.join(directory, 'tags'), exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, kind, name):
+        digest = hashlib.sha1(name.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, kind, digest)
+
+    def _write(self, path, data):
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, key):
+        try:
+            with open(self._path('entries', key), 'rb') as f:
+                expires_at, entry = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+        if expires_at <= time.time():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def set(self, key, entry, ttl):
+        self._write(self._path('entries', key), pickle.dumps((time.time() + ttl, entry)))
+
+    def _read_tag(self, tag):
+        try:
+            with open(self._path('tags', tag), 'rb') as f:
+                return int(f.read() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def tag_versions(self, tags):
+        return {tag: self._read_tag(tag) for tag in tags}
+
+    def bump(self, tag):
+        self._write(self._path('tags', tag), str(self._read_tag(tag) + 1).encode())
+
+    def clear(self):
+        folder = os.path.join(self.directory, 'entries')
+        for filename in os.listdir(folder):
+            try:
+                os.remove(os.path.join(folder, filename))
+            except OSError:
+                pass
+
+    def stats(self):
+        return {'backend': 'file', 'directory': self.directory,
+                'size': len(os.listdir(os.path.join(self.directory, 'entries'))),
+                'hits': self.hits, 'misses': self.misses}
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """按 PAGE_CACHE_BACKEND 配置创建后端（memory、file 或 none），none 时返回 None"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                config = current_app.config
+                kind = config.get('PAGE_CACHE_BACKEND', 'memory')
+                if kind == 'file':
+                    _backend = FileBackend(config['PAGE_CACHE_DIR'])
+                elif kind == 'memory':
+                    _backend = MemoryBackend(config.get('PAGE_CACHE_MAXSIZE', 512))
+                else:
+                    _backend = False
+    return _backend or None
+
+
+def cache_key():
+    """路径 + 规范化的查询参数"""
+    args = sorted((name, value) for name, values in request.args.lists()
+                  for value in values if value != '')
+    query = '&'.join(f'{name}={value}' for name, value in args)
+    return f'{request.path}?{query}'
+
+
+def tag(kind, value):
+    """生成 kind:value 形式的标签，value 为空时返回 None（会被忽略）"""
+    if value is None or value == '':
+        return None
+    return f'{kind}:{value}'
+
+
+def purge(*tags):
+    """使带有这些标签的页面失效（在写操作提交之后调用）"""
+    backend = get_backend()
+    if backend is None:
+        return
+    for tag in tags:
+        if tag:
+            backend.bump(tag)
+
+
+def tag_versions(*tags):
+    """当前的标签版本，未启用缓存时返回 None；进程内的数据可用它判断其他进程是否 purge 过"""
+    backend = get_backend()
+    if backend is None:
+        return None
+    return backend.tag_versions(tags)
+
+
+def _usable():
+    return request.method == 'GET' and not session.get('_flashes')
+
+
+def cached_page(tags, ttl=None):
+    """视图装饰器：tags 为接收视图参数、返回标签列表的函数"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            backend = get_backend()
+            if backend is None or not _usable():
+                return view(*args, **kwargs)
+
+            key = cache_key()
+            entry_tags = [name for name in tags(**kwargs) if name]
+            entry = backend.get(key)
+            if entry is not None and entry['tags'] == backend.tag_versions(entry['tags']):
+                response = current_app.response_class(entry['body'], status=entry['status'],
+                                                      headers=entry['headers'])
+                response.headers['X-Cache'] = 'HIT'
+                return response.make_conditional(request)
+
+            # 渲染前记录标签版本：渲染期间发生的 purge 会让这次写入的条目立即失效
+            versions = backend.tag_versions(entry_tags)
+            response = current_app.make_response(view(*args, **kwargs))
+            cache_control = response.headers.get('Cache-Control', '')
+            if response.status_code == 200 and 'public' in cache_control and not response.direct_passthrough:
+                backend.set(key, {
+                    'status': response.status_code,
+                    'headers': [(name, response.headers[name]) for name in _CACHED_HEADERS
+                                if name in response.headers],
+                    'body': response.get_data(),
+                    'tags': versions,
+                }, current_app.config.get('PAGE_CACHE_TTL', DEFAULT_TTL) if ttl is None else ttl)
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+
+def cache_stats():
+    backend = get_backend()
+    return backend.stats() if backend else {'backend': 'none'}
@@ -0,0 +1,134 @@
+import datetime
+import decimal
+
+from flask import current_app
+from itsdangerous import BadData, URLSafeSerializer
+
+DEFAULT_PAGE_SIZE = 20
+
+
+class KeysetPage:
+    """一页查询结果及前后翻页游标"""
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def _serializer():
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt='keyset-cursor')
+
+
+def _plain(value):
+    if isinstance(value, datetime.datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        # 保留类型：按 Decimal 传回查询时 MySQL 按精确小数比较，不会转成浮点数
+        return {'dec': str(value)}
+    return value
+
+
+def _restore(value):
+    if isinstance(value, dict) and 'dec' in value:
+        try:
+            return decimal.Decimal(value['dec'])
+        except decimal.InvalidOperation:
+            return None
+    return value
+
+
+def encode_cursor(row, order_by, direction):
+    """将一行的排序键编码为不透明游标；direction 为 'next' 或 'prev'"""
+    values = [_plain(row[key]) for _, key, _ in order_by]
+    return _serializer().dumps({'d': direction, 'k': values})
+
+
+def decode_cursor(token, order_by):
+    """解析游标，非法或被篡改的游标返回 (None, None)，即回到第一页"""
+    if not token:
+        return None, None
+    try:
+        data = _serializer().loads(token)
+    except BadData:
+        return None, None
+    if data.get('d') not in ('next', 'prev') or len(data.get('k', [])) != len(order_by):
+        return None, None
+    return data['d'], [_restore(value) for value in data['k']]
+
+
+def _keyset_condition(order_by, values, backwards):
+    """生成 (a < x) OR (a = x AND b > y) ... 形式的条件，支持各列排序方向不同"""
+    clauses = []
+    params = []
+    for i, (column, _, descending) in enumerate(order_by):
+        parts = [f"{order_by[j][0]} = %s" for j in range(i)]
+        params.extend(values[:i])
+        operator = '<' if descending != backwards else '>'
+        parts.append(f"{column} {operator} %s")
+        params.append(values[i])
+        clauses.append('(' + ' AND '.join(parts) + ')')
+    return '(' + ' OR '.join(clauses) + ')', params
+
+
+def paginate(cur, select, order_by, cursor=None, conditions=(), params=(),
+             group_by=None, page_size=None):
+    """基于游标（keyset）的分页查询
+
+    select 为不含 WHERE/ORDER BY/LIMIT 的 SELECT ... FROM ... 语句；
+    order_by 为 [(列表达式, 结果字段名, 是否降序), ...]，最后一列必须唯一（通常是主键），
+    保证排序稳定。
+    """
+    page_size = page_size or current_app.config.get('PAGE_SIZE', DEFAULT_PAGE_SIZE)
+    direction, values = decode_cursor(cursor, order_by)
+    backwards = direction == 'prev'
+
+    conditions = list(conditions)
+    params = list(params)
+    if values is not None:
+        keyset_sql, keyset_params = _keyset_condition(order_by, values, backwards)
+        conditions.append(keyset_sql)
+        params.extend(keyset_params)
+
+    sql = select
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    if group_by:
+        sql += " GROUP BY " + group_by
+    sql += " ORDER BY " + ", ".join(
+        f"{column} {'DESC' if descending != backwards else 'ASC'}"
+        for column, _, descending in order_by
+    )
+    sql += " LIMIT %s"
+    params.append(page_size + 1)
+
+    cur.execute(sql, params)
+    rows = list(cur.fetchall())
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if backwards:
+            next_cursor = encode_cursor(rows[-1], order_by, 'next')
+            if has_more:
+                prev_cursor = encode_cursor(rows[0], order_by, 'prev')
+        else:
+            if has_more:
+                next_cursor = encode_cursor(rows[-1], order_by, 'next')
+            if values is not None:
+                prev_cursor = encode_cursor(rows[0], order_by, 'prev')
+
+    return KeysetPage(rows, next_cursor, prev_cursor)
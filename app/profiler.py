@@ -0,0 +1,142 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+
+from flask import g, request
+from flask_login import current_user
+
+# 线上请求的按需性能剖析：
+# - 管理员请求带 X-Profile: 1 时剖析该请求；或按 PROFILE_SAMPLE_RATE 的比例随机抽样
+# - 用 cProfile 记录从第一个 before_request 到最后一个 after_request 的全过程（含模板渲染）
+# - 结果写入 PROFILE_DIR，只保留最新的 PROFILE_KEEP 份（环形缓冲），管理后台可查看和下载
+#
+# cProfile 同一时间只能有一个在运行（Python 3.12 起对所有线程生效），
+# 已有请求在剖析时，其他请求直接跳过。
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_KEEP = 50
+SUMMARY_LIMIT = 40  # 摘要中显示的函数数
+
+_active = threading.Lock()
+_NAME = re.compile(r'^\d{8}-\d{6}-[0-9a-f]{8}$')
+
+
+def _wanted(app):
+    if request.headers.get(PROFILE_HEADER) == '1':
+        # 只有管理员可以用请求头触发，避免被外部请求用来拖慢服务
+        return current_user.is_authenticated and current_user.user_type == 'admin', 'header'
+    rate = app.config.get('PROFILE_SAMPLE_RATE', 0.0)
+    return rate > 0 and random.random() < rate, 'sample'
+
+
+def _prune(directory, keep):
+    names = sorted(f[:-5] for f in os.listdir(directory) if f.endswith('.json'))
+    for name in names[:-keep] if keep else names:
+        for ext in ('.json', '.prof'):
+            try:
+                os.remove(os.path.join(directory, name + ext))
+            except OSError:
+                pass
+
+
+def _save(app, profiler, meta):
+    directory = app.config['PROFILE_DIR']
+    os.makedirs(directory, exist_ok=True)
+    name = time.strftime('%Y%m%d-%H%M%S') + '-' + uuid.uuid4().hex[:8]
+    profiler.dump_stats(os.path.join(directory, name + '.prof'))
+    # 元数据最后写入：列表只显示有 .json 的记录，不会列出写了一半的剖析结果
+    with open(os.path.join(directory, name + '.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    _prune(directory, app.config.get('PROFILE_KEEP', PROFILE_KEEP))
+    return name
+
+
+def list_profiles(directory):
+    """按时间倒序返回剖析记录的元数据"""
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for filename in sorted(os.listdir(directory), reverse=True):
+        if not filename.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, filename), encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        meta['name'] = filename[:-5]
+        profiles.append(meta)
+    return profiles
+
+
+def profile_path(directory, name):
+    """剖析结果文件的路径，名称不合法或文件不存在时返回 None"""
+    if not _NAME.match(name):
+        return None
+    path = os.path.join(directory, name + '.prof')
+    return path if os.path.exists(path) else None
+
+
+def profile_summary(path, sort='cumulative', limit=SUMMARY_LIMIT):
+    """pstats 的文本摘要"""
+    output = io.StringIO()
+    stats = pstats.Stats(path, stream=output)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return output.getvalue()
+
+
+def register_profiler(app):
+    """注册剖析钩子（由 create_app 最先调用：before_request 最先执行，after_request 最后执行）"""
+
+    @app.before_request
+    def start_profile():
+        wanted, trigger = _wanted(app)
+        if not wanted or not _active.acquire(blocking=False):
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # 其他剖析工具正在运行
+            _active.release()
+            return
+        g._profile = (profiler, trigger, time.perf_counter())
+
+    @app.after_request
+    def finish_profile(response):
+        profile = g.pop('_profile', None)
+        if profile is None:
+            return response
+        profiler, trigger, started = profile
+        try:
+            profiler.disable()
+            meta = {
+                'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'method': request.method,
+                'path': request.full_path.rstrip('?'),
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'duration_ms': round((time.perf_counter() - started) * 1000, 1),
+                'trigger': trigger,
+            }
+            response.headers['X-Profile-Id'] = _save(app, profiler, meta)
+        except Exception:
+            app.logger.exception('保存剖析结果失败')
+        finally:
+            _active.release()
+        return response
+
+    @app.teardown_request
+    def abandon_profile(exception):
+        # 请求异常终止、没有执行 after_request 时释放
+        profile = g.pop('_profile', None)
+        if profile is not None:
+            profile[0].disable()
+            _active.release()
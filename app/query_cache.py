@@ -0,0 +1,132 @@
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# 只读查询结果缓存：按 SQL + 参数缓存 SELECT 的结果。
+#
+# - 每个条目登记查询涉及的表及当时各表的版本号；写操作提交后调用 bump(表名)
+#   递增版本号，读取时版本不一致的条目视为失效并丢弃
+# - 按 LRU 淘汰，总大小（按行数据估算）不超过 QUERY_CACHE_MAX_BYTES
+# - 版本号只在当前进程内有效，多进程部署时其他进程的条目最多再保留 QUERY_CACHE_TTL 秒
+#
+# 表名不区分大小写（SQL 中 RestaurantCategories 与 restaurantcategories 是同一张表）。
+
+DEFAULT_MAX_BYTES = 8 * 1024 * 1024
+DEFAULT_TTL = 300  # 秒
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _normalize_sql(sql):
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def _estimate_size(rows):
+    """估算结果占用的内存（字节），只需要量级准确"""
+    size = sys.getsizeof(rows)
+    for row in rows:
+        size += sys.getsizeof(row)
+        for key, value in row.items():
+            size += sys.getsizeof(key) + sys.getsizeof(value)
+    return size
+
+
+class QueryCache:
+    """线程安全的查询结果缓存"""
+
+    def __init__(self, app=None, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (过期时间, 表版本, 大小, 行)
+        self._versions = {}  # 表名 -> 版本号
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_bytes = app.config.get('QUERY_CACHE_MAX_BYTES', self.max_bytes)
+        self.ttl = app.config.get('QUERY_CACHE_TTL', self.ttl)
+
+    def _table_versions(self, tables):
+        return tuple((table, self._versions.get(table, 0)) for table in tables)
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry[2]
+
+    def fetchall(self, cur, sql, params=(), tables=(), ttl=None):
+        """执行（或从缓存取得）只读查询，返回行的列表
+
+        tables 为查询读取的所有表，任何一张表 bump 后结果失效；
+        返回的行与缓存共享，调用方不能修改。
+        """
+        if not tables:
+            raise ValueError('必须指定查询涉及的表')
+        normalized = _normalize_sql(sql)
+        if not normalized.upper().startswith('SELECT'):
+            raise ValueError('只能缓存 SELECT 查询')
+
+        tables = tuple(sorted(table.lower() for table in tables))
+        key = (normalized, tuple(params or ()))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now and entry[1] == self._table_versions(tables):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[3]
+                if entry[1] != self._table_versions(tables):
+                    self.invalidations += 1
+                self._drop(key)
+            self.misses += 1
+            # 查询前记录版本：查询期间发生的写入会让这次的结果在下次读取时失效
+            versions = self._table_versions(tables)
+
+        cur.execute(sql, params or None)
+        rows = list(cur.fetchall())
+        size = _estimate_size(rows)
+        if size > self.max_bytes:
+            return rows  # 单个结果超过总预算，不缓存
+
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (expires_at, versions, size, rows)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+        return rows
+
+    def fetchone(self, cur, sql, params=(), tables=(), ttl=None):
+        rows = self.fetchall(cur, sql, params, tables, ttl)
+        return rows[0] if rows else None
+
+    def bump(self, *tables):
+        """表数据变更后（提交之后）调用，使读取这些表的缓存结果失效"""
+        with self._lock:
+            for table in tables:
+                table = table.lower()
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'size': len(self._entries), 'bytes': self._bytes, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': self.hits / lookups if lookups else 0.0,
+                    'evictions': self.evictions, 'invalidations': self.invalidations}
@@ -1,16 +1,24 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, current_app
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, current_app, abort, send_file
 from flask_login import login_required, current_user
 from werkzeug.security import generate_password_hash
-from werkzeug.utils import secure_filename
-from app import mysql
-import os
-import uuid
+from app import mysql, query_cache
+from app.loaders import BatchLoader
+from app.pagination import paginate
+from app.leaderboard import leaderboard
+from app.address import parse_address
+from app.categories import invalidate_categories
+from app.cities import invalidate_cities
+from app.images import ImageError, discard_upload, queue_image_jobs, release_image, stage_upload
+from app.jobs import queue_stats, retry_job
+from app.models.user import User
+from app.page_cache import purge, tag
+from app.profiler import list_profiles, profile_path, profile_summary
 
 admin_bp = Blueprint('admin', __name__)
 
 def allowed_file(filename):
     """检查文件扩展名是否允许"""
-    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
@@ -83,38 +91,32 @@ def manage_restaurants():
     cur = mysql.connection.cursor()
     try:
         # 获取餐厅信息和关联的商家详细信息
-        cur.execute("""
-            SELECT r.*, 
-                   COALESCE(AVG(rev.rating), 0) as avg_rating,
-                   COUNT(DISTINCT rev.review_id) as review_count
+        page = paginate(cur, """
+            SELECT r.*, r.rating as avg_rating
             FROM Restaurants r
-            LEFT JOIN Reviews rev ON r.rest_id = rev.rest_id
-            GROUP BY r.rest_id
-            ORDER BY r.name
-        """)
-        restaurants = cur.fetchall()
+        """, [('r.name', 'name', False), ('r.rest_id', 'rest_id', False)],
+            cursor=request.args.get('cursor'))
+        restaurants = page.items
         
-        # 获取每个餐厅的商家信息
-        for restaurant in restaurants:
-            cur.execute("""
-                SELECT u.user_id, u.username 
-                FROM Users u
-                JOIN MerchantRestaurant mr ON u.user_id = mr.merchant_id
-                WHERE mr.restaurant_id = %s AND u.user_type = 'merchant'
-                ORDER BY u.username
-            """, (restaurant['rest_id'],))
-            restaurant['merchant_list'] = cur.fetchall()
+        # 一次查询批量获取本页餐厅的商家信息
+        merchant_loader = BatchLoader(cur, """
+            SELECT mr.restaurant_id, u.user_id, u.username 
+            FROM Users u
+            JOIN MerchantRestaurant mr ON u.user_id = mr.merchant_id
+            WHERE mr.restaurant_id IN ({placeholders}) AND u.user_type = 'merchant'
+            ORDER BY u.username
+        """, key_field='restaurant_id')
+        merchant_loader.attach(restaurants, 'rest_id', 'merchant_list')
         
         # 获取所有商家列表（用于分配）
-        cur.execute("""
+        merchants = query_cache.fetchall(cur, """
             SELECT user_id, username 
             FROM Users 
             WHERE user_type = 'merchant' AND is_deleted = FALSE 
             ORDER BY username
-        """)
-        merchants = cur.fetchall()
+        """, tables=['Users'])
         
-        return render_template('admin/restaurants.html', restaurants=restaurants, merchants=merchants)
+        return render_template('admin/restaurants.html', restaurants=restaurants, merchants=merchants, page=page)
     finally:
         cur.close()
 
@@ -134,28 +136,25 @@ def add_restaurant():
         flash('请填写所有必需字段', 'error')
         return redirect(url_for('admin.manage_restaurants'))
     
-    # 处理图片上传
-    img_url = None
+    # 处理图片上传：请求中只暂存原图，各尺寸的 WebP/JPEG 由后台任务生成
+    staged = None
     if 'restaurant_image' in request.files:
         file = request.files['restaurant_image']
         if file and file.filename != '' and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            # 生成唯一文件名
-            unique_filename = str(uuid.uuid4()) + '.' + filename.rsplit('.', 1)[1].lower()
-            file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
-            
-            # 确保上传目录存在
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            file.save(file_path)
-            img_url = url_for('static', filename='uploads/' + unique_filename)
+            try:
+                staged = stage_upload(file)
+            except ImageError as e:
+                flash(str(e), 'error')
+                return redirect(url_for('admin.manage_restaurants'))
     
     cur = mysql.connection.cursor()
     try:
         # 添加餐厅
+        province, city, district = parse_address(address)
         cur.execute("""
-            INSERT INTO Restaurants (name, address, phone, opening_hours, type, img_url)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (name, address, phone, opening_hours, type_cuisine, img_url))
+            INSERT INTO Restaurants (name, address, province, city, district, phone, opening_hours, type)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """, (name, address, province, city, district, phone, opening_hours, type_cuisine))
         
         restaurant_id = cur.lastrowid
         
@@ -167,10 +166,16 @@ def add_restaurant():
                     VALUES (%s, %s)
                 """, (merchant_id, restaurant_id))
         
+        if staged:
+            queue_image_jobs('Restaurants', restaurant_id, staged)
         mysql.connection.commit()
+        invalidate_cities()
+        query_cache.bump('MerchantRestaurant')
+        purge('restaurants', tag('category', type_cuisine))
         flash('餐厅添加成功', 'success')
     except Exception as e:
         mysql.connection.rollback()
+        discard_upload(staged)
         flash(f'添加失败: {str(e)}', 'error')
     finally:
         cur.close()
@@ -185,36 +190,41 @@ def edit_restaurant(rest_id):
     cur = mysql.connection.cursor()
     try:
         # 获取餐厅信息
-        cur.execute("""
-            SELECT r.*, u.username as merchant_name, u.user_id as merchant_id
-            FROM Restaurants r
-            LEFT JOIN MerchantRestaurant mr ON r.rest_id = mr.restaurant_id
-            LEFT JOIN Users u ON mr.merchant_id = u.user_id
-            WHERE r.rest_id = %s
-        """, (rest_id,))
+        cur.execute("SELECT * FROM Restaurants WHERE rest_id = %s", (rest_id,))
         
         restaurant = cur.fetchone()
         if not restaurant:
             flash('餐厅不存在', 'error')
             return redirect(url_for('admin.manage_restaurants'))
         
+        # 获取餐厅的全部管理商家
+        merchant_loader = BatchLoader(cur, """
+            SELECT mr.restaurant_id, u.user_id, u.username
+            FROM MerchantRestaurant mr
+            JOIN Users u ON mr.merchant_id = u.user_id
+            WHERE mr.restaurant_id IN ({placeholders})
+            ORDER BY u.username
+        """, key_field='restaurant_id')
+        merchant_list = merchant_loader.load(rest_id)
+        restaurant['merchant_list'] = merchant_list
+        restaurant['merchant_id'] = merchant_list[0]['user_id'] if merchant_list else None
+        restaurant['merchant_name'] = '、'.join(m['username'] for m in merchant_list) or None
+        
         # 获取所有商家用户
-        cur.execute("""
+        merchants = query_cache.fetchall(cur, """
             SELECT user_id, username, email 
             FROM Users 
             WHERE user_type = 'merchant'
             ORDER BY username
-        """)
-        merchants = cur.fetchall()
+        """, tables=['Users'])
         
         # 获取餐厅类别
-        cur.execute("""
+        categories = query_cache.fetchall(cur, """
             SELECT category_name, description
             FROM restaurantcategories 
             WHERE is_active = 1
             ORDER BY category_name
-        """)
-        categories = cur.fetchall()
+        """, tables=['restaurantcategories'])
         
         return render_template('admin/edit_restaurant.html', 
                              restaurant=restaurant, 
@@ -239,10 +249,11 @@ def update_restaurant(rest_id):
         flash('请填写所有必需字段', 'error')
         return redirect(url_for('admin.edit_restaurant', rest_id=rest_id))
     
+    staged = None
     cur = mysql.connection.cursor()
     try:
         # 获取当前餐厅信息
-        cur.execute("SELECT img_url FROM Restaurants WHERE rest_id = %s", (rest_id,))
+        cur.execute("SELECT type FROM Restaurants WHERE rest_id = %s", (rest_id,))
         restaurant = cur.fetchone()
         
         if not restaurant:
@@ -250,35 +261,19 @@ def update_restaurant(rest_id):
             return redirect(url_for('admin.manage_restaurants'))
         
         # 处理图片上传
-        img_url = restaurant['img_url']  # 保持原有图片
         if 'restaurant_image' in request.files:
             file = request.files['restaurant_image']
             if file and file.filename != '' and allowed_file(file.filename):
-                # 删除旧图片（如果存在且不是默认图片）
-                if img_url and img_url.startswith('/static/uploads/'):
-                    old_file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 
-                                               img_url.split('/')[-1])
-                    if os.path.exists(old_file_path):
-                        try:
-                            os.remove(old_file_path)
-                        except:
-                            pass  # 忽略删除失败
-                
-                # 保存新图片
-                filename = secure_filename(file.filename)
-                unique_filename = str(uuid.uuid4()) + '.' + filename.rsplit('.', 1)[1].lower()
-                file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
-                
-                os.makedirs(os.path.dirname(file_path), exist_ok=True)
-                file.save(file_path)
-                img_url = url_for('static', filename='uploads/' + unique_filename)
+                staged = stage_upload(file)
         
         # 更新餐厅信息
+        province, city, district = parse_address(address)
         cur.execute("""
             UPDATE Restaurants 
-            SET name = %s, address = %s, phone = %s, opening_hours = %s, type = %s, img_url = %s
+            SET name = %s, address = %s, province = %s, city = %s, district = %s,
+                phone = %s, opening_hours = %s, type = %s
             WHERE rest_id = %s
-        """, (name, address, phone, opening_hours, restaurant_type, img_url, rest_id))
+        """, (name, address, province, city, district, phone, opening_hours, restaurant_type, rest_id))
         
         # 更新商家关联
         if merchant_id:
@@ -293,12 +288,20 @@ def update_restaurant(rest_id):
             # 如果没有选择商家，删除所有关联
             cur.execute("DELETE FROM MerchantRestaurant WHERE restaurant_id = %s", (rest_id,))
         
+        if staged:
+            queue_image_jobs('Restaurants', rest_id, staged)
         mysql.connection.commit()
+        leaderboard.update(rest_id)
+        invalidate_cities()
+        query_cache.bump('MerchantRestaurant')
+        purge(tag('restaurant', rest_id), 'restaurants',
+              tag('category', restaurant['type']), tag('category', restaurant_type))
         flash('餐厅信息更新成功', 'success')
         return redirect(url_for('admin.manage_restaurants'))
         
     except Exception as e:
         mysql.connection.rollback()
+        discard_upload(staged)
         flash(f'更新失败: {str(e)}', 'error')
         return redirect(url_for('admin.edit_restaurant', rest_id=rest_id))
     finally:
@@ -312,7 +315,7 @@ def delete_restaurant(rest_id):
     cur = mysql.connection.cursor()
     try:
         # 获取餐厅信息
-        cur.execute("SELECT name, img_url FROM Restaurants WHERE rest_id = %s", (rest_id,))
+        cur.execute("SELECT name, type, img_url, img_variants FROM Restaurants WHERE rest_id = %s", (rest_id,))
         restaurant = cur.fetchone()
         
         if not restaurant:
@@ -321,23 +324,23 @@ def delete_restaurant(rest_id):
         
         restaurant_name = restaurant['name']
         
+        # 餐厅及其菜品的图片，随删除一起释放引用
+        cur.execute("SELECT img_url, img_variants FROM Dishes WHERE rest_id = %s", (rest_id,))
+        for image in [restaurant] + list(cur.fetchall()):
+            release_image(image['img_url'], image['img_variants'])
+        
         # 删除相关数据
         cur.execute("DELETE FROM Reviews WHERE rest_id = %s", (rest_id,))
         cur.execute("DELETE FROM Dishes WHERE rest_id = %s", (rest_id,))
         cur.execute("DELETE FROM MerchantRestaurant WHERE restaurant_id = %s", (rest_id,))
         cur.execute("DELETE FROM Restaurants WHERE rest_id = %s", (rest_id,))
         
-        # 删除图片文件
-        if restaurant['img_url'] and restaurant['img_url'].startswith('/static/uploads/'):
-            file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 
-                                   restaurant['img_url'].split('/')[-1])
-            if os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                except:
-                    pass  # 忽略删除失败
-        
         mysql.connection.commit()
+        leaderboard.remove(rest_id)
+        invalidate_cities()
+        query_cache.bump('MerchantRestaurant')
+        purge(tag('restaurant', rest_id), 'restaurants', 'reviews', 'dishes',
+              tag('category', restaurant['type']))
         flash(f'餐厅 "{restaurant_name}" 删除成功', 'success')
         
     except Exception as e:
@@ -378,6 +381,7 @@ def assign_merchant():
             VALUES (%s, %s)
         """, (merchant_id, restaurant_id))
         mysql.connection.commit()
+        query_cache.bump('MerchantRestaurant')
         flash('商家分配成功', 'success')
     except Exception as e:
         mysql.connection.rollback()
@@ -426,6 +430,7 @@ def remove_merchant():
             WHERE merchant_id = %s AND restaurant_id = %s
         """, (merchant_id, restaurant_id))
         mysql.connection.commit()
+        query_cache.bump('MerchantRestaurant')
         
         return jsonify({
             'success': True, 
@@ -444,16 +449,16 @@ def manage_reviews():
     """管理评论"""
     cur = mysql.connection.cursor()
     try:
-        cur.execute("""
+        page = paginate(cur, """
             SELECT r.*, u.username, rest.name as restaurant_name,
                    rep.reply_id, rep.content as reply_content, rep.reply_time
             FROM Reviews r
             JOIN Users u ON r.user_id = u.user_id
             JOIN Restaurants rest ON r.rest_id = rest.rest_id
             LEFT JOIN Replies rep ON r.review_id = rep.review_id
-            ORDER BY r.review_time DESC
-        """)
-        reviews_data = cur.fetchall()
+        """, [('r.review_time', 'review_time', True), ('r.review_id', 'review_id', True)],
+            cursor=request.args.get('cursor'))
+        reviews_data = page.items
         
         # 处理评论和回复
         reviews = {}
@@ -469,12 +474,13 @@ def manage_reviews():
                     'rating': row['rating'],
                     'comment': row['comment'],
                     'review_time': row['review_time'],
+                    'reply_id': row['reply_id'],
                     'reply_content': row['reply_content'],
                     'reply_time': row['reply_time']
                 }
         
         reviews_list = list(reviews.values())
-        return render_template('admin/reviews.html', reviews=reviews_list)
+        return render_template('admin/reviews.html', reviews=reviews_list, page=page)
     finally:
         cur.close()
 
@@ -496,6 +502,8 @@ def delete_review(review_id):
         # 删除评论
         cur.execute("DELETE FROM Reviews WHERE review_id = %s", (review_id,))
         mysql.connection.commit()
+        leaderboard.update(review['rest_id'])
+        purge(tag('restaurant', review['rest_id']), 'reviews')
         
         flash('评论删除成功', 'success')
     except Exception as e:
@@ -514,7 +522,12 @@ def delete_reply(reply_id):
     cur = mysql.connection.cursor()
     try:
         # 获取回复信息
-        cur.execute("SELECT review_id FROM Replies WHERE reply_id = %s", (reply_id,))
+        cur.execute("""
+            SELECT r.review_id, rv.rest_id
+            FROM Replies r
+            JOIN Reviews rv ON r.review_id = rv.review_id
+            WHERE r.reply_id = %s
+        """, (reply_id,))
         reply = cur.fetchone()
         
         if not reply:
@@ -524,6 +537,7 @@ def delete_reply(reply_id):
         # 删除回复
         cur.execute("DELETE FROM Replies WHERE reply_id = %s", (reply_id,))
         mysql.connection.commit()
+        purge(tag('restaurant', reply['rest_id']))
         
         flash('回复删除成功', 'success')
     except Exception as e:
@@ -541,13 +555,12 @@ def manage_users():
     """管理用户"""
     cur = mysql.connection.cursor()
     try:
-        cur.execute("""
+        page = paginate(cur, """
             SELECT user_id, username, email, phone, join_date, user_type, is_deleted
             FROM Users 
-            ORDER BY join_date DESC
-        """)
-        users = cur.fetchall()
-        return render_template('admin/users.html', users=users)
+        """, [('join_date', 'join_date', True), ('user_id', 'user_id', True)],
+            cursor=request.args.get('cursor'))
+        return render_template('admin/users.html', users=page.items, page=page)
     finally:
         cur.close()
 
@@ -572,6 +585,7 @@ def toggle_user_status(user_id):
         new_status = not user['is_deleted']
         cur.execute("UPDATE Users SET is_deleted = %s WHERE user_id = %s", (new_status, user_id))
         mysql.connection.commit()
+        User.invalidate(user_id)
         
         status_text = '禁用' if new_status else '启用'
         flash(f'用户 "{user["username"]}" {status_text}成功', 'success')
@@ -635,6 +649,8 @@ def add_category():
         """, (category_name, description))
         
         mysql.connection.commit()
+        invalidate_categories()
+        purge('categories', tag('category', category_name))
         flash('类别添加成功', 'success')
         
     except Exception as e:
@@ -717,6 +733,9 @@ def edit_category(category_id):
                 return redirect(url_for('admin.edit_category', category_id=category_id))
             
             mysql.connection.commit()
+            invalidate_categories()
+            purge('categories', tag('category', existing_category['category_name']),
+                  tag('category', category_name))
             flash('类别信息更新成功', 'success')
             return redirect(url_for('admin.manage_categories'))
             
@@ -773,6 +792,8 @@ def delete_category(category_id):
             return redirect(url_for('admin.manage_categories'))
         
         mysql.connection.commit()
+        invalidate_categories()
+        purge('categories', tag('category', category_name))
         print(f"成功删除类别: {category_name}")
         flash(f'类别 "{category_name}" 删除成功', 'success')
         
@@ -797,25 +818,6 @@ def manage_issues():
     
     cur = mysql.connection.cursor()
     try:
-        # 确保表存在
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS IssueReports (
-                report_id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT NULL,
-                reporter_name VARCHAR(100) NOT NULL,
-                reporter_email VARCHAR(100),
-                issue_type ENUM('bug', 'feature', 'complaint', 'suggestion', 'other') NOT NULL,
-                subject VARCHAR(200) NOT NULL,
-                description TEXT NOT NULL,
-                status ENUM('pending', 'in_progress', 'resolved', 'closed') DEFAULT 'pending',
-                priority ENUM('low', 'medium', 'high', 'urgent') DEFAULT 'medium',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                admin_response TEXT,
-                FOREIGN KEY (user_id) REFERENCES Users(user_id) ON DELETE SET NULL
-            )
-        """)
-        
         # 构建查询条件
         where_clause = ""
         params = []
@@ -892,6 +894,58 @@ def update_issue(report_id):
     
     return redirect(url_for('admin.manage_issues'))
 
+@admin_bp.route('/jobs')
+@login_required
+@admin_required
+def manage_jobs():
+    """后台任务队列：各类型的积压情况和最近失败的任务"""
+    stats = queue_stats()
+    return render_template('admin/jobs.html', **stats)
+
+@admin_bp.route('/jobs/<int:job_id>/retry', methods=['POST'])
+@login_required
+@admin_required
+def retry_failed_job(job_id):
+    """重新执行失败的任务"""
+    if retry_job(job_id):
+        flash(f'任务 {job_id} 已重新加入队列', 'success')
+    else:
+        flash('任务不存在或不是失败状态', 'error')
+    return redirect(url_for('admin.manage_jobs'))
+
+@admin_bp.route('/profiles')
+@login_required
+@admin_required
+def manage_profiles():
+    """性能剖析记录列表，可查看摘要或下载 .prof 文件（用 snakeviz、pstats 等工具分析）"""
+    profiles = list_profiles(current_app.config['PROFILE_DIR'])
+    return render_template('admin/profiles.html', profiles=profiles,
+                           sample_rate=current_app.config.get('PROFILE_SAMPLE_RATE', 0))
+
+@admin_bp.route('/profiles/<name>')
+@login_required
+@admin_required
+def view_profile(name):
+    """剖析结果的文本摘要"""
+    path = profile_path(current_app.config['PROFILE_DIR'], name)
+    if path is None:
+        abort(404)
+    sort = request.args.get('sort', 'cumulative')
+    if sort not in ('cumulative', 'tottime', 'ncalls'):
+        sort = 'cumulative'
+    return render_template('admin/profile.html', name=name, sort=sort,
+                           summary=profile_summary(path, sort=sort))
+
+@admin_bp.route('/profiles/<name>/download')
+@login_required
+@admin_required
+def download_profile(name):
+    """下载剖析结果（pstats 格式）"""
+    path = profile_path(current_app.config['PROFILE_DIR'], name)
+    if path is None:
+        abort(404)
+    return send_file(path, as_attachment=True, download_name=f'{name}.prof')
+
 @admin_bp.route('/manage_restaurant_merchants/<int:rest_id>')
 @login_required
 @admin_required
@@ -918,7 +972,7 @@ def manage_restaurant_merchants(rest_id):
         current_merchants = cur.fetchall()
         
         # 获取所有商户（显示是否已分配）
-        cur.execute("""
+        all_merchants = query_cache.fetchall(cur, """
             SELECT u.user_id, u.username, u.email, u.phone,
                    CASE WHEN mr.merchant_id IS NOT NULL THEN TRUE ELSE FALSE END as is_assigned
             FROM Users u
@@ -926,8 +980,7 @@ def manage_restaurant_merchants(rest_id):
                 AND mr.restaurant_id = %s
             WHERE u.user_type = 'merchant' AND u.is_deleted = FALSE
             ORDER BY is_assigned DESC, u.username
-        """, (rest_id,))
-        all_merchants = cur.fetchall()
+        """, (rest_id,), tables=['Users', 'MerchantRestaurant'])
         
         return render_template('admin/manage_restaurant_merchants.html', 
                              restaurant=restaurant,
@@ -977,6 +1030,7 @@ def assign_merchant_to_restaurant():
                 VALUES (%s, %s)
             """, (merchant_id, restaurant_id))
             mysql.connection.commit()
+            query_cache.bump('MerchantRestaurant')
             flash(f'成功将商户 {merchant["username"]} 分配给餐厅 {restaurant["name"]}', 'success')
         
     except Exception as e:
@@ -1015,6 +1069,7 @@ def remove_merchant_from_restaurant():
         """, (merchant_id, restaurant_id))
         
         mysql.connection.commit()
+        query_cache.bump('MerchantRestaurant')
         
         if merchant and restaurant:
             flash(f'成功移除商户 {merchant["username"]} 对餐厅 {restaurant["name"]} 的管理权限', 'success')
@@ -1,57 +1,39 @@
 from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
 from flask_login import current_user
-from app import mysql
+from flask_wtf.csrf import generate_csrf
+from app import mysql, query_cache
+from app.address import normalize_city
+from app.categories import get_active_categories
+from app.cities import get_cities
+from app.leaderboard import leaderboard
+from app.search import search_restaurants, search_dishes
+from app.page_cache import cached_page
+from app.shell import shell_response
 
 main_bp = Blueprint('main', __name__)
 
 @main_bp.route('/')
+@cached_page(lambda: ['restaurants', 'reviews', 'categories'])
 def index():
     """首页"""
     cur = mysql.connection.cursor()
     try:
-        # 获取评分最高的餐厅，相同评分按评论数排序
-        cur.execute("""
-            SELECT r.*, 
-                   COALESCE(AVG(rev.rating), 0) as rating,
-                   COUNT(rev.review_id) as review_count
-            FROM Restaurants r 
-            LEFT JOIN Reviews rev ON r.rest_id = rev.rest_id
-            GROUP BY r.rest_id
-            HAVING COUNT(rev.review_id) > 0
-            ORDER BY rating DESC, review_count DESC, r.name
-        """)
-        all_restaurants = cur.fetchall()
-        
-        # 处理并列排名
-        top_restaurants = []
-        current_rank = 1
-        prev_rating = None
-        
-        for i, restaurant in enumerate(all_restaurants):
-            if len(top_restaurants) >= 3 and restaurant['rating'] != prev_rating:
-                break
-                
-            if prev_rating is not None and restaurant['rating'] != prev_rating:
-                current_rank = i + 1
-            
-            restaurant_dict = dict(restaurant)
-            restaurant_dict['rank'] = current_rank
-            top_restaurants.append(restaurant_dict)
-            prev_rating = restaurant['rating']
+        # 获取评分最高的餐厅（含并列排名），由排行榜增量维护
+        top_restaurants = leaderboard.top(3)
 
         # 获取所有分类
-        cur.execute("""
+        categories = query_cache.fetchall(cur, """
             SELECT category_id, category_name, description
             FROM restaurantcategories 
             ORDER BY category_name
-        """)
-        categories = cur.fetchall()
+        """, tables=['restaurantcategories'])
         
-        return render_template('index.html', top_restaurants=top_restaurants,categories=categories)
+        return shell_response('index.html', top_restaurants=top_restaurants, categories=categories)
     finally:
         cur.close()
 
 @main_bp.route('/search')
+@cached_page(lambda: ['restaurants', 'reviews', 'dishes'])
 def search():
     """搜索餐厅和菜品"""
     query = request.args.get('q', '').strip()
@@ -67,40 +49,18 @@ def search():
         dishes = []
         
         if search_type in ['all', 'restaurant']:
-            # 搜索餐厅
-            cur.execute("""
-                SELECT r.*, 
-                       COALESCE(AVG(rev.rating), 0) as rating,
-                       COUNT(rev.review_id) as review_count
-                FROM Restaurants r 
-                LEFT JOIN Reviews rev ON r.rest_id = rev.rest_id
-                WHERE r.name LIKE %s OR r.type LIKE %s OR r.address LIKE %s
-                GROUP BY r.rest_id
-                ORDER BY rating DESC, r.name
-                LIMIT 20
-            """, (f'%{query}%', f'%{query}%', f'%{query}%'))
-            restaurants = cur.fetchall()
+            # 搜索餐厅（全文索引，按相关度排序）
+            restaurants = search_restaurants(cur, query)
         
         if search_type in ['all', 'dish']:
             # 搜索菜品
-            cur.execute("""
-                SELECT d.*, r.name as restaurant_name, r.rest_id,
-                       COUNT(DISTINCT rec.user_id) as rec_count
-                FROM Dishes d
-                JOIN Restaurants r ON d.rest_id = r.rest_id
-                LEFT JOIN Recommendations rec ON d.dish_id = rec.dish_id
-                WHERE d.name LIKE %s OR d.description LIKE %s
-                GROUP BY d.dish_id
-                ORDER BY rec_count DESC, d.name
-                LIMIT 20
-            """, (f'%{query}%', f'%{query}%'))
-            dishes = cur.fetchall()
+            dishes = search_dishes(cur, query)
         
-        return render_template('search_results.html', 
-                             query=query, 
-                             search_type=search_type,
-                             restaurants=restaurants, 
-                             dishes=dishes)
+        return shell_response('search_results.html',
+                              query=query,
+                              search_type=search_type,
+                              restaurants=restaurants,
+                              dishes=dishes)
     except Exception as e:
         flash(f'搜索出错: {str(e)}', 'error')
         return redirect(url_for('main.index'))
@@ -110,72 +70,97 @@ def search():
 @main_bp.route('/api/cities')
 def api_cities():
     """获取城市列表API"""
-    cur = mysql.connection.cursor()
     try:
-        # 从餐厅地址中提取城市信息
-        cur.execute("""
-            SELECT DISTINCT 
-                CASE 
-                    WHEN address LIKE '%市%' THEN 
-                        CONCAT(
-                            SUBSTRING_INDEX(
-                                SUBSTRING_INDEX(address, '市', 1), 
-                                CASE 
-                                    WHEN address LIKE '%省%' THEN '省'
-                                    WHEN address LIKE '%自治区%' THEN '自治区'
-                                    WHEN address LIKE '%直辖市%' THEN '直辖市'
-                                    ELSE '|'  -- 不太可能的分隔符
-                                END, 
-                                -1
-                            ), 
-                            '市'
-                        )
-                    ELSE NULL
-                END as city
-            FROM Restaurants 
-            WHERE address IS NOT NULL AND address != ''
-            HAVING city IS NOT NULL AND city != '市'
-            ORDER BY city
-        """)
+        # 城市在写入餐厅时已解析到 Restaurants.city，这里只读缓存
+        cities = get_cities()
         
-        cities = [row['city'] for row in cur.fetchall()]
-        
-        # 如果提取失败，提供默认城市列表
+        # 还没有可识别城市的餐厅时，提供默认城市列表
         if not cities:
             cities = ['北京市', '上海市', '广州市', '深圳市', '杭州市', '南京市', '武汉市', '成都市']
         
         return jsonify({'cities': cities})
     except Exception as e:
         return jsonify({'cities': [], 'error': str(e)})
-    finally:
-        cur.close()
+
+# /api/user_state 单次最多查询的餐厅/菜品数
+USER_STATE_MAX_IDS = 200
+
+def _id_list(name):
+    """解析逗号分隔的 id 参数"""
+    ids = []
+    for value in request.args.get(name, '').split(','):
+        if value.strip().isdigit():
+            ids.append(int(value))
+    return ids[:USER_STATE_MAX_IDS]
+
+@main_bp.route('/api/user_state')
+def api_user_state():
+    """外壳页面的个人状态：登录用户、CSRF 令牌，以及页面上餐厅的收藏状态和菜品的推荐状态
+
+    参数 rest_ids、dish_ids 为逗号分隔的 id，每类各一次 IN 查询。
+    """
+    state = {
+        'authenticated': current_user.is_authenticated,
+        'user': None,
+        'csrf_token': generate_csrf(),
+        'favorites': [],
+        'recommended': [],
+    }
+    if current_user.is_authenticated:
+        state['user'] = {
+            'id': current_user.id,
+            'username': current_user.username,
+            'user_type': current_user.user_type,
+        }
+
+    if current_user.is_authenticated and current_user.user_type == 'user':
+        rest_ids, dish_ids = _id_list('rest_ids'), _id_list('dish_ids')
+        cur = mysql.connection.cursor()
+        try:
+            if rest_ids:
+                placeholders = ', '.join(['%s'] * len(rest_ids))
+                cur.execute(f"""
+                    SELECT rest_id FROM Favourites
+                    WHERE user_id = %s AND rest_id IN ({placeholders})
+                """, (current_user.id, *rest_ids))
+                state['favorites'] = [row['rest_id'] for row in cur.fetchall()]
+            if dish_ids:
+                placeholders = ', '.join(['%s'] * len(dish_ids))
+                cur.execute(f"""
+                    SELECT dish_id FROM Recommendations
+                    WHERE user_id = %s AND dish_id IN ({placeholders})
+                """, (current_user.id, *dish_ids))
+                state['recommended'] = [row['dish_id'] for row in cur.fetchall()]
+        finally:
+            cur.close()
+
+    response = jsonify(state)
+    response.headers['Cache-Control'] = 'private, no-store'
+    return response
 
 @main_bp.route('/city_restaurants')
+@cached_page(lambda: ['restaurants', 'reviews'])
 def city_restaurants():
     """按城市显示餐厅"""
-    city = request.args.get('city', '').strip()
+    city = normalize_city(request.args.get('city', ''))
     
     cur = mysql.connection.cursor()
     try:
         if city:
-            # 搜索指定城市的餐厅
+            # 按解析出的城市等值查询（idx_restaurants_city）
             cur.execute("""
-                SELECT r.*, 
-                       COALESCE(AVG(rev.rating), 0) as rating,
-                       COUNT(rev.review_id) as review_count
+                SELECT r.*
                 FROM Restaurants r 
-                LEFT JOIN Reviews rev ON r.rest_id = rev.rest_id
-                WHERE r.address LIKE %s
-                GROUP BY r.rest_id
-                ORDER BY rating DESC, r.name
-            """, (f'%{city}%',))
+                WHERE r.city = %s
+                ORDER BY r.rating DESC, r.name
+            """, (city,))
             restaurants = cur.fetchall()
         else:
             restaurants = []
         
-        return render_template('city_restaurants.html', 
-                             restaurants=restaurants, 
-                             selected_city=city)
+        return shell_response('city_restaurants.html',
+                              restaurants=restaurants,
+                              selected_city=city)
     finally:
         cur.close()
 
@@ -199,25 +184,6 @@ def submit_issue():
     
     cur = mysql.connection.cursor()
     try:
-        # 确保表存在
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS IssueReports (
-                report_id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT NULL,
-                reporter_name VARCHAR(100) NOT NULL,
-                reporter_email VARCHAR(100),
-                issue_type ENUM('bug', 'feature', 'complaint', 'suggestion', 'other') NOT NULL,
-                subject VARCHAR(200) NOT NULL,
-                description TEXT NOT NULL,
-                status ENUM('pending', 'in_progress', 'resolved', 'closed') DEFAULT 'pending',
-                priority ENUM('low', 'medium', 'high', 'urgent') DEFAULT 'medium',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                admin_response TEXT,
-                FOREIGN KEY (user_id) REFERENCES Users(user_id) ON DELETE SET NULL
-            )
-        """)
-        
         # 插入问题报告
         user_id = current_user.id if current_user.is_authenticated else None
         cur.execute("""
@@ -239,42 +205,12 @@ def submit_issue():
 @main_bp.route('/api/restaurant_categories')
 def api_restaurant_categories():
     """获取餐厅类别API"""
-    cur = mysql.connection.cursor()
     try:
-        # 确保表存在并获取所有活跃类别
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS RestaurantCategories (
-                category_id INT AUTO_INCREMENT PRIMARY KEY,
-                category_name VARCHAR(100) NOT NULL UNIQUE,
-                description TEXT,
-                is_active BOOLEAN DEFAULT TRUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # 插入现有的餐厅类别（如果还没有）
-        cur.execute("""
-            INSERT IGNORE INTO RestaurantCategories (category_name, description) 
-            SELECT DISTINCT type, CONCAT(type, '类型餐厅') 
-            FROM Restaurants 
-            WHERE type IS NOT NULL AND type != ''
-        """)
-        
-        # 获取所有活跃类别
-        cur.execute("""
-            SELECT category_name, description
-            FROM RestaurantCategories 
-            WHERE is_active = TRUE
-            ORDER BY category_name
-        """)
-        
-        categories = cur.fetchall()
-        mysql.connection.commit()
+        # 表由迁移创建，类别由 flask sync-categories 同步，这里只读缓存
+        categories = get_active_categories()
         
         return jsonify({
             'categories': [{'name': cat['category_name'], 'description': cat['description']} for cat in categories]
         })
     except Exception as e:
-        return jsonify({'categories': [], 'error': str(e)})
-    finally:
-        cur.close()
\ No newline at end of file
+        return jsonify({'categories': [], 'error': str(e)})
\ No newline at end of file
@@ -1,13 +1,15 @@
 from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
 from flask_login import login_required, current_user
 from app import mysql
-import os
-from werkzeug.utils import secure_filename
-from flask import current_app
-import uuid  
+from app.address import parse_address
+from app.cities import invalidate_cities
+from app.images import ImageError, discard_upload, queue_image_jobs, release_image, stage_upload
+from app.pagination import paginate
+from app.leaderboard import leaderboard
+from app.page_cache import purge, tag
 
 # 在文件顶部添加允许的文件扩展名
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -27,14 +29,10 @@ def my_restaurants():
     try:
         # 获取该商家管理的所有餐厅 - 修复字段名
         cur.execute("""
-            SELECT r.*, 
-                   COALESCE(AVG(rv.rating), 0) as avg_rating,
-                   COUNT(rv.review_id) as review_count
+            SELECT r.*, r.rating as avg_rating
             FROM Restaurants r
             JOIN MerchantRestaurant mr ON r.rest_id = mr.restaurant_id
-            LEFT JOIN Reviews rv ON r.rest_id = rv.rest_id
             WHERE mr.merchant_id = %s
-            GROUP BY r.rest_id, r.name, r.address, r.phone, r.opening_hours, r.type, r.img_url, r.rating, r.review_count, r.star_count
             ORDER BY r.name
         """, (current_user.id,))
         
@@ -56,14 +54,12 @@ def manage_dishes():
         # 获取商家的所有餐厅和菜品
         cur.execute("""
             SELECT r.rest_id, r.name as restaurant_name,
-                   d.dish_id, d.name as dish_name, d.price, d.description, d.img_url,
-                   COALESCE(COUNT(rec.user_id), 0) as rec_count
+                   d.dish_id, d.name as dish_name, d.price, d.description, d.img_url, d.img_variants,
+                   COALESCE(d.rec_count, 0) as rec_count
             FROM Restaurants r
             JOIN MerchantRestaurant mr ON r.rest_id = mr.restaurant_id
             LEFT JOIN Dishes d ON r.rest_id = d.rest_id
-            LEFT JOIN Recommendations rec ON d.dish_id = rec.dish_id
             WHERE mr.merchant_id = %s
-            GROUP BY r.rest_id, d.dish_id
             ORDER BY r.name, d.name
         """, (current_user.id,))
         dishes_data = cur.fetchall()
@@ -99,18 +95,16 @@ def add_dish():
         flash('请填写所有必需字段', 'error')
         return redirect(url_for('merchant.manage_dishes'))
     
-    # 处理图片上传
-    img_url = None
+    # 处理图片上传：请求中只暂存原图，各尺寸的 WebP/JPEG 由后台任务生成
+    staged = None
     if 'dish_image' in request.files:
         file = request.files['dish_image']
         if file and file.filename != '' and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            # 生成唯一文件名
-            import uuid
-            unique_filename = str(uuid.uuid4()) + '.' + filename.rsplit('.', 1)[1].lower()
-            file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
-            file.save(file_path)
-            img_url = url_for('static', filename='uploads/' + unique_filename)
+            try:
+                staged = stage_upload(file)
+            except ImageError as e:
+                flash(str(e), 'error')
+                return redirect(url_for('merchant.manage_dishes'))
     
     cur = mysql.connection.cursor()
     try:
@@ -121,18 +115,23 @@ def add_dish():
         """, (current_user.id, rest_id))
         
         if cur.fetchone()['count'] == 0:
+            discard_upload(staged)
             flash('您无权在该餐厅添加菜品', 'error')
             return redirect(url_for('merchant.manage_dishes'))
         
         # 添加菜品
         cur.execute("""
-            INSERT INTO Dishes (rest_id, name, price, description, img_url)
-            VALUES (%s, %s, %s, %s, %s)
-        """, (rest_id, name, price, description, img_url))
+            INSERT INTO Dishes (rest_id, name, price, description)
+            VALUES (%s, %s, %s, %s)
+        """, (rest_id, name, price, description))
+        if staged:
+            queue_image_jobs('Dishes', cur.lastrowid, staged)
         mysql.connection.commit()
+        purge(tag('restaurant', rest_id), 'dishes')
         flash('菜品添加成功', 'success')
     except Exception as e:
         mysql.connection.rollback()
+        discard_upload(staged)
         flash(f'添加失败: {str(e)}', 'error')
     finally:
         cur.close()
@@ -183,11 +182,12 @@ def update_dish(dish_id):
         flash('请填写所有必需字段', 'error')
         return redirect(url_for('merchant.edit_dish', dish_id=dish_id))
     
+    staged = None
     cur = mysql.connection.cursor()
     try:
         # 验证权限并获取当前菜品信息
         cur.execute("""
-            SELECT d.img_url
+            SELECT d.rest_id
             FROM Dishes d
             JOIN Restaurants r ON d.rest_id = r.rest_id
             JOIN MerchantRestaurant mr ON r.rest_id = mr.restaurant_id
@@ -200,28 +200,27 @@ def update_dish(dish_id):
             return redirect(url_for('merchant.manage_dishes'))
         
         # 处理图片上传
-        img_url = dish['img_url']  # 保持原有图片
         if 'dish_image' in request.files:
             file = request.files['dish_image']
             if file and file.filename != '' and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                # 生成唯一文件名
-                import uuid
-                unique_filename = str(uuid.uuid4()) + '.' + filename.rsplit('.', 1)[1].lower()
-                file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
-                file.save(file_path)
-                img_url = url_for('static', filename='uploads/' + unique_filename)
+                staged = stage_upload(file)
         
         # 更新菜品
         cur.execute("""
             UPDATE Dishes 
-            SET name = %s, price = %s, description = %s, img_url = %s
+            SET name = %s, price = %s, description = %s
             WHERE dish_id = %s
-        """, (name, price, description, img_url, dish_id))
+        """, (name, price, description, dish_id))
+        
+        # 图片由后台任务处理，完成后替换原来的图片
+        if staged:
+            queue_image_jobs('Dishes', dish_id, staged)
         mysql.connection.commit()
+        purge(tag('restaurant', dish['rest_id']), 'dishes')
         flash('菜品更新成功', 'success')
     except Exception as e:
         mysql.connection.rollback()
+        discard_upload(staged)
         flash(f'更新失败: {str(e)}', 'error')
     finally:
         cur.close()
@@ -240,7 +239,7 @@ def delete_dish(dish_id):
     try:
         # 验证权限
         cur.execute("""
-            SELECT d.name
+            SELECT d.name, d.rest_id, d.img_url, d.img_variants
             FROM Dishes d
             JOIN Restaurants r ON d.rest_id = r.rest_id
             JOIN MerchantRestaurant mr ON r.rest_id = mr.restaurant_id
@@ -254,7 +253,9 @@ def delete_dish(dish_id):
         
         # 删除菜品
         cur.execute("DELETE FROM Dishes WHERE dish_id = %s", (dish_id,))
+        release_image(dish['img_url'], dish['img_variants'])
         mysql.connection.commit()
+        purge(tag('restaurant', dish['rest_id']), 'dishes')
         flash(f'菜品 "{dish["name"]}" 删除成功', 'success')
     except Exception as e:
         mysql.connection.rollback()
@@ -276,7 +277,7 @@ def replies():
     cur = mysql.connection.cursor()
     try:
         # 获取该商家管理的餐厅的所有评论和回复
-        cur.execute("""
+        page = paginate(cur, """
             SELECT rv.review_id, rv.rating, rv.comment as review_text, rv.timestamp as review_date,
                    u.username as reviewer_name,
                    rest.name as restaurant_name, rest.rest_id,
@@ -286,12 +287,11 @@ def replies():
             JOIN MerchantRestaurant mr ON rest.rest_id = mr.restaurant_id
             LEFT JOIN Users u ON rv.user_id = u.user_id
             LEFT JOIN Replies r ON rv.review_id = r.review_id
-            WHERE mr.merchant_id = %s
-            ORDER BY rv.timestamp DESC
-        """, (current_user.id,))
+        """, [('rv.timestamp', 'review_date', True), ('rv.review_id', 'review_id', True)],
+            cursor=request.args.get('cursor'),
+            conditions=['mr.merchant_id = %s'], params=[current_user.id])
         
-        reviews = cur.fetchall()
-        return render_template('merchant/replies.html', reviews=reviews)
+        return render_template('merchant/replies.html', reviews=page.items, page=page)
     finally:
         cur.close()
 
@@ -372,6 +372,7 @@ def update_reply(reply_id):
         """, (reply_text, reply_id))
         
         mysql.connection.commit()
+        purge(tag('restaurant', reply['rest_id']))
         flash('回复更新成功', 'success')
         return redirect(url_for('merchant.replies'))
         
@@ -439,6 +440,7 @@ def add_reply():
         """, (review_id, rest_id, reply_content))
         
         mysql.connection.commit()
+        purge(tag('restaurant', rest_id))
         flash('回复发送成功', 'success')
         
         # 根据来源页面决定重定向
@@ -476,7 +478,7 @@ def delete_reply(reply_id):
     try:
         # 验证权限：确保这个回复是该商家的
         cur.execute("""
-            SELECT r.reply_id, rest.name as restaurant_name
+            SELECT r.reply_id, rest.rest_id, rest.name as restaurant_name
             FROM Replies r
             JOIN Reviews rv ON r.review_id = rv.review_id
             JOIN Restaurants rest ON rv.rest_id = rest.rest_id
@@ -493,6 +495,7 @@ def delete_reply(reply_id):
         cur.execute("DELETE FROM Replies WHERE reply_id = %s", (reply_id,))
         
         mysql.connection.commit()
+        purge(tag('restaurant', reply['rest_id']))
         flash('回复删除成功', 'success')
         
     except Exception as e:
@@ -555,11 +558,12 @@ def update_restaurant(rest_id):
         flash('请填写所有必需字段', 'error')
         return redirect(url_for('merchant.edit_restaurant', rest_id=rest_id))
     
+    staged = None
     cur = mysql.connection.cursor()
     try:
         # 验证权限
         cur.execute("""
-            SELECT r.img_url
+            SELECT r.rest_id
             FROM Restaurants r
             JOIN MerchantRestaurant mr ON r.rest_id = mr.restaurant_id
             WHERE r.rest_id = %s AND mr.merchant_id = %s
@@ -571,42 +575,32 @@ def update_restaurant(rest_id):
             return redirect(url_for('merchant.my_restaurants'))
         
         # 处理图片上传
-        img_url = restaurant['img_url']  # 保持原有图片
         if 'restaurant_image' in request.files:
             file = request.files['restaurant_image']
             if file and file.filename != '' and allowed_file(file.filename):
-                # 删除旧图片（如果存在且不是默认图片）
-                if img_url and img_url.startswith('/static/uploads/'):
-                    old_file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 
-                                               img_url.split('/')[-1])
-                    if os.path.exists(old_file_path):
-                        try:
-                            os.remove(old_file_path)
-                        except:
-                            pass  # 忽略删除失败
-                
-                # 保存新图片
-                filename = secure_filename(file.filename)
-                unique_filename = str(uuid.uuid4()) + '.' + filename.rsplit('.', 1)[1].lower()
-                file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
-                
-                os.makedirs(os.path.dirname(file_path), exist_ok=True)
-                file.save(file_path)
-                img_url = url_for('static', filename='uploads/' + unique_filename)
+                staged = stage_upload(file)
         
         # 更新餐厅信息
+        province, city, district = parse_address(address)
         cur.execute("""
             UPDATE Restaurants 
-            SET name = %s, address = %s, phone = %s, opening_hours = %s, type = %s, img_url = %s
+            SET name = %s, address = %s, province = %s, city = %s, district = %s,
+                phone = %s, opening_hours = %s, type = %s
             WHERE rest_id = %s
-        """, (name, address, phone, opening_hours, restaurant_type, img_url, rest_id))
+        """, (name, address, province, city, district, phone, opening_hours, restaurant_type, rest_id))
         
+        if staged:
+            queue_image_jobs('Restaurants', rest_id, staged)
         mysql.connection.commit()
+        leaderboard.update(rest_id)
+        invalidate_cities()
+        purge(tag('restaurant', rest_id), 'restaurants')
         flash('餐厅信息更新成功', 'success')
         return redirect(url_for('merchant.my_restaurants'))
         
     except Exception as e:
         mysql.connection.rollback()
+        discard_upload(staged)
         flash(f'更新失败: {str(e)}', 'error')
         return redirect(url_for('merchant.edit_restaurant', rest_id=rest_id))
     finally:
@@ -663,6 +657,7 @@ def reply_review():
         """, (review_id, current_user.id, content))
         
         mysql.connection.commit()
+        purge(tag('restaurant', review['rest_id']))
         flash('回复成功', 'success')
         
         # 重定向到餐厅详情页面
@@ -1,10 +1,43 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
+import hashlib
+import os
+
+import MySQLdb
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, current_app, session, make_response
 from flask_login import login_required, current_user
-from app import mysql
+from app import mysql, query_cache
+from app.page_cache import cached_page, purge, tag
+from app.shell import shell_response
+from app.static_cache import file_fingerprint
+from app.loaders import BatchLoader
+from app.search import restaurant_condition
+from app.pagination import paginate
 
 restaurant_bp = Blueprint('restaurant', __name__)
 
+# 列表页排序方式：(列, 结果字段, 是否降序)
+# r.rating 是 DECIMAL（迁移 010、012），游标中保存的评分与表中的值精确相等，同分的餐厅翻页时不会跳过或重复
+LIST_SORT_ORDERS = {
+    'rating': [('r.rating', 'rating', True), ('r.name', 'name', False), ('r.rest_id', 'rest_id', False)],
+    'name': [('r.name', 'name', False), ('r.rest_id', 'rest_id', False)],
+    'reviews': [('r.review_count', 'review_count', True), ('r.rating', 'rating', True), ('r.rest_id', 'rest_id', False)],
+}
+
+# 详情页用到的模板，模板修改后 ETag 随之变化
+DETAIL_TEMPLATES = ('restaurants/detail.html', 'base.html', '_image.html')
+
+def _detail_etag(rest_id, version):
+    """详情页的 ETag
+
+    详情页是与用户无关的外壳（个人状态由 /api/user_state 填充，见 app/shell.py），
+    由餐厅版本号（见 app/sql/migrations/009_restaurant_version.sql）和模板指纹决定。
+    """
+    parts = [str(rest_id), str(version)]
+    template_folder = os.path.join(current_app.root_path, current_app.template_folder)
+    parts += [file_fingerprint(template_folder, name) or '' for name in DETAIL_TEMPLATES]
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
 @restaurant_bp.route('/list')
+@cached_page(lambda: ['restaurants', 'reviews', 'favourites', 'categories', tag('category', request.args.get('category_name'))])
 def restaurant_list():
     """餐厅列表页面 - 支持分类筛选和排序"""
     cur = None
@@ -16,8 +49,6 @@ def restaurant_list():
         search_keyword = request.args.get('search', '')
         sort_by = request.args.get('sort', 'rating')  # 默认按评分排序
         
-        print(f"调试信息 - category_name: {category_name}, search_keyword: {search_keyword}, sort_by: {sort_by}")
-        
         # 使用 restaurants 表的 type 字段与 restaurantcategories 表关联
         base_query = """
             SELECT r.*,
@@ -39,56 +70,39 @@ def restaurant_list():
         
         # 添加搜索条件
         if search_keyword:
-            conditions.append("(r.name LIKE %s OR r.address LIKE %s OR r.type LIKE %s)")
-            params.extend([f'%{search_keyword}%', f'%{search_keyword}%', f'%{search_keyword}%'])
-        
-        # 组合查询条件
-        if conditions:
-            base_query += " WHERE " + " AND ".join(conditions)
-        
-        # 添加排序
-        if sort_by == 'rating':
-            base_query += " ORDER BY r.rating DESC, r.name"
-        elif sort_by == 'name':
-            base_query += " ORDER BY r.name ASC"
-        elif sort_by == 'reviews':
-            base_query += " ORDER BY r.review_count DESC, r.rating DESC"
-        else:
-            base_query += " ORDER BY r.rating DESC, r.name"
-        
-        print(f"执行查询: {base_query}")
-        print(f"参数: {params}")
+            search_condition, search_params = restaurant_condition(search_keyword)
+            conditions.append(search_condition)
+            params.extend(search_params)
         
-        cur.execute(base_query, params)
-        restaurants = cur.fetchall()
-        
-        print(f"找到 {len(restaurants)} 家餐厅")
+        # 按排序方式游标分页，主键作为最后的排序列保证顺序稳定
+        order_by = LIST_SORT_ORDERS.get(sort_by, LIST_SORT_ORDERS['rating'])
+        page = paginate(cur, base_query, order_by,
+                        cursor=request.args.get('cursor'),
+                        conditions=conditions, params=params)
+        restaurants = page.items
         
         # 获取所有活跃的分类
         try:
-            cur.execute("""
+            categories = query_cache.fetchall(cur, """
                 SELECT category_id, category_name, description
                 FROM restaurantcategories 
                 WHERE is_active = 1
                 ORDER BY category_name
-            """)
-            categories = cur.fetchall()
-            print(f"找到 {len(categories)} 个分类")
-        except Exception as cat_error:
-            print(f"获取分类失败: {cat_error}")
+            """, tables=['restaurantcategories'])
+        except Exception:
+            current_app.logger.exception('获取分类失败')
             categories = []
         
-        return render_template('restaurants/list.html', 
+        return shell_response('restaurants/list.html', 
                              restaurants=restaurants, 
+                             page=page,
                              categories=categories,
                              selected_category=category_name,
                              search_keyword=search_keyword,
                              current_sort=sort_by)
         
-    except Exception as e:
-        print(f"获取餐厅列表失败详细错误: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        current_app.logger.exception('获取餐厅列表失败')
         flash('获取餐厅列表失败', 'error')
         return render_template('restaurants/list.html', 
                              restaurants=[], 
@@ -101,53 +115,41 @@ def restaurant_list():
             cur.close()
 
 @restaurant_bp.route('/detail/<int:rest_id>')
+@cached_page(lambda rest_id: [tag('restaurant', rest_id)])
 def detail(rest_id):
-    """餐厅详情页"""
+    """餐厅详情页
+
+    按餐厅版本号生成 ETag，浏览器缓存的页面仍是最新时只查版本号并返回 304。
+    """
     cur = mysql.connection.cursor()
     try:
+        # 先只查版本号（主键查询），有待显示的提示消息时页面不能复用
+        cur.execute("SELECT version FROM Restaurants WHERE rest_id = %s", (rest_id,))
+        row = cur.fetchone()
+        etag = None
+        if row and not session.get('_flashes'):
+            etag = _detail_etag(rest_id, row['version'])
+            if request.if_none_match.contains(etag):
+                response = make_response('', 304)
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'public, no-cache'
+                return response
+        
         # 获取餐厅信息
-        cur.execute("""
-            SELECT r.*, 
-                   COALESCE(AVG(rev.rating), 0) as rating,
-                   COUNT(rev.review_id) as review_count,
-                   COUNT(DISTINCT f.user_id) as star_count
-            FROM Restaurants r 
-            LEFT JOIN Reviews rev ON r.rest_id = rev.rest_id
-            LEFT JOIN Favourites f ON r.rest_id = f.rest_id
-            WHERE r.rest_id = %s
-            GROUP BY r.rest_id
-        """, (rest_id,))
+        cur.execute("SELECT * FROM Restaurants WHERE rest_id = %s", (rest_id,))
         restaurant = cur.fetchone()
         
         if not restaurant:
             flash('餐厅不存在', 'error')
             return redirect(url_for('restaurant.restaurant_list'))
         
-        # 获取菜品信息和用户推荐状态
-        if current_user.is_authenticated:
-            cur.execute("""
-                SELECT d.*, 
-                       COUNT(DISTINCT rec.user_id) as rec_count,
-                       CASE WHEN EXISTS(SELECT 1 FROM Recommendations WHERE user_id = %s AND dish_id = d.dish_id) 
-                            THEN 1 ELSE 0 END as user_recommended
-                FROM Dishes d
-                LEFT JOIN Recommendations rec ON d.dish_id = rec.dish_id
-                WHERE d.rest_id = %s
-                GROUP BY d.dish_id
-                ORDER BY d.name
-            """, (current_user.id, rest_id))
-        else:
-            cur.execute("""
-                SELECT d.*, 
-                       COUNT(DISTINCT rec.user_id) as rec_count,
-                       0 as user_recommended
-                FROM Dishes d
-                LEFT JOIN Recommendations rec ON d.dish_id = rec.dish_id
-                WHERE d.rest_id = %s
-                GROUP BY d.dish_id
-                ORDER BY d.name
-            """, (rest_id,))
-        
+        # 获取菜品信息（推荐数直接读 Dishes.rec_count；用户的推荐状态由 /api/user_state 提供）
+        cur.execute("""
+            SELECT d.*
+            FROM Dishes d
+            WHERE d.rest_id = %s
+            ORDER BY d.name
+        """, (rest_id,))
         dishes = cur.fetchall()
         
         # 获取评论信息
@@ -161,46 +163,25 @@ def detail(rest_id):
         """, (rest_id,))
         reviews = cur.fetchall()
         
-        # 获取回复信息
-        cur.execute("""
-            SELECT rep.review_id, rep.content, rep.reply_time
-            FROM Replies rep
-            JOIN Reviews r ON rep.review_id = r.review_id
-            WHERE r.rest_id = %s
-            ORDER BY rep.reply_time ASC
-        """, (rest_id,))
-        replies_data = cur.fetchall()
+        # 批量加载这些评论的回复（一次 IN 查询，按 review_id 分组）
+        reply_loader = BatchLoader(cur, """
+            SELECT review_id, content, reply_time
+            FROM Replies
+            WHERE review_id IN ({placeholders})
+            ORDER BY reply_time ASC
+        """, key_field='review_id')
+        reply_loader.attach(reviews, 'review_id', 'replies')
         
-        # 组织回复数据
-        replies_by_review = {}
-        for reply in replies_data:
-            review_id = reply['review_id']
-            if review_id not in replies_by_review:
-                replies_by_review[review_id] = []
-            replies_by_review[review_id].append({
-                'content': reply['content'],
-                'reply_time': reply['reply_time']
-            })
-        
-        # 将回复添加到评论中
-        for review in reviews:
-            review_id = review['review_id']
-            review['replies'] = replies_by_review.get(review_id, [])
-        
-        # 检查用户是否收藏了该餐厅
-        is_favorited = False
-        if current_user.is_authenticated and current_user.user_type == 'user':
-            cur.execute("SELECT COUNT(*) as count FROM Favourites WHERE user_id = %s AND rest_id = %s", 
-                       (current_user.id, rest_id))
-            is_favorited = cur.fetchone()['count'] > 0
-        
-        return render_template('restaurants/detail.html', 
-                             restaurant=restaurant, 
-                             dishes=dishes, 
-                             reviews=reviews,
-                             is_favorited=is_favorited)
-    except Exception as e:
-        print(f"详情页错误: {e}")
+        # 版本号在两次查询之间变化时不设置 ETag，下次请求重新渲染
+        if etag and restaurant['version'] != row['version']:
+            etag = None
+        return shell_response('restaurants/detail.html',
+                              etag=etag,
+                              restaurant=restaurant, 
+                              dishes=dishes, 
+                              reviews=reviews)
+    except Exception:
+        current_app.logger.exception('加载餐厅详情失败')
         flash('加载餐厅详情时出错', 'error')
         return redirect(url_for('restaurant.restaurant_list'))
     finally:
@@ -221,24 +202,31 @@ def toggle_favorite():
     
     cur = mysql.connection.cursor()
     try:
-        # 检查是否已收藏
-        cur.execute("SELECT COUNT(*) as count FROM Favourites WHERE user_id = %s AND rest_id = %s", 
-                   (current_user.id, rest_id))
-        is_favorited = cur.fetchone()['count'] > 0
+        cur.execute("SELECT rest_id FROM Restaurants WHERE rest_id = %s", (rest_id,))
+        if not cur.fetchone():
+            return jsonify({'success': False, 'error': '餐厅不存在'}), 404
         
-        if is_favorited:
-            # 取消收藏
-            cur.execute("DELETE FROM Favourites WHERE user_id = %s AND rest_id = %s", 
-                       (current_user.id, rest_id))
+        # (user_id, rest_id) 有唯一约束：先尝试取消收藏，没有删除到行说明尚未收藏
+        cur.execute("DELETE FROM Favourites WHERE user_id = %s AND rest_id = %s", 
+                   (current_user.id, rest_id))
+        if cur.rowcount > 0:
             action = 'removed'
         else:
-            # 添加收藏
-            cur.execute("INSERT INTO Favourites (user_id, rest_id, timestamp) VALUES (%s, %s, NOW())", 
-                       (current_user.id, rest_id))
+            # 并发重复提交时由唯一约束去重；不用 INSERT IGNORE，它会把外键错误也变成警告
+            cur.execute("""
+                INSERT INTO Favourites (user_id, rest_id, timestamp) VALUES (%s, %s, NOW())
+                ON DUPLICATE KEY UPDATE user_id = user_id
+            """, (current_user.id, rest_id))
             action = 'added'
         
         mysql.connection.commit()
+        # 缓存的详情页和列表页显示收藏数
+        purge(tag('restaurant', rest_id), 'favourites')
         return jsonify({'success': True, 'action': action})
+    except MySQLdb.IntegrityError:
+        # 检查之后餐厅被删除，外键约束失败
+        mysql.connection.rollback()
+        return jsonify({'success': False, 'error': '餐厅不存在'}), 404
     except Exception as e:
         mysql.connection.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -256,14 +244,10 @@ def favorites():
     cur = mysql.connection.cursor()
     try:
         cur.execute("""
-            SELECT r.*, f.timestamp,
-                   COALESCE(AVG(rev.rating), 0) as rating,
-                   COUNT(rev.review_id) as review_count
+            SELECT r.*, f.timestamp
             FROM Favourites f
             JOIN Restaurants r ON f.rest_id = r.rest_id
-            LEFT JOIN Reviews rev ON r.rest_id = rev.rest_id
             WHERE f.user_id = %s
-            GROUP BY r.rest_id, f.timestamp
             ORDER BY f.timestamp DESC
         """, (current_user.id,))
         favorites = cur.fetchall()
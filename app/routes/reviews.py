@@ -1,6 +1,9 @@
+import MySQLdb
 from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
 from flask_login import login_required, current_user
 from app import mysql
+from app.leaderboard import leaderboard
+from app.page_cache import purge, tag
 
 review_bp = Blueprint('review', __name__)
 
@@ -77,8 +80,9 @@ def post_review(rest_id):
         """, (current_user.id, rest_id, rating, comment))
         mysql.connection.commit()
         
-        # 更新餐厅统计
-        update_restaurant_stats(rest_id)
+        # 餐厅评分统计由触发器增量维护，这里只需刷新排行榜和页面缓存
+        leaderboard.update(rest_id)
+        purge(tag('restaurant', rest_id), 'reviews')
         
         flash('评论发表成功！', 'success')
     except Exception as e:
@@ -125,6 +129,8 @@ def update_review(review_id):
             WHERE review_id = %s
         """, (rating, comment, review_id))
         mysql.connection.commit()
+        leaderboard.update(review['rest_id'])
+        purge(tag('restaurant', review['rest_id']), 'reviews')
         flash('评论更新成功！', 'success')
         return redirect(url_for('restaurant.detail', rest_id=review['rest_id']))
     except Exception as e:
@@ -158,8 +164,9 @@ def delete_review(review_id):
         cur.execute("DELETE FROM reviews WHERE review_id = %s", (review_id,))
         mysql.connection.commit()
         
-        # 更新餐厅统计
-        update_restaurant_stats(rest_id)
+        # 餐厅评分统计由触发器增量维护，这里只需刷新排行榜和页面缓存
+        leaderboard.update(rest_id)
+        purge(tag('restaurant', rest_id), 'reviews')
         
         flash('评论删除成功', 'success')
         
@@ -215,6 +222,7 @@ def reply_review(review_id):
             VALUES (%s, %s, NOW())
         """, (review_id, reply_content))
         mysql.connection.commit()
+        purge(tag('restaurant', review['rest_id']))
         flash('回复成功', 'success')
         
         return redirect(url_for('restaurant.detail', rest_id=review['rest_id']))
@@ -238,53 +246,34 @@ def recommend_dish():
     
     cur = mysql.connection.cursor()
     try:
-        # 检查是否已经推荐过
-        cur.execute("SELECT COUNT(*) as count FROM recommendations WHERE user_id = %s AND dish_id = %s", 
-                   (current_user.id, dish_id))
-        is_recommended = cur.fetchone()['count'] > 0
+        cur.execute("SELECT rest_id FROM Dishes WHERE dish_id = %s", (dish_id,))
+        dish = cur.fetchone()
+        if not dish:
+            return jsonify({'error': '菜品不存在'}), 404
         
-        if is_recommended:
-            # 取消推荐
-            cur.execute("DELETE FROM recommendations WHERE user_id = %s AND dish_id = %s", 
-                       (current_user.id, dish_id))
+        # (user_id, dish_id) 有唯一约束：先尝试取消推荐，没有删除到行说明尚未推荐
+        cur.execute("DELETE FROM recommendations WHERE user_id = %s AND dish_id = %s", 
+                   (current_user.id, dish_id))
+        if cur.rowcount > 0:
             action = 'removed'
         else:
-            # 添加推荐
-            cur.execute("INSERT INTO recommendations (user_id, dish_id) VALUES (%s, %s)", 
-                       (current_user.id, dish_id))
+            # 并发重复提交时由唯一约束去重；不用 INSERT IGNORE，它会把外键错误也变成警告
+            cur.execute("""
+                INSERT INTO recommendations (user_id, dish_id) VALUES (%s, %s)
+                ON DUPLICATE KEY UPDATE user_id = user_id
+            """, (current_user.id, dish_id))
             action = 'added'
         
         mysql.connection.commit()
+        # 缓存的详情页和搜索页显示菜品的推荐数
+        purge(tag('restaurant', dish['rest_id']), 'dishes')
         return jsonify({'success': True, 'action': action})
+    except MySQLdb.IntegrityError:
+        # 检查之后菜品被删除，外键约束失败
+        mysql.connection.rollback()
+        return jsonify({'error': '菜品不存在'}), 404
     except Exception as e:
         mysql.connection.rollback()
         return jsonify({'error': str(e)}), 500
     finally:
         cur.close()
-
-def update_restaurant_stats(rest_id):
-    """更新餐厅的评分和评论数统计"""
-    cur = mysql.connection.cursor()
-    try:
-        # 注意：这里假设 restaurants 表有 rating 和 review_count 字段
-        # 如果没有这些字段，请删除这个函数的调用
-        cur.execute("""
-            UPDATE restaurants 
-            SET rating = (
-                SELECT COALESCE(AVG(rating), 0) 
-                FROM reviews 
-                WHERE rest_id = %s
-            ),
-            review_count = (
-                SELECT COUNT(*) 
-                FROM reviews 
-                WHERE rest_id = %s
-            )
-            WHERE rest_id = %s
-        """, (rest_id, rest_id, rest_id))
-        mysql.connection.commit()
-    except Exception as e:
-        print(f"更新餐厅统计失败: {e}")
-        mysql.connection.rollback()
-    finally:
-        cur.close()
\ No newline at end of file
@@ -2,6 +2,7 @@ from flask import Blueprint, render_template, request, flash, redirect, url_for
 from flask_login import login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from app import mysql
+from app.models.user import User
 
 user_bp = Blueprint('user', __name__)
 
@@ -39,9 +40,8 @@ def edit_profile():
             """, (email, phone, current_user.id))
             mysql.connection.commit()
             
-            # 更新当前用户对象的属性
-            current_user.email = email
-            current_user.phone = phone
+            # 缓存的用户对象可能被其他请求共用，不直接修改，失效后下次请求重新加载
+            User.invalidate(current_user.id)
             
             flash('个人信息更新成功', 'success')
             return redirect(url_for('user.profile'))
@@ -114,6 +114,7 @@ def delete_account():
         # 修改：使用正确的表名和字段名
         cur.execute("UPDATE users SET is_deleted = 1 WHERE user_id = %s", (current_user.id,))
         mysql.connection.commit()
+        User.invalidate(current_user.id)
         flash('账号已注销', 'info')
         
         from flask_login import logout_user
@@ -0,0 +1,105 @@
+"""餐厅和菜品的全文检索
+
+基于 MySQL FULLTEXT 索引（WITH PARSER ngram），索引由 InnoDB 在增删改时自动维护，
+见 app/sql/migrations/001_fulltext_search.sql。MATCH() 中的列顺序必须与索引定义一致。
+索引建立时关闭了停用词表（011），否则含 a、i 等停用词的二元组不进索引，拉丁字母的名称会搜不到。
+
+自然语言模式下 ngram 分词后命中任意一个二元组即算匹配，只适合按相关度排序的搜索页；
+列表页的关键词筛选按评分等排序，用布尔模式要求每个词都出现（+"词"）。
+"""
+
+# 与服务器 ngram_token_size 保持一致，短于该长度的关键词无法命中 ngram 索引
+NGRAM_TOKEN_SIZE = 2
+
+RESTAURANT_MATCH = "MATCH(r.name, r.type, r.address) AGAINST (%s IN NATURAL LANGUAGE MODE)"
+RESTAURANT_MATCH_ALL = "MATCH(r.name, r.type, r.address) AGAINST (%s IN BOOLEAN MODE)"
+DISH_MATCH = "MATCH(d.name, d.description) AGAINST (%s IN NATURAL LANGUAGE MODE)"
+
+
+def _like_pattern(keyword):
+    """转义 LIKE 通配符"""
+    escaped = keyword.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def _use_fulltext(keyword):
+    return len(keyword) >= NGRAM_TOKEN_SIZE
+
+
+def _restaurant_like(keyword):
+    pattern = _like_pattern(keyword)
+    return "(r.name LIKE %s OR r.type LIKE %s OR r.address LIKE %s)", [pattern, pattern, pattern]
+
+
+def restaurant_condition(keyword):
+    """返回餐厅关键词筛选条件 (sql, params)，供列表页等拼接 WHERE 使用
+
+    按空白拆分关键词，每个词都必须出现：能用 ngram 索引的词合成一个布尔模式的 MATCH，
+    每个词作为必须出现的短语（+"词"）；短于 NGRAM_TOKEN_SIZE 的词用 LIKE。
+    """
+    # 引号会打断布尔模式中的短语，去掉
+    terms = [term.replace('"', '') for term in keyword.split()]
+    terms = [term for term in terms if term]
+    if not terms:
+        return _restaurant_like(keyword)
+
+    conditions = []
+    params = []
+    fulltext_terms = [term for term in terms if _use_fulltext(term)]
+    if fulltext_terms:
+        conditions.append(RESTAURANT_MATCH_ALL)
+        params.append(' '.join(f'+"{term}"' for term in fulltext_terms))
+    for term in terms:
+        if not _use_fulltext(term):
+            condition, like_params = _restaurant_like(term)
+            conditions.append(condition)
+            params.extend(like_params)
+    return '(' + ' AND '.join(conditions) + ')', params
+
+
+def search_restaurants(cur, keyword, limit=20):
+    """按相关度搜索餐厅"""
+    if _use_fulltext(keyword):
+        cur.execute(f"""
+            SELECT r.*, {RESTAURANT_MATCH} as relevance
+            FROM Restaurants r
+            WHERE {RESTAURANT_MATCH}
+            ORDER BY relevance DESC, r.rating DESC, r.name
+            LIMIT %s
+        """, (keyword, keyword, limit))
+    else:
+        condition, params = restaurant_condition(keyword)
+        cur.execute(f"""
+            SELECT r.*, 0 as relevance
+            FROM Restaurants r
+            WHERE {condition}
+            ORDER BY r.rating DESC, r.name
+            LIMIT %s
+        """, (*params, limit))
+    return cur.fetchall()
+
+
+def search_dishes(cur, keyword, limit=20):
+    """按相关度搜索菜品"""
+    if _use_fulltext(keyword):
+        condition, params = DISH_MATCH, [keyword]
+        relevance = DISH_MATCH
+        order_by = "relevance DESC, d.rec_count DESC, d.name"
+        relevance_params = [keyword]
+    else:
+        pattern = _like_pattern(keyword)
+        condition, params = "(d.name LIKE %s OR d.description LIKE %s)", [pattern, pattern]
+        relevance = "0"
+        order_by = "d.rec_count DESC, d.name"
+        relevance_params = []
+
+    cur.execute(f"""
+        SELECT d.*, r.name as restaurant_name, r.rest_id,
+               {relevance} as relevance
+        FROM Dishes d
+        JOIN Restaurants r ON d.rest_id = r.rest_id
+        WHERE {condition}
+        ORDER BY {order_by}
+        LIMIT %s
+    """, (*relevance_params, *params, limit))
+    return cur.fetchall()
@@ -0,0 +1,66 @@
+from flask import current_app, g, make_response, render_template, session
+from flask_login import current_user
+from markupsafe import Markup
+
+# 与用户无关的页面外壳：页面本身不读取 current_user、不包含 CSRF 令牌，所有用户拿到的 HTML 相同，
+# 可以整页缓存；登录状态、导航菜单、收藏/推荐状态和 CSRF 令牌由 static/js/script.js
+# 请求 /api/user_state 后填充。
+#
+# 模板中因人而异的元素用 show_for(角色) 标记：普通页面按当前用户在服务端决定是否隐藏，
+# 外壳页面一律按未登录渲染，由脚本按 /api/user_state 的结果切换。
+# 角色：anonymous（未登录）、authenticated（已登录）、user、merchant、admin
+
+SHELL_MAX_AGE = 60  # 秒，外壳页面允许浏览器缓存的时间（详情页另用 ETag 验证）
+
+
+def is_shell():
+    return g.get('shell', False)
+
+
+def _visible(role):
+    if is_shell():
+        return role == 'anonymous'
+    if role == 'anonymous':
+        return not current_user.is_authenticated
+    if not current_user.is_authenticated:
+        return False
+    return role == 'authenticated' or current_user.user_type == role
+
+
+def show_for(role):
+    """模板中使用：<div {{ show_for('user') }}>，输出 data-show-for 属性，不可见时加 hidden"""
+    attrs = f'data-show-for="{role}"'
+    if not _visible(role):
+        attrs += ' hidden'
+    return Markup(attrs)
+
+
+def render_shell(template, **context):
+    """按外壳方式渲染页面，返回 (html, 是否可共享)
+
+    有待显示的提示消息时页面中含有个人内容，不可共享。
+    """
+    shareable = not session.get('_flashes')
+    g.shell = True
+    return render_template(template, **context), shareable
+
+
+def shell_response(template, etag=None, **context):
+    """渲染外壳页面并设置缓存响应头"""
+    html, shareable = render_shell(template, **context)
+    response = make_response(html)
+    if not shareable:
+        response.headers['Cache-Control'] = 'private, no-store'
+    elif etag:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'public, no-cache'
+    else:
+        max_age = current_app.config.get('SHELL_MAX_AGE', SHELL_MAX_AGE)
+        response.headers['Cache-Control'] = f'public, max-age={max_age}'
+    return response
+
+
+def register_shell_helpers(app):
+    """注册模板全局函数（由 create_app 调用）"""
+    app.add_template_global(show_for, 'show_for')
+    app.add_template_global(is_shell, 'is_shell')
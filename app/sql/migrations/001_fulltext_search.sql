@@ -0,0 +1,14 @@
+-- ===================================
+-- 全文检索索引（ngram 分词，支持中文）
+-- 需要 MySQL 5.7.6+，ngram_token_size 默认为 2（按二元组切分）
+-- ===================================
+
+USE restaurant_db;
+
+-- 餐厅：名称、类型、地址
+ALTER TABLE Restaurants
+    ADD FULLTEXT INDEX ft_restaurants_search (name, type, address) WITH PARSER ngram;
+
+-- 菜品：名称、描述
+ALTER TABLE Dishes
+    ADD FULLTEXT INDEX ft_dishes_search (name, description) WITH PARSER ngram;
@@ -0,0 +1,142 @@
+-- ===================================
+-- 餐厅/菜品聚合计数改为增量维护
+-- 新增 rating_sum 列，回填现有数据，并用增量版本替换原有的全量重算触发器
+-- ===================================
+
+USE restaurant_db;
+
+ALTER TABLE Restaurants
+    ADD COLUMN rating_sum BIGINT NOT NULL DEFAULT 0 AFTER rating;
+
+UPDATE Restaurants SET review_count = 0 WHERE review_count IS NULL;
+UPDATE Restaurants SET star_count = 0 WHERE star_count IS NULL;
+UPDATE Dishes SET rec_count = 0 WHERE rec_count IS NULL;
+
+-- 增量维护要求计数列非空
+ALTER TABLE Restaurants
+    MODIFY review_count INT NOT NULL DEFAULT 0,
+    MODIFY star_count INT NOT NULL DEFAULT 0;
+ALTER TABLE Dishes
+    MODIFY rec_count INT NOT NULL DEFAULT 0;
+
+-- 回填聚合值
+UPDATE Restaurants r
+SET rating_sum = (SELECT COALESCE(SUM(rating), 0) FROM Reviews WHERE rest_id = r.rest_id),
+    review_count = (SELECT COUNT(*) FROM Reviews WHERE rest_id = r.rest_id),
+    star_count = (SELECT COUNT(*) FROM Favourites WHERE rest_id = r.rest_id),
+    rating = IF(review_count > 0, rating_sum / review_count, 0);
+
+UPDATE Dishes d
+SET rec_count = (SELECT COUNT(*) FROM Recommendations WHERE dish_id = d.dish_id);
+
+DROP TRIGGER IF EXISTS trg_after_insert_review;
+DROP TRIGGER IF EXISTS trg_after_update_review;
+DROP TRIGGER IF EXISTS trg_after_delete_review;
+DROP TRIGGER IF EXISTS trg_after_insert_favourite;
+DROP TRIGGER IF EXISTS trg_after_delete_favourite;
+DROP TRIGGER IF EXISTS trg_after_insert_recommendation;
+DROP TRIGGER IF EXISTS trg_after_delete_recommendation;
+
+DELIMITER $$
+
+-- 评分/评论数/收藏数/推荐数均按增量维护（O(1)），不再对子表全量重算。
+-- 计数偏差由 `flask reconcile-aggregates` 定期检查并修复。
+
+-- 插入评论时累加餐厅评分总和与评论数
+CREATE TRIGGER trg_after_insert_review
+AFTER INSERT ON Reviews
+FOR EACH ROW
+BEGIN
+  UPDATE Restaurants
+  SET rating_sum = rating_sum + NEW.rating,
+      review_count = review_count + 1,
+      rating = rating_sum / review_count
+  WHERE rest_id = NEW.rest_id;
+END$$
+
+-- 更新评论时按评分差值调整（评论换餐厅时两边分别调整）
+CREATE TRIGGER trg_after_update_review
+AFTER UPDATE ON Reviews
+FOR EACH ROW
+BEGIN
+  IF NOT (OLD.rest_id <=> NEW.rest_id) THEN
+    UPDATE Restaurants
+    SET rating_sum = rating_sum - OLD.rating,
+        review_count = review_count - 1,
+        rating = IF(review_count > 0, rating_sum / review_count, 0)
+    WHERE rest_id = OLD.rest_id;
+
+    UPDATE Restaurants
+    SET rating_sum = rating_sum + NEW.rating,
+        review_count = review_count + 1,
+        rating = rating_sum / review_count
+    WHERE rest_id = NEW.rest_id;
+  ELSEIF NOT (OLD.rating <=> NEW.rating) THEN
+    UPDATE Restaurants
+    SET rating_sum = rating_sum - OLD.rating + NEW.rating,
+        rating = IF(review_count > 0, rating_sum / review_count, 0)
+    WHERE rest_id = NEW.rest_id;
+  END IF;
+END$$
+
+-- 删除评论时扣减餐厅评分，并自动删除商家回复
+CREATE TRIGGER trg_after_delete_review
+AFTER DELETE ON Reviews
+FOR EACH ROW
+BEGIN
+  DELETE FROM Replies
+  WHERE review_id = OLD.review_id;
+
+  UPDATE Restaurants
+  SET rating_sum = rating_sum - OLD.rating,
+      review_count = review_count - 1,
+      rating = IF(review_count > 0, rating_sum / review_count, 0)
+  WHERE rest_id = OLD.rest_id;
+END$$
+
+DELIMITER ;
+
+DELIMITER $$
+
+-- 收藏餐厅时更新餐厅的收藏数
+CREATE TRIGGER trg_after_insert_favourite
+AFTER INSERT ON Favourites
+FOR EACH ROW
+BEGIN
+  UPDATE Restaurants
+  SET star_count = star_count + 1
+  WHERE rest_id = NEW.rest_id;
+END$$
+
+-- 取消收藏餐厅时更新餐厅的收藏数
+CREATE TRIGGER trg_after_delete_favourite
+AFTER DELETE ON Favourites
+FOR EACH ROW
+BEGIN
+  UPDATE Restaurants
+  SET star_count = star_count - 1
+  WHERE rest_id = OLD.rest_id;
+END$$
+
+-- 推荐菜品时更新菜品的推荐数
+CREATE TRIGGER trg_after_insert_recommendation
+AFTER INSERT ON Recommendations
+FOR EACH ROW
+BEGIN
+  UPDATE Dishes
+  SET rec_count = rec_count + 1
+  WHERE dish_id = NEW.dish_id;
+END$$
+
+-- 取消推荐菜品时更新菜品的推荐数
+CREATE TRIGGER trg_after_delete_recommendation
+AFTER DELETE ON Recommendations
+FOR EACH ROW
+BEGIN
+  UPDATE Dishes
+  SET rec_count = rec_count - 1
+  WHERE dish_id = OLD.dish_id;
+END$$
+
+DELIMITER ;
+
@@ -0,0 +1,49 @@
+-- ===================================
+-- 热点查询的二级索引与唯一约束
+-- 覆盖各蓝图中的 WHERE / JOIN / ORDER BY 条件，可用 `flask explain-check` 检查执行计划
+-- 降序索引需要 MySQL 8.0（5.7 会忽略 DESC，混合方向排序仍需 filesort）
+-- ===================================
+
+USE restaurant_db;
+
+-- 去除重复的收藏/推荐后再加唯一约束（删除会触发计数减一，与重复插入时的加一抵消）
+DELETE f1 FROM Favourites f1
+JOIN Favourites f2 ON f1.user_id = f2.user_id AND f1.rest_id = f2.rest_id AND f1.fav_id > f2.fav_id;
+
+DELETE r1 FROM Recommendations r1
+JOIN Recommendations r2 ON r1.user_id = r2.user_id AND r1.dish_id = r2.dish_id AND r1.rec_id > r2.rec_id;
+
+-- 收藏：切换收藏 / 收藏状态检查 / 我的收藏（按时间倒序）
+ALTER TABLE Favourites
+    ADD UNIQUE KEY uk_favourites_user_rest (user_id, rest_id),
+    ADD INDEX idx_favourites_user_time (user_id, timestamp);
+
+-- 推荐：切换推荐 / 详情页推荐状态
+ALTER TABLE Recommendations
+    ADD UNIQUE KEY uk_recommendations_user_dish (user_id, dish_id);
+
+-- 评论：详情页（按餐厅、时间倒序）/ 商家回复管理 / 我的评论 / 后台评论列表与仪表板
+ALTER TABLE Reviews
+    ADD INDEX idx_reviews_rest_time (rest_id, review_time),
+    ADD INDEX idx_reviews_rest_timestamp (rest_id, timestamp),
+    ADD INDEX idx_reviews_user_time (user_id, review_time),
+    ADD INDEX idx_reviews_time (review_time, review_id);
+
+-- 餐厅：分类筛选 / 列表三种排序（评分、名称、评论数）/ 排行榜
+ALTER TABLE Restaurants
+    ADD INDEX idx_restaurants_type_rating (type, rating DESC, name, rest_id),
+    ADD INDEX idx_restaurants_rating (rating DESC, name, rest_id),
+    ADD INDEX idx_restaurants_name (name, rest_id),
+    ADD INDEX idx_restaurants_review_count (review_count DESC, rating DESC, rest_id);
+
+-- 用户：注册/修改资料时的邮箱查重 / 后台用户列表 / 商家下拉列表
+ALTER TABLE Users
+    ADD INDEX idx_users_email (email),
+    ADD INDEX idx_users_join_date (join_date, user_id),
+    ADD INDEX idx_users_type_name (user_type, is_deleted, username);
+
+-- 菜品：详情页与菜品管理（按餐厅、名称排序）
+ALTER TABLE Dishes
+    ADD INDEX idx_dishes_rest_name (rest_id, name);
+
+-- Replies(review_id) 已有 UNIQUE 约束，无需额外索引
@@ -0,0 +1,41 @@
+-- ===================================
+-- 问题报告表与餐厅类别表
+-- 原先由请求处理函数在每次请求时 CREATE TABLE IF NOT EXISTS，现改为迁移时创建
+-- 已通过 changes.sql 或旧版本代码建过表的数据库，CREATE 会直接跳过
+-- ===================================
+
+USE restaurant_db;
+
+CREATE TABLE IF NOT EXISTS IssueReports (
+    report_id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NULL,
+    reporter_name VARCHAR(100) NOT NULL,
+    reporter_email VARCHAR(100),
+    issue_type ENUM('bug', 'feature', 'complaint', 'suggestion', 'other') NOT NULL,
+    subject VARCHAR(200) NOT NULL,
+    description TEXT NOT NULL,
+    status ENUM('pending', 'in_progress', 'resolved', 'closed') DEFAULT 'pending',
+    priority ENUM('low', 'medium', 'high', 'urgent') DEFAULT 'medium',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    admin_response TEXT,
+    FOREIGN KEY (user_id) REFERENCES Users(user_id) ON DELETE SET NULL
+);
+
+CREATE TABLE IF NOT EXISTS RestaurantCategories (
+    category_id INT AUTO_INCREMENT PRIMARY KEY,
+    category_name VARCHAR(100) NOT NULL UNIQUE,
+    description TEXT,
+    is_active BOOLEAN DEFAULT TRUE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 问题报告按状态筛选 / 统计
+ALTER TABLE IssueReports
+    ADD INDEX idx_issue_reports_status (status, created_at);
+
+-- 导入现有餐厅的类别（之后新增的类型用 flask sync-categories 同步）
+INSERT IGNORE INTO RestaurantCategories (category_name, description)
+SELECT DISTINCT type, CONCAT(type, '类型餐厅')
+FROM Restaurants
+WHERE type IS NOT NULL AND type != '';
@@ -0,0 +1,14 @@
+-- ===================================
+-- 餐厅地址结构化：省 / 市 / 区县
+-- 写入餐厅时由 app/address.py 解析 address 得到；已有数据执行迁移后运行
+--   flask backfill-cities
+-- 城市页按 city 等值查询并按评分排序
+-- ===================================
+
+USE restaurant_db;
+
+ALTER TABLE Restaurants
+    ADD COLUMN province VARCHAR(50) NULL AFTER address,
+    ADD COLUMN city     VARCHAR(50) NULL AFTER province,
+    ADD COLUMN district VARCHAR(50) NULL AFTER city,
+    ADD INDEX idx_restaurants_city (city, rating DESC, name);
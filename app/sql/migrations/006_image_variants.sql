@@ -0,0 +1,13 @@
+-- ===================================
+-- 上传图片的多尺寸版本
+-- img_variants 记录 thumb/card/full 各尺寸的 WebP、JPEG 地址和宽高（由 app/images.py 生成），
+-- img_url 保留为默认图片地址；旧数据的 img_variants 为 NULL，模板退回使用 img_url
+-- ===================================
+
+USE restaurant_db;
+
+ALTER TABLE Restaurants
+    ADD COLUMN img_variants JSON NULL AFTER img_url;
+
+ALTER TABLE Dishes
+    ADD COLUMN img_variants JSON NULL AFTER img_url;
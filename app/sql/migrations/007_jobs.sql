@@ -0,0 +1,23 @@
+-- ===================================
+-- 后台任务队列（app/jobs.py）
+-- 工作线程按 (status, run_at) 领取到期任务；失败后按指数退避推迟 run_at 重试
+-- ===================================
+
+USE restaurant_db;
+
+CREATE TABLE Jobs (
+    job_id       BIGINT PRIMARY KEY AUTO_INCREMENT,
+    job_type     VARCHAR(50) NOT NULL,
+    payload      JSON NOT NULL,
+    status       ENUM('pending', 'running', 'done', 'failed') NOT NULL DEFAULT 'pending',
+    attempts     INT NOT NULL DEFAULT 0,
+    max_attempts INT NOT NULL DEFAULT 5,
+    run_at       DATETIME(3) NOT NULL,
+    locked_by    VARCHAR(128) NULL,
+    locked_at    DATETIME(3) NULL,
+    last_error   TEXT NULL,
+    created_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_jobs_status_run_at (status, run_at),
+    INDEX idx_jobs_locked_by (locked_by)
+);
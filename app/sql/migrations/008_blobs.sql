@@ -0,0 +1,17 @@
+-- ===================================
+-- 按内容寻址的上传文件存储（app/storage.py）
+-- 文件按 SHA-256 存放在 uploads/ab/cd/<hash>.<ext>，相同内容只存一份；
+-- ref_count 为引用该文件的图片地址数，降为 0 后由 flask gc-uploads 清理
+-- ===================================
+
+USE restaurant_db;
+
+CREATE TABLE Blobs (
+    hash       CHAR(64) PRIMARY KEY,
+    ext        VARCHAR(10) NOT NULL,
+    size       INT NOT NULL,
+    ref_count  INT NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_blobs_unreferenced (ref_count, updated_at)
+);
@@ -0,0 +1,81 @@
+-- ===================================
+-- 餐厅版本号：餐厅详情页展示的数据（餐厅、菜品、评论、回复、收藏数、推荐数）有任何变化时加 1，
+-- 详情页用它生成 ETag，浏览器带 If-None-Match 且版本未变时直接返回 304（见 restaurant.detail）
+-- 评论、收藏的变化经已有触发器更新餐厅的聚合列，推荐的变化经触发器更新菜品的推荐数，都会带动版本号
+-- ===================================
+
+USE restaurant_db;
+
+ALTER TABLE Restaurants
+    ADD COLUMN version BIGINT NOT NULL DEFAULT 1;
+
+DROP TRIGGER IF EXISTS trg_before_update_restaurant;
+DROP TRIGGER IF EXISTS trg_after_insert_dish;
+DROP TRIGGER IF EXISTS trg_after_update_dish;
+DROP TRIGGER IF EXISTS trg_after_delete_dish;
+DROP TRIGGER IF EXISTS trg_after_insert_reply;
+DROP TRIGGER IF EXISTS trg_after_update_reply;
+DROP TRIGGER IF EXISTS trg_after_delete_reply;
+
+DELIMITER $$
+
+-- 餐厅的任何更新（包括聚合列的增量维护）都递增版本号
+CREATE TRIGGER trg_before_update_restaurant
+BEFORE UPDATE ON Restaurants
+FOR EACH ROW
+BEGIN
+  SET NEW.version = OLD.version + 1;
+END$$
+
+-- 菜品增删改时递增所属餐厅的版本号（UPDATE 触发上面的触发器）
+CREATE TRIGGER trg_after_insert_dish
+AFTER INSERT ON Dishes
+FOR EACH ROW
+BEGIN
+  UPDATE Restaurants SET version = version + 1 WHERE rest_id = NEW.rest_id;
+END$$
+
+CREATE TRIGGER trg_after_update_dish
+AFTER UPDATE ON Dishes
+FOR EACH ROW
+BEGIN
+  UPDATE Restaurants SET version = version + 1 WHERE rest_id = NEW.rest_id;
+  IF NOT (OLD.rest_id <=> NEW.rest_id) THEN
+    UPDATE Restaurants SET version = version + 1 WHERE rest_id = OLD.rest_id;
+  END IF;
+END$$
+
+CREATE TRIGGER trg_after_delete_dish
+AFTER DELETE ON Dishes
+FOR EACH ROW
+BEGIN
+  UPDATE Restaurants SET version = version + 1 WHERE rest_id = OLD.rest_id;
+END$$
+
+-- 商家回复增删改时递增餐厅的版本号（部分写入路径没有填 Replies.rest_id，按评论查所属餐厅）
+CREATE TRIGGER trg_after_insert_reply
+AFTER INSERT ON Replies
+FOR EACH ROW
+BEGIN
+  UPDATE Restaurants SET version = version + 1
+  WHERE rest_id = COALESCE(NEW.rest_id, (SELECT rest_id FROM Reviews WHERE review_id = NEW.review_id));
+END$$
+
+CREATE TRIGGER trg_after_update_reply
+AFTER UPDATE ON Replies
+FOR EACH ROW
+BEGIN
+  UPDATE Restaurants SET version = version + 1
+  WHERE rest_id = COALESCE(NEW.rest_id, (SELECT rest_id FROM Reviews WHERE review_id = NEW.review_id));
+END$$
+
+-- 随评论一起删除时评论已不存在，评论的删除本身已经递增了版本号
+CREATE TRIGGER trg_after_delete_reply
+AFTER DELETE ON Replies
+FOR EACH ROW
+BEGIN
+  UPDATE Restaurants SET version = version + 1
+  WHERE rest_id = COALESCE(OLD.rest_id, (SELECT rest_id FROM Reviews WHERE review_id = OLD.review_id));
+END$$
+
+DELIMITER ;
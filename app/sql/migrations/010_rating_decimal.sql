@@ -0,0 +1,74 @@
+-- ===================================
+-- 餐厅评分改为 DECIMAL(4,2)
+-- FLOAT 存储的 rating_sum / review_count（如 4.3333335）与读出后再传回的值（4.33333）不相等，
+-- 列表页按评分游标分页时 r.rating = %s 匹配不到同分的餐厅，翻页会跳过或重复。
+-- 改为精确的两位小数后，游标中保存的值与表中的值完全一致。
+-- ===================================
+
+USE restaurant_db;
+
+ALTER TABLE Restaurants
+    MODIFY COLUMN rating DECIMAL(4,2) NOT NULL DEFAULT 0.00;
+
+UPDATE Restaurants
+SET rating = IF(review_count > 0, ROUND(rating_sum / review_count, 2), 0);
+
+DROP TRIGGER IF EXISTS trg_after_insert_review;
+DROP TRIGGER IF EXISTS trg_after_update_review;
+DROP TRIGGER IF EXISTS trg_after_delete_review;
+
+DELIMITER $$
+
+-- 插入评论时累加餐厅评分总和与评论数
+CREATE TRIGGER trg_after_insert_review
+AFTER INSERT ON Reviews
+FOR EACH ROW
+BEGIN
+  UPDATE Restaurants
+  SET rating_sum = rating_sum + NEW.rating,
+      review_count = review_count + 1,
+      rating = ROUND(rating_sum / review_count, 2)
+  WHERE rest_id = NEW.rest_id;
+END$$
+
+-- 更新评论时按评分差值调整（评论换餐厅时两边分别调整）
+CREATE TRIGGER trg_after_update_review
+AFTER UPDATE ON Reviews
+FOR EACH ROW
+BEGIN
+  IF NOT (OLD.rest_id <=> NEW.rest_id) THEN
+    UPDATE Restaurants
+    SET rating_sum = rating_sum - OLD.rating,
+        review_count = review_count - 1,
+        rating = IF(review_count > 0, ROUND(rating_sum / review_count, 2), 0)
+    WHERE rest_id = OLD.rest_id;
+
+    UPDATE Restaurants
+    SET rating_sum = rating_sum + NEW.rating,
+        review_count = review_count + 1,
+        rating = ROUND(rating_sum / review_count, 2)
+    WHERE rest_id = NEW.rest_id;
+  ELSEIF NOT (OLD.rating <=> NEW.rating) THEN
+    UPDATE Restaurants
+    SET rating_sum = rating_sum - OLD.rating + NEW.rating,
+        rating = IF(review_count > 0, ROUND(rating_sum / review_count, 2), 0)
+    WHERE rest_id = NEW.rest_id;
+  END IF;
+END$$
+
+-- 删除评论时扣减餐厅评分，并自动删除商家回复
+CREATE TRIGGER trg_after_delete_review
+AFTER DELETE ON Reviews
+FOR EACH ROW
+BEGIN
+  DELETE FROM Replies
+  WHERE review_id = OLD.review_id;
+
+  UPDATE Restaurants
+  SET rating_sum = rating_sum - OLD.rating,
+      review_count = review_count - 1,
+      rating = IF(review_count > 0, ROUND(rating_sum / review_count, 2), 0)
+  WHERE rest_id = OLD.rest_id;
+END$$
+
+DELIMITER ;
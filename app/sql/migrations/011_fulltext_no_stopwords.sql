@@ -0,0 +1,22 @@
+-- ===================================
+-- 全文索引不使用停用词表
+-- ngram 分词时，包含停用词（InnoDB 默认列表中的 a、i、in、the 等）的二元组不会进入索引，
+-- "Pizza"、"Thai" 这类拉丁字母名称或地址在自然语言和布尔模式下都搜不到（原来的 LIKE 可以）。
+-- 是否使用停用词在建索引时确定并随索引保存，所以关闭后重建两个全文索引；
+-- 之后手动重建这两个索引时同样需要先关闭 innodb_ft_enable_stopword。
+-- ===================================
+
+USE restaurant_db;
+
+SET SESSION innodb_ft_enable_stopword = 0;
+
+ALTER TABLE Restaurants DROP INDEX ft_restaurants_search;
+ALTER TABLE Restaurants
+    ADD FULLTEXT INDEX ft_restaurants_search (name, type, address) WITH PARSER ngram;
+
+ALTER TABLE Dishes DROP INDEX ft_dishes_search;
+ALTER TABLE Dishes
+    ADD FULLTEXT INDEX ft_dishes_search (name, description) WITH PARSER ngram;
+
+-- 连接会归还到连接池，恢复会话的默认值
+SET SESSION innodb_ft_enable_stopword = DEFAULT;
@@ -0,0 +1,74 @@
+-- ===================================
+-- 餐厅评分保留四位小数：DECIMAL(4,2) -> DECIMAL(6,4)
+-- 原来按 AVG(rating) 排名（四位小数），舍入到两位后 8.334 与 8.3351 都成为 8.33，
+-- 首页排行榜和列表页按评分排序时出现原本没有的并列。四位小数仍是精确值，游标分页不受影响；
+-- 页面上的评分由模板格式化显示。
+-- ===================================
+
+USE restaurant_db;
+
+ALTER TABLE Restaurants
+    MODIFY COLUMN rating DECIMAL(6,4) NOT NULL DEFAULT 0.0000;
+
+UPDATE Restaurants
+SET rating = IF(review_count > 0, ROUND(rating_sum / review_count, 4), 0);
+
+DROP TRIGGER IF EXISTS trg_after_insert_review;
+DROP TRIGGER IF EXISTS trg_after_update_review;
+DROP TRIGGER IF EXISTS trg_after_delete_review;
+
+DELIMITER $$
+
+-- 插入评论时累加餐厅评分总和与评论数
+CREATE TRIGGER trg_after_insert_review
+AFTER INSERT ON Reviews
+FOR EACH ROW
+BEGIN
+  UPDATE Restaurants
+  SET rating_sum = rating_sum + NEW.rating,
+      review_count = review_count + 1,
+      rating = ROUND(rating_sum / review_count, 4)
+  WHERE rest_id = NEW.rest_id;
+END$$
+
+-- 更新评论时按评分差值调整（评论换餐厅时两边分别调整）
+CREATE TRIGGER trg_after_update_review
+AFTER UPDATE ON Reviews
+FOR EACH ROW
+BEGIN
+  IF NOT (OLD.rest_id <=> NEW.rest_id) THEN
+    UPDATE Restaurants
+    SET rating_sum = rating_sum - OLD.rating,
+        review_count = review_count - 1,
+        rating = IF(review_count > 0, ROUND(rating_sum / review_count, 4), 0)
+    WHERE rest_id = OLD.rest_id;
+
+    UPDATE Restaurants
+    SET rating_sum = rating_sum + NEW.rating,
+        review_count = review_count + 1,
+        rating = ROUND(rating_sum / review_count, 4)
+    WHERE rest_id = NEW.rest_id;
+  ELSEIF NOT (OLD.rating <=> NEW.rating) THEN
+    UPDATE Restaurants
+    SET rating_sum = rating_sum - OLD.rating + NEW.rating,
+        rating = IF(review_count > 0, ROUND(rating_sum / review_count, 4), 0)
+    WHERE rest_id = NEW.rest_id;
+  END IF;
+END$$
+
+-- 删除评论时扣减餐厅评分，并自动删除商家回复
+CREATE TRIGGER trg_after_delete_review
+AFTER DELETE ON Reviews
+FOR EACH ROW
+BEGIN
+  DELETE FROM Replies
+  WHERE review_id = OLD.review_id;
+
+  UPDATE Restaurants
+  SET rating_sum = rating_sum - OLD.rating,
+      review_count = review_count - 1,
+      rating = IF(review_count > 0, ROUND(rating_sum / review_count, 4), 0)
+  WHERE rest_id = OLD.rest_id;
+END$$
+
+DELIMITER ;
@@ -0,0 +1,14 @@
+-- ===================================
+-- 等待处理的上传图片
+-- 上传的原图暂存在静态目录之外，img_pending 记录这次上传的暂存标记（app/images.py 的 stage_upload）；
+-- 后台任务处理完成后才替换 img_url、img_variants 并清空 img_pending，期间页面仍显示原来的图片。
+-- 再次上传会覆盖标记，较早上传的任务写回时发现标记不符即放弃。
+-- ===================================
+
+USE restaurant_db;
+
+ALTER TABLE Restaurants
+    ADD COLUMN img_pending CHAR(32) NULL AFTER img_variants;
+
+ALTER TABLE Dishes
+    ADD COLUMN img_pending CHAR(32) NULL AFTER img_variants;
@@ -23,13 +23,20 @@ CREATE TABLE Restaurants (
     rest_id        INT PRIMARY KEY AUTO_INCREMENT,
     name           VARCHAR(100) NOT NULL,
     address        VARCHAR(255),
+    province       VARCHAR(50),   -- 由 address 解析，见 app/address.py
+    city           VARCHAR(50),
+    district       VARCHAR(50),
     phone          VARCHAR(20),
     opening_hours  VARCHAR(100),
     img_url        TEXT,
+    img_variants   JSON,          -- 各尺寸 WebP/JPEG 地址，见 app/images.py
+    img_pending    CHAR(32),      -- 等待后台处理的上传图片的暂存标记
     type           VARCHAR(50),
-    rating         FLOAT DEFAULT 0.0,
-    review_count   INT DEFAULT 0,
-    star_count     INT DEFAULT 0
+    rating         DECIMAL(6,4) NOT NULL DEFAULT 0.0000,  -- 精确到四位小数，游标分页按它比较
+    rating_sum     BIGINT NOT NULL DEFAULT 0,  -- 评分总和，rating = ROUND(rating_sum / review_count, 4)
+    review_count   INT NOT NULL DEFAULT 0,
+    star_count     INT NOT NULL DEFAULT 0,
+    version        BIGINT NOT NULL DEFAULT 1  -- 详情页数据变化时由触发器递增，见 app/sql/triggers.sql
 );
 
 -- 商家-餐厅绑定关系表（多对多）
@@ -49,7 +56,9 @@ CREATE TABLE Dishes (
     description TEXT,
     rest_id     INT,
     img_url     TEXT,
-    rec_count   INT DEFAULT 0,
+    img_variants JSON,
+    img_pending CHAR(32),
+    rec_count   INT NOT NULL DEFAULT 0,
     FOREIGN KEY (rest_id) REFERENCES Restaurants(rest_id) ON DELETE CASCADE
 );
 
@@ -97,3 +106,98 @@ CREATE TABLE Recommendations (
     FOREIGN KEY (user_id) REFERENCES Users(user_id) ON DELETE CASCADE,
     FOREIGN KEY (dish_id) REFERENCES Dishes(dish_id) ON DELETE CASCADE
 );
+
+-- 问题报告表
+CREATE TABLE IssueReports (
+    report_id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NULL,
+    reporter_name VARCHAR(100) NOT NULL,
+    reporter_email VARCHAR(100),
+    issue_type ENUM('bug', 'feature', 'complaint', 'suggestion', 'other') NOT NULL,
+    subject VARCHAR(200) NOT NULL,
+    description TEXT NOT NULL,
+    status ENUM('pending', 'in_progress', 'resolved', 'closed') DEFAULT 'pending',
+    priority ENUM('low', 'medium', 'high', 'urgent') DEFAULT 'medium',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    admin_response TEXT,
+    FOREIGN KEY (user_id) REFERENCES Users(user_id) ON DELETE SET NULL,
+    INDEX idx_issue_reports_status (status, created_at)
+);
+
+-- 餐厅类别表
+CREATE TABLE RestaurantCategories (
+    category_id INT AUTO_INCREMENT PRIMARY KEY,
+    category_name VARCHAR(100) NOT NULL UNIQUE,
+    description TEXT,
+    is_active BOOLEAN DEFAULT TRUE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 后台任务队列表（app/jobs.py）
+CREATE TABLE Jobs (
+    job_id       BIGINT PRIMARY KEY AUTO_INCREMENT,
+    job_type     VARCHAR(50) NOT NULL,
+    payload      JSON NOT NULL,
+    status       ENUM('pending', 'running', 'done', 'failed') NOT NULL DEFAULT 'pending',
+    attempts     INT NOT NULL DEFAULT 0,
+    max_attempts INT NOT NULL DEFAULT 5,
+    run_at       DATETIME(3) NOT NULL,
+    locked_by    VARCHAR(128) NULL,
+    locked_at    DATETIME(3) NULL,
+    last_error   TEXT NULL,
+    created_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_jobs_status_run_at (status, run_at),
+    INDEX idx_jobs_locked_by (locked_by)
+);
+
+-- 上传文件的内容寻址存储及引用计数（app/storage.py）
+CREATE TABLE Blobs (
+    hash       CHAR(64) PRIMARY KEY,
+    ext        VARCHAR(10) NOT NULL,
+    size       INT NOT NULL,
+    ref_count  INT NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_blobs_unreferenced (ref_count, updated_at)
+);
+
+-- =========================
+-- 索引（与 app/sql/migrations 中的 001、003、004、005、011 保持一致）
+-- =========================
+
+-- 全文索引不使用停用词表：ngram 分词时含停用词（a、i 等）的二元组会被丢弃，
+-- "Pizza"、"Thai" 等拉丁字母的名称搜不到。该设置在建索引时生效并随索引保存
+SET SESSION innodb_ft_enable_stopword = 0;
+CREATE FULLTEXT INDEX ft_restaurants_search ON Restaurants (name, type, address) WITH PARSER ngram;
+CREATE FULLTEXT INDEX ft_dishes_search ON Dishes (name, description) WITH PARSER ngram;
+SET SESSION innodb_ft_enable_stopword = DEFAULT;
+
+ALTER TABLE Favourites
+    ADD UNIQUE KEY uk_favourites_user_rest (user_id, rest_id),
+    ADD INDEX idx_favourites_user_time (user_id, timestamp);
+
+ALTER TABLE Recommendations
+    ADD UNIQUE KEY uk_recommendations_user_dish (user_id, dish_id);
+
+ALTER TABLE Reviews
+    ADD INDEX idx_reviews_rest_time (rest_id, review_time),
+    ADD INDEX idx_reviews_rest_timestamp (rest_id, timestamp),
+    ADD INDEX idx_reviews_user_time (user_id, review_time),
+    ADD INDEX idx_reviews_time (review_time, review_id);
+
+ALTER TABLE Restaurants
+    ADD INDEX idx_restaurants_type_rating (type, rating DESC, name, rest_id),
+    ADD INDEX idx_restaurants_rating (rating DESC, name, rest_id),
+    ADD INDEX idx_restaurants_name (name, rest_id),
+    ADD INDEX idx_restaurants_review_count (review_count DESC, rating DESC, rest_id),
+    ADD INDEX idx_restaurants_city (city, rating DESC, name);
+
+ALTER TABLE Users
+    ADD INDEX idx_users_email (email),
+    ADD INDEX idx_users_join_date (join_date, user_id),
+    ADD INDEX idx_users_type_name (user_type, is_deleted, username);
+
+ALTER TABLE Dishes
+    ADD INDEX idx_dishes_rest_name (rest_id, name);
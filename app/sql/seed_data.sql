@@ -32,12 +32,12 @@ INSERT INTO Users (username, password, email, phone, user_type) VALUES
 ('user5', '$2b$12$1oE9vBM6oHmJRzT0.jZ2f.Vpq2XH1LzUSYDA6TWyLjCxxsRCEwPxe', 'user5@example.com', '13900000005', 'user');
 
 -- 插入餐厅数据
-INSERT INTO Restaurants (name, address, phone, opening_hours, img_url, type) VALUES
-('川香园', '北京市海淀区中关村大街1号', '010-12345678', '10:00-22:00', '/static/images/2.jpg', '川菜'),
-('江南味道', '上海市浦东新区张杨路500号', '021-87654321', '11:00-21:30', '/static/images/2.jpg', '江浙菜'),
-('北方面馆', '天津市和平区南京路89号', '022-55667788', '08:00-20:00', '/static/images/2.jpg', '面食'),
-('海鲜世家', '广东省广州市越秀区北京路123号', '020-98765432', '11:30-23:00', '/static/images/2.jpg', '粤菜'),
-('老北京烤鸭', '北京市东城区王府井大街10号', '010-11223344', '11:00-21:00', '/static/images/2.jpg', '京菜');
+INSERT INTO Restaurants (name, address, province, city, district, phone, opening_hours, img_url, type) VALUES
+('川香园', '北京市海淀区中关村大街1号', '北京市', '北京市', '海淀区', '010-12345678', '10:00-22:00', '/static/images/2.jpg', '川菜'),
+('江南味道', '上海市浦东新区张杨路500号', '上海市', '上海市', '浦东新区', '021-87654321', '11:00-21:30', '/static/images/2.jpg', '江浙菜'),
+('北方面馆', '天津市和平区南京路89号', '天津市', '天津市', '和平区', '022-55667788', '08:00-20:00', '/static/images/2.jpg', '面食'),
+('海鲜世家', '广东省广州市越秀区北京路123号', '广东省', '广州市', '越秀区', '020-98765432', '11:30-23:00', '/static/images/2.jpg', '粤菜'),
+('老北京烤鸭', '北京市东城区王府井大街10号', '北京市', '北京市', '东城区', '010-11223344', '11:00-21:00', '/static/images/2.jpg', '京菜');
 
 -- 关联商家和餐厅
 INSERT INTO MerchantRestaurant (merchant_id, restaurant_id) VALUES
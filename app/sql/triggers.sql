@@ -1,39 +1,46 @@
 DELIMITER $$
 
--- 插入评论时更新餐厅评分
+-- 评分/评论数/收藏数/推荐数均按增量维护（O(1)），不再对子表全量重算。
+-- 计数偏差由 `flask reconcile-aggregates` 定期检查并修复。
+
+-- 插入评论时累加餐厅评分总和与评论数
 CREATE TRIGGER trg_after_insert_review
 AFTER INSERT ON Reviews
 FOR EACH ROW
 BEGIN
   UPDATE Restaurants
-  SET rating = (
-      SELECT AVG(rating)
-      FROM Reviews
-      WHERE rest_id = NEW.rest_id
-  ),
-      review_count = (
-      SELECT COUNT(*)
-      FROM Reviews
-      WHERE rest_id = NEW.rest_id
-  )
+  SET rating_sum = rating_sum + NEW.rating,
+      review_count = review_count + 1,
+      rating = ROUND(rating_sum / review_count, 4)
   WHERE rest_id = NEW.rest_id;
 END$$
 
--- 更新评论评分时更新餐厅评分
+-- 更新评论时按评分差值调整（评论换餐厅时两边分别调整）
 CREATE TRIGGER trg_after_update_review
 AFTER UPDATE ON Reviews
 FOR EACH ROW
 BEGIN
-  UPDATE Restaurants
-  SET rating = (
-      SELECT AVG(rating)
-      FROM Reviews
-      WHERE rest_id = NEW.rest_id
-  )
-  WHERE rest_id = NEW.rest_id;
+  IF NOT (OLD.rest_id <=> NEW.rest_id) THEN
+    UPDATE Restaurants
+    SET rating_sum = rating_sum - OLD.rating,
+        review_count = review_count - 1,
+        rating = IF(review_count > 0, ROUND(rating_sum / review_count, 4), 0)
+    WHERE rest_id = OLD.rest_id;
+
+    UPDATE Restaurants
+    SET rating_sum = rating_sum + NEW.rating,
+        review_count = review_count + 1,
+        rating = ROUND(rating_sum / review_count, 4)
+    WHERE rest_id = NEW.rest_id;
+  ELSEIF NOT (OLD.rating <=> NEW.rating) THEN
+    UPDATE Restaurants
+    SET rating_sum = rating_sum - OLD.rating + NEW.rating,
+        rating = IF(review_count > 0, ROUND(rating_sum / review_count, 4), 0)
+    WHERE rest_id = NEW.rest_id;
+  END IF;
 END$$
 
--- 删除评论时更新餐厅评分，并自动删除商家回复
+-- 删除评论时扣减餐厅评分，并自动删除商家回复
 CREATE TRIGGER trg_after_delete_review
 AFTER DELETE ON Reviews
 FOR EACH ROW
@@ -42,16 +49,9 @@ BEGIN
   WHERE review_id = OLD.review_id;
 
   UPDATE Restaurants
-  SET rating = (
-      SELECT IFNULL(AVG(rating), 0)
-      FROM Reviews
-      WHERE rest_id = OLD.rest_id
-  ),
-      review_count = (
-      SELECT COUNT(*)
-      FROM Reviews
-      WHERE rest_id = OLD.rest_id
-  )
+  SET rating_sum = rating_sum - OLD.rating,
+      review_count = review_count - 1,
+      rating = IF(review_count > 0, ROUND(rating_sum / review_count, 4), 0)
   WHERE rest_id = OLD.rest_id;
 END$$
 
@@ -65,11 +65,7 @@ AFTER INSERT ON Favourites
 FOR EACH ROW
 BEGIN
   UPDATE Restaurants
-  SET star_count = (
-      SELECT COUNT(*)
-      FROM Favourites
-      WHERE rest_id = NEW.rest_id
-  )
+  SET star_count = star_count + 1
   WHERE rest_id = NEW.rest_id;
 END$$
 
@@ -79,11 +75,7 @@ AFTER DELETE ON Favourites
 FOR EACH ROW
 BEGIN
   UPDATE Restaurants
-  SET star_count = (
-      SELECT COUNT(*)
-      FROM Favourites
-      WHERE rest_id = OLD.rest_id
-  )
+  SET star_count = star_count - 1
   WHERE rest_id = OLD.rest_id;
 END$$
 
@@ -93,11 +85,7 @@ AFTER INSERT ON Recommendations
 FOR EACH ROW
 BEGIN
   UPDATE Dishes
-  SET rec_count = (
-      SELECT COUNT(*)
-      FROM Recommendations
-      WHERE dish_id = NEW.dish_id
-  )
+  SET rec_count = rec_count + 1
   WHERE dish_id = NEW.dish_id;
 END$$
 
@@ -107,11 +95,7 @@ AFTER DELETE ON Recommendations
 FOR EACH ROW
 BEGIN
   UPDATE Dishes
-  SET rec_count = (
-      SELECT COUNT(*)
-      FROM Recommendations
-      WHERE dish_id = OLD.dish_id
-  )
+  SET rec_count = rec_count - 1
   WHERE dish_id = OLD.dish_id;
 END$$
 
@@ -139,4 +123,68 @@ BEGIN
         SET MESSAGE_TEXT = '邮箱格式不正确';
     END IF;
 END$$
-DELIMITER ;
\ No newline at end of file
+DELIMITER ;
+
+-- 餐厅版本号（详情页 ETag），与 app/sql/migrations/009_restaurant_version.sql 保持一致
+DELIMITER $$
+
+-- 餐厅的任何更新（包括聚合列的增量维护）都递增版本号
+CREATE TRIGGER trg_before_update_restaurant
+BEFORE UPDATE ON Restaurants
+FOR EACH ROW
+BEGIN
+  SET NEW.version = OLD.version + 1;
+END$$
+
+-- 菜品增删改时递增所属餐厅的版本号（UPDATE 触发上面的触发器）
+CREATE TRIGGER trg_after_insert_dish
+AFTER INSERT ON Dishes
+FOR EACH ROW
+BEGIN
+  UPDATE Restaurants SET version = version + 1 WHERE rest_id = NEW.rest_id;
+END$$
+
+CREATE TRIGGER trg_after_update_dish
+AFTER UPDATE ON Dishes
+FOR EACH ROW
+BEGIN
+  UPDATE Restaurants SET version = version + 1 WHERE rest_id = NEW.rest_id;
+  IF NOT (OLD.rest_id <=> NEW.rest_id) THEN
+    UPDATE Restaurants SET version = version + 1 WHERE rest_id = OLD.rest_id;
+  END IF;
+END$$
+
+CREATE TRIGGER trg_after_delete_dish
+AFTER DELETE ON Dishes
+FOR EACH ROW
+BEGIN
+  UPDATE Restaurants SET version = version + 1 WHERE rest_id = OLD.rest_id;
+END$$
+
+-- 商家回复增删改时递增餐厅的版本号（部分写入路径没有填 Replies.rest_id，按评论查所属餐厅）
+CREATE TRIGGER trg_after_insert_reply
+AFTER INSERT ON Replies
+FOR EACH ROW
+BEGIN
+  UPDATE Restaurants SET version = version + 1
+  WHERE rest_id = COALESCE(NEW.rest_id, (SELECT rest_id FROM Reviews WHERE review_id = NEW.review_id));
+END$$
+
+CREATE TRIGGER trg_after_update_reply
+AFTER UPDATE ON Replies
+FOR EACH ROW
+BEGIN
+  UPDATE Restaurants SET version = version + 1
+  WHERE rest_id = COALESCE(NEW.rest_id, (SELECT rest_id FROM Reviews WHERE review_id = NEW.review_id));
+END$$
+
+-- 随评论一起删除时评论已不存在，评论的删除本身已经递增了版本号
+CREATE TRIGGER trg_after_delete_reply
+AFTER DELETE ON Replies
+FOR EACH ROW
+BEGIN
+  UPDATE Restaurants SET version = version + 1
+  WHERE rest_id = COALESCE(OLD.rest_id, (SELECT rest_id FROM Reviews WHERE review_id = OLD.review_id));
+END$$
+
+DELIMITER ;
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import re
+import threading
+import time
+
+import MySQLdb.cursors
+from flask import current_app, g, has_app_context, has_request_context, request
+
+# 每个请求的 SQL 统计：
+# - 游标类替换为带计时的子类，记录查询次数、数据库总耗时、取回的行数和最慢的一条语句
+# - 超过 SQL_SLOW_QUERY_MS 的语句按规范化后的指纹（去掉字面量）写入日志
+# - 统计结果通过 Server-Timing 响应头返回，浏览器开发者工具的 Timing 面板中可以直接看到
+#
+# 统计保存在 g 中，请求之外的应用上下文（后台任务、命令行）同样记录慢查询。
+#
+# 设置 SQL_CAPTURE_FILE 后，每种 SELECT/UPDATE/DELETE 语句（按指纹区分）第一次执行时
+# 连同实际参数和所在端点追加到该文件（JSON Lines），供 `flask plan-check` 检查执行计划。
+
+SLOW_QUERY_MS = 100
+
+_COMMENT = re.compile(r'/\*.*?\*/|--[^\n]*', re.S)
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+_CAPTURED_KINDS = ('SELECT', 'UPDATE', 'DELETE')
+
+_captured = set()
+_capture_lock = threading.Lock()
+
+
+def fingerprint(sql):
+    """规范化 SQL：去掉注释，字面量替换为 ?，IN 列表合并，只保留语句结构"""
+    sql = _COMMENT.sub(' ', sql)
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('(?+)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def fingerprint_id(normalized):
+    return hashlib.md5(normalized.encode('utf-8')).hexdigest()[:12]
+
+
+def _new_stats():
+    return {'queries': 0, 'time': 0.0, 'rows': 0, 'slowest': None, 'slowest_time': 0.0}
+
+
+def current_stats():
+    """当前上下文的统计，没有应用上下文时返回 None"""
+    if not has_app_context():
+        return None
+    stats = g.get('_sql_stats')
+    if stats is None:
+        stats = g._sql_stats = _new_stats()
+    return stats
+
+
+def _record(query, elapsed):
+    stats = current_stats()
+    if stats is None:
+        return
+    stats['queries'] += 1
+    stats['time'] += elapsed
+    if stats['slowest'] is None or elapsed > stats['slowest_time']:
+        stats['slowest'] = query
+        stats['slowest_time'] = elapsed
+
+    threshold = current_app.config.get('SQL_SLOW_QUERY_MS', SLOW_QUERY_MS)
+    if elapsed * 1000 >= threshold:
+        if isinstance(query, bytes):
+            query = query.decode('utf-8', 'replace')
+        normalized = fingerprint(query)
+        current_app.logger.warning('慢查询 %.1fms [%s] %s', elapsed * 1000,
+                                   fingerprint_id(normalized), normalized)
+
+
+def _capture(query, executed):
+    path = current_app.config.get('SQL_CAPTURE_FILE')
+    if not path:
+        return
+    if isinstance(query, bytes):
+        query = query.decode('utf-8', 'replace')
+    if not query.lstrip().upper().startswith(_CAPTURED_KINDS):
+        return
+    normalized = fingerprint(query)
+    key = fingerprint_id(normalized)
+    with _capture_lock:
+        if key in _captured:
+            return
+        _captured.add(key)
+        if isinstance(executed, bytes):
+            executed = executed.decode('utf-8', 'replace')
+        entry = {'id': key, 'fingerprint': normalized, 'sql': executed or query,
+                 'endpoint': request.endpoint if has_request_context() else None}
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+
+def captured_statements(path):
+    """读取 SQL_CAPTURE_FILE，按指纹去重（多个进程可能各自写入同一种语句）"""
+    statements = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            statements.setdefault(entry['id'], entry)
+    return list(statements.values())
+
+
+class InstrumentedCursorMixin:
+    """记录 execute 耗时和 fetch 行数，与 MySQLdb 的游标类组合使用"""
+
+    _in_executemany = False
+
+    def execute(self, query, args=None):
+        if self._in_executemany:
+            return super().execute(query, args)
+        started = time.perf_counter()
+        try:
+            return super().execute(query, args)
+        finally:
+            _record(query, time.perf_counter() - started)
+            if has_app_context():
+                _capture(query, getattr(self, '_executed', None))
+
+    def executemany(self, query, args):
+        # 非 INSERT 语句的 executemany 在 MySQLdb 内部逐条调用 execute，只按一条统计
+        started = time.perf_counter()
+        self._in_executemany = True
+        try:
+            return super().executemany(query, args)
+        finally:
+            self._in_executemany = False
+            _record(query, time.perf_counter() - started)
+
+    def _count_rows(self, count):
+        stats = current_stats()
+        if stats is not None:
+            stats['rows'] += count
+
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None:
+            self._count_rows(1)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(size)
+        self._count_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        self._count_rows(len(rows))
+        return rows
+
+
+def instrumented_cursor_class(name):
+    """按 MySQLdb 游标类的名称生成带统计的游标类，作为 MYSQL_CURSORCLASS 使用"""
+    base = getattr(MySQLdb.cursors, name or 'Cursor')
+    return type(f'Instrumented{base.__name__}', (InstrumentedCursorMixin, base), {})
+
+
+def _server_timing(stats, total):
+    metrics = [
+        f'db;desc="{stats["queries"]} queries, {stats["rows"]} rows";dur={stats["time"] * 1000:.1f}',
+    ]
+    if stats['slowest'] is not None:
+        slowest = stats['slowest']
+        if isinstance(slowest, bytes):
+            slowest = slowest.decode('utf-8', 'replace')
+        metrics.append(f'db-slowest;desc="{fingerprint_id(fingerprint(slowest))}";'
+                       f'dur={stats["slowest_time"] * 1000:.1f}')
+    metrics.append(f'app;dur={total * 1000:.1f}')
+    return ', '.join(metrics)
+
+
+def register_sql_stats(app):
+    """注册请求钩子（由 create_app 调用），游标类由 create_app 设置为 instrumented_cursor_class"""
+
+    @app.before_request
+    def start_sql_stats():
+        g._sql_stats = _new_stats()
+        g._request_started = time.perf_counter()
+
+    @app.after_request
+    def add_server_timing(response):
+        stats = g.get('_sql_stats')
+        if stats is None or not app.config.get('SERVER_TIMING', True):
+            return response
+        total = time.perf_counter() - g.get('_request_started', time.perf_counter())
+        response.headers['Server-Timing'] = _server_timing(stats, total)
+        return response
@@ -12,4 +12,102 @@ document.addEventListener('DOMContentLoaded', function() {
           }, 300);
       });
   }, 5000);
-});
\ No newline at end of file
+});
+
+// 外壳页面的个人状态（见 app/shell.py）：
+// 页面 HTML 与用户无关，加载后请求 /api/user_state，按结果显示导航菜单、
+// 填充 CSRF 令牌以及收藏/推荐按钮的状态。完成后触发 userstate 事件。
+window.userState = null;
+
+function csrfToken() {
+  return window.userState ? window.userState.csrf_token : '';
+}
+
+function setFavoriteState(btn, on) {
+  btn.classList.toggle('active', on);
+  btn.dataset.state = on ? 'on' : 'off';
+  const icon = btn.querySelector('i');
+  if (icon) {
+      icon.className = (on ? 'fas' : 'far') + ' fa-heart';
+  }
+  const label = btn.querySelector('[data-label]');
+  if (label) {
+      label.textContent = on ? '取消收藏' : '收藏餐厅';
+  }
+}
+
+function setRecommendState(btn, on) {
+  btn.classList.toggle('btn-success', on);
+  btn.classList.toggle('btn-outline-success', !on);
+  btn.dataset.state = on ? 'on' : 'off';
+  btn.textContent = on ? '已推荐' : '推荐菜品';
+}
+
+function applyUserState(state) {
+  const user = state.user;
+  document.querySelectorAll('[data-show-for]').forEach(function(el) {
+      const role = el.dataset.showFor;
+      let visible;
+      if (role === 'anonymous') {
+          visible = !state.authenticated;
+      } else if (role === 'authenticated') {
+          visible = state.authenticated;
+      } else {
+          visible = !!user && user.user_type === role;
+      }
+      el.hidden = !visible;
+  });
+
+  document.querySelectorAll('[data-user-field]').forEach(function(el) {
+      el.textContent = user ? user[el.dataset.userField] : '';
+  });
+
+  document.querySelectorAll('[data-owner-id]').forEach(function(el) {
+      el.hidden = !user || String(user.id) !== el.dataset.ownerId;
+  });
+
+  document.querySelectorAll('input[name="csrf_token"]').forEach(function(input) {
+      if (!input.value) {
+          input.value = state.csrf_token;
+      }
+  });
+
+  const favorites = new Set(state.favorites);
+  document.querySelectorAll('[data-favorite-btn]').forEach(function(btn) {
+      setFavoriteState(btn, favorites.has(Number(btn.dataset.restId)));
+  });
+
+  const recommended = new Set(state.recommended);
+  document.querySelectorAll('[data-recommend-btn]').forEach(function(btn) {
+      setRecommendState(btn, recommended.has(Number(btn.dataset.dishId)));
+  });
+}
+
+function collectIds(selector, key) {
+  const ids = new Set();
+  document.querySelectorAll(selector).forEach(function(el) {
+      ids.add(el.dataset[key]);
+  });
+  return Array.from(ids).join(',');
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+  const url = document.body.dataset.userStateUrl;
+  if (!url) {
+      return;
+  }
+  const params = new URLSearchParams({
+      rest_ids: collectIds('[data-favorite-btn]', 'restId'),
+      dish_ids: collectIds('[data-recommend-btn]', 'dishId')
+  });
+  fetch(url + '?' + params.toString(), {credentials: 'same-origin'})
+      .then(function(response) { return response.json(); })
+      .then(function(state) {
+          window.userState = state;
+          applyUserState(state);
+          document.dispatchEvent(new CustomEvent('userstate', {detail: state}));
+      })
+      .catch(function(error) {
+          console.error('加载用户状态失败:', error);
+      });
+});
@@ -0,0 +1,79 @@
+import hashlib
+import os
+import threading
+
+from flask import request
+
+from app import storage
+
+# 静态文件的 HTTP 缓存：
+# - url_for('static', ...) 生成的地址自动带上内容指纹（?v=<hash>），指纹与当前文件一致时按不可变资源长期缓存，
+#   文件修改后指纹变化，浏览器会请求新地址；
+# - 上传目录中的文件名都是内容哈希或 uuid，写入后不会再改，同样长期缓存；
+# - 其他静态请求（没有指纹或指纹已过期）要求每次用 ETag/Last-Modified 重新验证，未修改时返回 304。
+#   ETag、Last-Modified 和条件请求由 Flask 的 send_from_directory 处理。
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600  # 秒
+FINGERPRINT_LENGTH = 12
+
+_fingerprints = {}  # 文件路径 -> (mtime, size, 指纹)
+_lock = threading.Lock()
+
+
+def file_fingerprint(folder, filename):
+    """文件内容的短哈希，文件修改时间或大小变化时重新计算；文件不存在时返回 None"""
+    path = os.path.join(folder, filename)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    cached = _fingerprints.get(path)
+    if cached and cached[0] == stat.st_mtime and cached[1] == stat.st_size:
+        return cached[2]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    fingerprint = digest.hexdigest()[:FINGERPRINT_LENGTH]
+    with _lock:
+        _fingerprints[path] = (stat.st_mtime, stat.st_size, fingerprint)
+    return fingerprint
+
+
+def _is_upload(filename):
+    return filename.replace('\\', '/').startswith('uploads/')
+
+
+def register_static_caching(app):
+    """注册静态地址指纹和缓存响应头（由 create_app 调用）"""
+
+    @app.url_defaults
+    def add_static_fingerprint(endpoint, values):
+        if endpoint != 'static' or 'v' in values:
+            return
+        filename = values.get('filename')
+        if not filename or _is_upload(filename):
+            return
+        fingerprint = file_fingerprint(app.static_folder, filename)
+        if fingerprint:
+            values['v'] = fingerprint
+
+    @app.after_request
+    def add_static_cache_headers(response):
+        if request.endpoint != 'static' or response.status_code not in (200, 304):
+            return response
+
+        filename = (request.view_args or {}).get('filename', '')
+        version = request.args.get('v')
+        if _is_upload(filename) or storage.parse_blob_url(request.path):
+            immutable = True
+        else:
+            immutable = version is not None and version == file_fingerprint(app.static_folder, filename)
+
+        if immutable:
+            response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+        else:
+            response.headers['Cache-Control'] = 'public, no-cache'
+        return response
@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+
+from flask import current_app
+
+from app import mysql
+
+# 按内容寻址的上传文件存储：文件名为内容的 SHA-256，相同内容只存一份，
+# 按哈希前缀分两级子目录存放（uploads/ab/cd/<hash>.<ext>），单个目录中的文件数保持在较小规模。
+# Blobs 表记录每个文件被多少个图片地址引用；引用计数与业务数据在同一事务中增减，
+# 计数降为 0 的文件不立即删除，由 collect_garbage 在宽限期后统一清理。
+
+SHARD_WIDTH = 2   # 每级子目录取哈希的字符数（每级 256 个目录）
+SHARD_DEPTH = 2
+GC_GRACE = 3600   # 秒，引用计数为 0 或未登记的文件至少保留这么久再清理
+
+_SHARD_DIR = re.compile(r'^[0-9a-f]{%d}$' % SHARD_WIDTH)
+_BLOB_URL = re.compile(r'/uploads/' + r'[0-9a-f]{%d}/' % SHARD_WIDTH * SHARD_DEPTH + r'([0-9a-f]{64})\.(\w+)$')
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _relpath(digest, ext):
+    shards = [digest[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH] for i in range(SHARD_DEPTH)]
+    return '/'.join(shards + [f'{digest}.{ext}'])
+
+
+def blob_path(digest, ext):
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], *_relpath(digest, ext).split('/'))
+
+
+def blob_url(digest, ext):
+    # 后台任务中没有请求上下文，不能用 url_for
+    return f"{current_app.static_url_path}/uploads/{_relpath(digest, ext)}"
+
+
+def parse_blob_url(url):
+    """从地址解析出 (hash, ext)，不是内容寻址存储的地址时返回 None"""
+    match = _BLOB_URL.search(url or '')
+    return match.groups() if match else None
+
+
+def _write(path, data):
+    """写入文件（已存在时只刷新修改时间），先写临时文件再改名，读到的文件不会是写了一半的"""
+    if os.path.exists(path):
+        os.utime(path)  # 刷新修改时间，避免被当作超过宽限期的孤立文件清理
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def store(cur, data, ext):
+    """保存内容并增加一次引用，返回地址；在调用方的事务中执行，调用方负责提交
+
+    先登记引用（锁住 Blobs 中的该行）再写文件：与 collect_garbage 并发时，
+    要么清理等待本事务提交后看到引用不再删除，要么本事务等待清理提交后重新写入文件。
+    """
+    digest = content_hash(data)
+    cur.execute("""
+        INSERT INTO Blobs (hash, ext, size, ref_count) VALUES (%s, %s, %s, 1)
+        ON DUPLICATE KEY UPDATE ref_count = ref_count + 1
+    """, (digest, ext, len(data)))
+    _write(blob_path(digest, ext), data)
+    return blob_url(digest, ext)
+
+
+def release(cur, urls):
+    """每个地址减少一次引用；在调用方的事务中执行
+
+    返回其中不属于内容寻址存储的地址（旧的 uuid 文件名），由调用方自行删除。
+    """
+    legacy = []
+    for url in urls:
+        if not url:
+            continue
+        parsed = parse_blob_url(url)
+        if parsed is None:
+            legacy.append(url)
+            continue
+        cur.execute("""
+            UPDATE Blobs SET ref_count = ref_count - 1
+            WHERE hash = %s AND ref_count > 0
+        """, (parsed[0],))
+    return legacy
+
+
+def _referenced_uploads(cur):
+    """餐厅和菜品当前引用的上传目录根下的文件名（旧的 uuid 文件名及暂存的原图）"""
+    names = set()
+    for table in ('Restaurants', 'Dishes'):
+        cur.execute(f"SELECT img_url, img_variants FROM {table} WHERE img_url LIKE '%%/uploads/%%'")
+        for row in cur.fetchall():
+            urls = [row['img_url']]
+            if row['img_variants']:
+                variants = row['img_variants']
+                if not isinstance(variants, dict):
+                    variants = json.loads(variants)
+                urls.extend(url for record in variants.values() for url in record.values()
+                            if isinstance(url, str))
+            names.update(url.rsplit('/', 1)[-1] for url in urls if url)
+    return names
+
+
+def _remove(path):
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+        return size
+    except OSError:
+        return 0
+
+
+def collect_garbage(grace=GC_GRACE, dry_run=False):
+    """清理不再被引用的文件，返回统计 {'blobs', 'orphans', 'legacy', 'bytes'}
+
+    - blobs：引用计数为 0 且超过宽限期的文件及其登记行
+    - orphans：分片目录中没有登记的文件（写入后事务回滚、临时文件残留等）
+    - legacy：上传目录根下没有被任何餐厅或菜品引用的旧文件
+    宽限期用于避开刚写入、引用还未提交的文件。
+    """
+    stats = {'blobs': 0, 'orphans': 0, 'legacy': 0, 'bytes': 0}
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    cutoff = time.time() - grace
+
+    cur = mysql.connection.cursor()
+    try:
+        cur.execute("""
+            SELECT hash, ext FROM Blobs
+            WHERE ref_count = 0 AND updated_at < NOW() - INTERVAL %s SECOND
+        """, (grace,))
+        for row in cur.fetchall():
+            if dry_run:
+                stats['blobs'] += 1
+                continue
+            # 删除登记行后、提交前删除文件：行锁保证这期间 store 不会为同一内容登记新的引用
+            cur.execute("DELETE FROM Blobs WHERE hash = %s AND ref_count = 0", (row['hash'],))
+            if cur.rowcount:
+                stats['bytes'] += _remove(blob_path(row['hash'], row['ext']))
+                stats['blobs'] += 1
+            mysql.connection.commit()
+
+        cur.execute("SELECT hash FROM Blobs")
+        known = {row['hash'] for row in cur.fetchall()}
+        referenced = _referenced_uploads(cur)
+    finally:
+        cur.close()
+
+    for dirpath, dirnames, filenames in os.walk(upload_folder):
+        shards = [] if dirpath == upload_folder else os.path.relpath(dirpath, upload_folder).split(os.sep)
+        if not all(_SHARD_DIR.match(shard) for shard in shards):
+            continue  # 其他子目录不归本模块管理
+        depth = len(shards)
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            if filename.startswith('.') or os.path.getmtime(path) > cutoff:
+                continue
+            if depth == 0:
+                if filename in referenced:
+                    continue
+                kind = 'legacy'
+            elif depth == SHARD_DEPTH and filename.split('.', 1)[0] in known and not filename.endswith('.tmp'):
+                continue
+            else:
+                kind = 'orphans'
+            stats[kind] += 1
+            stats['bytes'] += os.path.getsize(path) if dry_run else _remove(path)
+    return stats
@@ -0,0 +1,126 @@
+"""压测用的 HTTP 客户端：只依赖标准库，长连接，自行保存 Cookie，不跟随重定向"""
+import http.client
+import json
+import re
+import time
+import urllib.parse
+from http.cookies import SimpleCookie
+
+_CSRF_INPUT = re.compile(r'name="csrf_token"\s+value="([^"]*)"')
+_SERVER_TIMING = re.compile(r'(?:^|,)\s*([\w-]+)((?:\s*;\s*[\w-]+=(?:"[^"]*"|[^;,]*))*)')
+_TIMING_PARAM = re.compile(r'([\w-]+)=("[^"]*"|[^;,]*)')
+
+
+class Response:
+    __slots__ = ('status', 'headers', 'body', 'elapsed')
+
+    def __init__(self, status, headers, body, elapsed):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.elapsed = elapsed
+
+    def json(self):
+        return json.loads(self.body)
+
+    def server_timing(self):
+        """解析 Server-Timing 响应头：{名称: {'dur': 毫秒, 'desc': 说明}}"""
+        metrics = {}
+        for name, params in _SERVER_TIMING.findall(self.headers.get('server-timing', '')):
+            values = {}
+            for key, value in _TIMING_PARAM.findall(params):
+                value = value.strip('"')
+                values[key] = float(value) if key == 'dur' else value
+            metrics[name] = values
+        return metrics
+
+
+class Client:
+    """单个虚拟用户：一个长连接和一组 Cookie，不是线程安全的"""
+
+    def __init__(self, base_url, timeout=30):
+        parsed = urllib.parse.urlsplit(base_url)
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.https = parsed.scheme == 'https'
+        self.prefix = parsed.path.rstrip('/')
+        self.timeout = timeout
+        self.cookies = {}
+        self.csrf_token = None
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            self._conn = cls(self.host, self.port, timeout=self.timeout)
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def request(self, method, path, form=None, json_body=None, headers=None):
+        headers = dict(headers or {})
+        body = None
+        if form is not None:
+            body = urllib.parse.urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif json_body is not None:
+            body = json.dumps(json_body)
+            headers['Content-Type'] = 'application/json'
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+
+        # 服务端关闭了空闲连接时重连一次
+        for attempt in (1, 2):
+            conn = self._connection()
+            started = time.perf_counter()
+            try:
+                conn.request(method, self.prefix + path, body=body, headers=headers)
+                raw = conn.getresponse()
+                data = raw.read()
+            except (http.client.HTTPException, ConnectionError, OSError):
+                self.close()
+                if attempt == 2:
+                    raise
+                continue
+            elapsed = time.perf_counter() - started
+            break
+
+        response_headers = {}
+        for name, value in raw.getheaders():
+            name = name.lower()
+            if name == 'set-cookie':
+                cookie = SimpleCookie()
+                cookie.load(value)
+                for key, morsel in cookie.items():
+                    self.cookies[key] = morsel.value
+            else:
+                response_headers[name] = value
+        if raw.will_close:
+            self.close()
+        return Response(raw.status, response_headers, data, elapsed)
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def login(self, username, password):
+        """按表单登录，成功后通过 /api/user_state 取得 CSRF 令牌"""
+        page = self.get('/auth/login')
+        match = _CSRF_INPUT.search(page.body.decode('utf-8', 'replace'))
+        form = {'username': username, 'password': password}
+        if match:
+            form['csrf_token'] = match.group(1)
+        response = self.post('/auth/login', form=form)
+        if response.status != 302:
+            raise RuntimeError(f'{username} 登录失败（HTTP {response.status}）')
+        self.refresh_csrf()
+
+    def refresh_csrf(self):
+        state = self.get('/api/user_state').json()
+        self.csrf_token = state.get('csrf_token')
+        return state
@@ -0,0 +1,97 @@
+"""对比两次压测结果
+
+用法：
+    python -m benchmarks.compare benchmarks/results/base.json benchmarks/results/new.json --threshold 10
+
+逐场景打印 p50/p95/p99 和吞吐量的变化。任一场景的 p95、p99 变慢或吞吐量下降超过 --threshold 百分比，
+或新结果出现错误时，以状态码 1 退出，可用于 CI 中的性能回归检查。
+两次结果的数据规模、并发数或模式不同时会给出提示，这种情况下的对比没有意义。
+"""
+import argparse
+import json
+import sys
+
+from benchmarks.runner import RESULT_FORMAT
+
+# (指标名, 取值函数, 越大越好)
+METRICS = [
+    ('p50', lambda s: s['latency_ms']['p50'], False),
+    ('p95', lambda s: s['latency_ms']['p95'], False),
+    ('p99', lambda s: s['latency_ms']['p99'], False),
+    ('rps', lambda s: s['throughput_rps'], True),
+]
+# 参与回归判定的指标（p50 波动小但对单次慢请求不敏感，只做展示）
+GATED = ('p95', 'p99', 'rps')
+COMPARABLE_META = ('mode', 'concurrency', 'duration', 'seed', 'dataset')
+
+
+def load(path):
+    with open(path, encoding='utf-8') as f:
+        report = json.load(f)
+    if report.get('format') != RESULT_FORMAT:
+        raise SystemExit(f'{path}: 不支持的结果格式 {report.get("format")}')
+    return report
+
+
+def change(old, new):
+    """变化百分比，old 为 0 时返回 None"""
+    if not old:
+        return None
+    return (new - old) / old * 100
+
+
+def compare(base, new, threshold):
+    """返回 (表格行, 回归列表)"""
+    rows = []
+    regressions = []
+    for name, new_stats in new['scenarios'].items():
+        base_stats = base['scenarios'].get(name)
+        if base_stats is None:
+            rows.append((name, '（基线中没有该场景）'))
+            continue
+        cells = []
+        for metric, value, higher_is_better in METRICS:
+            old_value, new_value = value(base_stats), value(new_stats)
+            pct = change(old_value, new_value)
+            cells.append(f'{metric} {old_value:.1f}→{new_value:.1f}'
+                         + ('' if pct is None else f' ({pct:+.1f}%)'))
+            if pct is None or metric not in GATED:
+                continue
+            worse = -pct if higher_is_better else pct
+            if worse > threshold:
+                regressions.append(f'{name}: {metric} {pct:+.1f}%')
+        if new_stats['errors']:
+            regressions.append(f'{name}: {new_stats["errors"]} 个错误')
+        rows.append((name, '  '.join(cells)))
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='对比两次压测结果')
+    parser.add_argument('base', help='基线结果 JSON')
+    parser.add_argument('new', help='新结果 JSON')
+    parser.add_argument('--threshold', type=float, default=10.0, help='允许的退化百分比')
+    args = parser.parse_args(argv)
+
+    base, new = load(args.base), load(args.new)
+    for key in COMPARABLE_META:
+        if base['meta'].get(key) != new['meta'].get(key):
+            print(f'注意: 两次压测的 {key} 不同（{base["meta"].get(key)} / {new["meta"].get(key)}）')
+    print(f'基线 {base["meta"].get("git_commit")}  →  新结果 {new["meta"].get("git_commit")}')
+
+    rows, regressions = compare(base, new, args.threshold)
+    width = max((len(name) for name, _ in rows), default=0) + 2
+    for name, line in rows:
+        print(f'{name:<{width}}{line}')
+
+    if regressions:
+        print(f'\n超过 {args.threshold:g}% 的退化:')
+        for item in regressions:
+            print('  ' + item)
+        return 1
+    print('\n没有超过阈值的退化')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,240 @@
+"""按 app/sql/seed_data.sql 的数据模型批量生成压测数据
+
+用法：
+    python -m benchmarks.datagen --scale small
+    python -m benchmarks.datagen --restaurants 100000 --reviews 10000000 --seed 7
+
+连接参数与应用相同（MYSQL_HOST、MYSQL_USER、MYSQL_PASSWORD、MYSQL_DB，可写在 .env 中）。
+数据库需要先按 schema.sql（或 flask migrate）建好表。--truncate 会清空业务表后重新生成。
+
+同一组参数和 --seed 生成的数据完全相同，压测结果之间才可比较（重复生成时加 --truncate）。
+评分、评论数等聚合列由触发器在插入时维护，生成千万级评论需要较长时间。
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+
+# 预设规模：各表的行数
+SCALES = {
+    'small': {'users': 1000, 'merchants': 50, 'restaurants': 1000, 'dishes_per_restaurant': 8,
+              'reviews': 20000, 'favourites': 5000, 'recommendations': 10000},
+    'medium': {'users': 20000, 'merchants': 500, 'restaurants': 10000, 'dishes_per_restaurant': 10,
+               'reviews': 500000, 'favourites': 100000, 'recommendations': 200000},
+    'large': {'users': 500000, 'merchants': 5000, 'restaurants': 100000, 'dishes_per_restaurant': 12,
+              'reviews': 10000000, 'favourites': 2000000, 'recommendations': 4000000},
+}
+
+BATCH_SIZE = 2000
+
+# 压测账号的密码（User.check_password 按明文比较）
+BENCH_PASSWORD = 'bench123'
+ADMIN_USERNAME = 'bench_admin'
+
+# 评论时间在此之前一年内均匀分布（不用 NOW()，保证重复生成的数据相同）
+REVIEW_EPOCH = datetime.datetime(2025, 1, 1)
+
+CITIES = [
+    ('北京市', '北京市', ['海淀区', '朝阳区', '东城区', '西城区']),
+    ('上海市', '上海市', ['浦东新区', '徐汇区', '静安区', '黄浦区']),
+    ('广东省', '广州市', ['越秀区', '天河区', '海珠区']),
+    ('广东省', '深圳市', ['南山区', '福田区', '罗湖区']),
+    ('四川省', '成都市', ['锦江区', '武侯区', '青羊区']),
+    ('浙江省', '杭州市', ['西湖区', '上城区', '滨江区']),
+    ('天津市', '天津市', ['和平区', '河西区']),
+]
+TYPES = ['川菜', '江浙菜', '面食', '粤菜', '京菜', '湘菜', '西餐', '日料', '火锅', '烧烤']
+NAME_PARTS = (['川香', '江南', '北方', '海鲜', '老北京', '湘味', '蜀香', '岭南', '金陵', '巴蜀'],
+              ['园', '味道', '面馆', '世家', '食府', '小馆', '酒家', '厨房', '楼', '坊'])
+DISH_NAMES = ['麻婆豆腐', '鱼香肉丝', '水煮牛肉', '西湖醋鱼', '东坡肉', '龙井虾仁', '炸酱面', '刀削面',
+              '白切鸡', '烧鹅', '北京烤鸭', '剁椒鱼头', '宫保鸡丁', '回锅肉', '小笼包', '担担面']
+COMMENTS = ['味道很好，下次还来', '服务一般，菜品不错', '性价比高', '环境很好，适合聚餐',
+            '等位时间有点长', '招牌菜名不虚传', '分量足，价格实惠', '口味偏重', '上菜速度快']
+
+
+def connect():
+    # 在这里导入：runner、compare 也引用本模块的常量，对比结果时不需要数据库驱动
+    import MySQLdb
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    return MySQLdb.connect(
+        host=os.environ.get('MYSQL_HOST', 'localhost'),
+        user=os.environ.get('MYSQL_USER', 'root'),
+        passwd=os.environ.get('MYSQL_PASSWORD', ''),
+        db=os.environ.get('MYSQL_DB', 'restaurant_db'),
+        port=int(os.environ.get('MYSQL_PORT', 3306)),
+        charset='utf8mb4',
+    )
+
+
+def _insert(conn, sql, rows, label):
+    """分批插入（MySQLdb 的 executemany 会把 INSERT 合并为多行 VALUES）"""
+    cur = conn.cursor()
+    total = 0
+    started = time.monotonic()
+    batch = []
+    try:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= BATCH_SIZE:
+                cur.executemany(sql, batch)
+                conn.commit()
+                total += len(batch)
+                batch = []
+                if total % (BATCH_SIZE * 50) == 0:
+                    print(f'  {label}: {total} 行，{time.monotonic() - started:.0f}s', flush=True)
+        if batch:
+            cur.executemany(sql, batch)
+            conn.commit()
+            total += len(batch)
+    finally:
+        cur.close()
+    print(f'{label}: {total} 行，用时 {time.monotonic() - started:.1f}s', flush=True)
+    return total
+
+
+def _max_id(conn, table, column):
+    cur = conn.cursor()
+    try:
+        cur.execute(f'SELECT COALESCE(MAX({column}), 0) FROM {table}')
+        return cur.fetchone()[0]
+    finally:
+        cur.close()
+
+
+def _new_ids(conn, table, column, after, where=''):
+    """插入后取回新行的主键（自增值可能不连续，不能按数量推算）"""
+    cur = conn.cursor()
+    try:
+        cur.execute(f'SELECT {column} FROM {table} WHERE {column} > %s {where} ORDER BY {column}', (after,))
+        return [row[0] for row in cur.fetchall()]
+    finally:
+        cur.close()
+
+
+def truncate(conn):
+    cur = conn.cursor()
+    try:
+        cur.execute('SET FOREIGN_KEY_CHECKS = 0')
+        for table in ('Recommendations', 'Favourites', 'Replies', 'Reviews', 'Dishes',
+                      'MerchantRestaurant', 'Restaurants', 'Users'):
+            cur.execute(f'TRUNCATE TABLE {table}')
+        cur.execute('SET FOREIGN_KEY_CHECKS = 1')
+        conn.commit()
+    finally:
+        cur.close()
+
+
+def generate(conn, sizes, seed):
+    rng = random.Random(seed)
+
+    # 用户：压测管理员 + 商家 + 普通用户，用户名带序号，压测脚本按序号登录
+    user_base = _max_id(conn, 'Users', 'user_id')
+
+    def users():
+        yield (ADMIN_USERNAME, BENCH_PASSWORD, 'bench_admin@example.com', '13700000000', 'admin')
+        for i in range(sizes['merchants']):
+            yield (f'bench_merchant{i}', BENCH_PASSWORD, f'bench_merchant{i}@example.com',
+                   f'137{i:08d}', 'merchant')
+        for i in range(sizes['users']):
+            yield (f'bench_user{i}', BENCH_PASSWORD, f'bench_user{i}@example.com', f'139{i:08d}', 'user')
+
+    _insert(conn, """
+        INSERT INTO Users (username, password, email, phone, user_type) VALUES (%s, %s, %s, %s, %s)
+    """, users(), 'Users')
+    merchant_ids = _new_ids(conn, 'Users', 'user_id', user_base, "AND user_type = 'merchant'")
+    user_ids = _new_ids(conn, 'Users', 'user_id', user_base, "AND user_type = 'user'")
+
+    rest_base = _max_id(conn, 'Restaurants', 'rest_id')
+
+    def restaurants():
+        for i in range(sizes['restaurants']):
+            province, city, districts = rng.choice(CITIES)
+            district = rng.choice(districts)
+            name = rng.choice(NAME_PARTS[0]) + rng.choice(NAME_PARTS[1]) + str(i)
+            address = f'{province if province != city else ""}{city}{district}示例路{rng.randint(1, 999)}号'
+            yield (name, address, province, city, district, f'010-{rng.randint(10000000, 99999999)}',
+                   '10:00-22:00', '/static/images/2.jpg', rng.choice(TYPES))
+
+    _insert(conn, """
+        INSERT INTO Restaurants (name, address, province, city, district, phone, opening_hours, img_url, type)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """, restaurants(), 'Restaurants')
+    rest_ids = _new_ids(conn, 'Restaurants', 'rest_id', rest_base)
+
+    _insert(conn, """
+        INSERT INTO MerchantRestaurant (merchant_id, restaurant_id) VALUES (%s, %s)
+    """, ((merchant_ids[i % len(merchant_ids)], rest_id) for i, rest_id in enumerate(rest_ids)),
+        'MerchantRestaurant')
+
+    dish_base = _max_id(conn, 'Dishes', 'dish_id')
+    per_restaurant = sizes['dishes_per_restaurant']
+
+    def dishes():
+        for rest_id in rest_ids:
+            for name in rng.sample(DISH_NAMES, min(per_restaurant, len(DISH_NAMES))):
+                yield (name, rng.randint(1500, 20000) / 100, f'{name}，招牌菜', rest_id, '/static/images/1.jpg')
+
+    _insert(conn, """
+        INSERT INTO Dishes (name, price, description, rest_id, img_url) VALUES (%s, %s, %s, %s, %s)
+    """, dishes(), 'Dishes')
+    dish_ids = _new_ids(conn, 'Dishes', 'dish_id', dish_base)
+
+    # 评论按幂律分布集中在少数热门餐厅，更接近真实的访问热点
+    def skewed(ids):
+        return ids[min(int(rng.paretovariate(1.2)) - 1, len(ids) - 1) if rng.random() < 0.5
+                   else rng.randrange(len(ids))]
+
+    def reviews():
+        for _ in range(sizes['reviews']):
+            review_time = REVIEW_EPOCH - datetime.timedelta(seconds=rng.randrange(365 * 86400))
+            yield (rng.choice(user_ids), skewed(rest_ids), rng.randint(1, 10), rng.choice(COMMENTS),
+                   review_time)
+
+    # VALUES 中只能有占位符，executemany 才会合并成多行 INSERT
+    _insert(conn, """
+        INSERT INTO Reviews (user_id, rest_id, rating, comment, review_time) VALUES (%s, %s, %s, %s, %s)
+    """, reviews(), 'Reviews')
+
+    # 收藏和推荐有唯一约束，用 INSERT IGNORE 去掉随机产生的重复
+    _insert(conn, """
+        INSERT IGNORE INTO Favourites (user_id, rest_id) VALUES (%s, %s)
+    """, ((rng.choice(user_ids), skewed(rest_ids)) for _ in range(sizes['favourites'])), 'Favourites')
+    _insert(conn, """
+        INSERT IGNORE INTO Recommendations (user_id, dish_id) VALUES (%s, %s)
+    """, ((rng.choice(user_ids), skewed(dish_ids)) for _ in range(sizes['recommendations'])),
+        'Recommendations')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='生成压测数据')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small', help='预设规模')
+    for name in SCALES['small']:
+        parser.add_argument('--' + name.replace('_', '-'), type=int, dest=name, help='覆盖预设的行数')
+    parser.add_argument('--seed', type=int, default=42, help='随机数种子')
+    parser.add_argument('--truncate', action='store_true', help='先清空业务表')
+    args = parser.parse_args(argv)
+
+    sizes = dict(SCALES[args.scale])
+    for name in sizes:
+        if getattr(args, name) is not None:
+            sizes[name] = getattr(args, name)
+    print('规模:', ', '.join(f'{k}={v}' for k, v in sizes.items()), flush=True)
+
+    conn = connect()
+    try:
+        if args.truncate:
+            truncate(conn)
+        generate(conn, sizes, args.seed)
+    finally:
+        conn.close()
+    print('完成。执行 flask --app run.py reconcile-aggregates --dry-run 可检查聚合列是否一致')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,306 @@
+"""压测执行：对运行中的应用按场景施压，输出 p50/p95/p99 延迟和吞吐量，结果保存为 JSON
+
+用法：
+    python -m benchmarks.runner --base-url http://127.0.0.1:5000
+    python -m benchmarks.runner --scenarios index,detail --concurrency 32 --duration 60
+    python -m benchmarks.runner --mix --duration 120
+
+默认依次单独压测每个场景（每个场景 --warmup 秒预热 + --duration 秒计时）；--mix 按权重混合所有选中的场景。
+每个工作线程是一个独立的虚拟用户（自己的长连接和会话），需要登录的场景使用 datagen 生成的账号。
+场景中用到的餐厅、菜品 ID 从数据库抽样（连接参数同 datagen），随机数按 --seed 固定，结果可重复比较。
+
+结果默认写入 benchmarks/results/<时间>-<提交>.json，用 python -m benchmarks.compare 对比两次结果。
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks.client import Client
+from benchmarks.datagen import connect
+from benchmarks.scenarios import BY_NAME, SCENARIOS, credentials
+
+RESULT_FORMAT = 1
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+ID_SAMPLE_SIZE = 20000
+ADMIN_EVERY = 8
+DATASET_TABLES = ('Users', 'Restaurants', 'Dishes', 'Reviews', 'Favourites', 'Recommendations')
+
+
+class Dataset:
+    """场景使用的 ID 池和数据规模"""
+
+    def __init__(self, rest_ids, dish_ids, counts):
+        self.rest_ids = rest_ids
+        self.dish_ids = dish_ids
+        self.counts = counts
+
+    def rest_id(self, rng):
+        return rng.choice(self.rest_ids)
+
+    def dish_id(self, rng):
+        return rng.choice(self.dish_ids)
+
+
+def _sample_ids(cur, table, column, count):
+    # 按主键取模均匀抽样，不依赖 ORDER BY RAND()（大表上很慢），每次抽到的 ID 相同
+    step = max(1, count // ID_SAMPLE_SIZE)
+    cur.execute(f'SELECT {column} FROM {table} WHERE MOD({column}, %s) = 0 ORDER BY {column}', (step,))
+    return [row[0] for row in cur.fetchall()]
+
+
+def load_dataset():
+    conn = connect()
+    try:
+        cur = conn.cursor()
+        counts = {}
+        for table in DATASET_TABLES:
+            cur.execute(f'SELECT COUNT(*) FROM {table}')
+            counts[table] = cur.fetchone()[0]
+        rest_ids = _sample_ids(cur, 'Restaurants', 'rest_id', counts['Restaurants'])
+        dish_ids = _sample_ids(cur, 'Dishes', 'dish_id', counts['Dishes'])
+        cur.close()
+    finally:
+        conn.close()
+    if not rest_ids or not dish_ids:
+        raise SystemExit('数据库中没有餐厅或菜品，先执行 python -m benchmarks.datagen')
+    return Dataset(rest_ids, dish_ids, counts)
+
+
+def percentile(sorted_values, pct):
+    """最近秩法百分位数"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Recorder:
+    """收集一个场景的样本（每个工作线程各自追加，结束后合并，不加锁）"""
+
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+        self.errors = 0
+        self.db_ms = []
+        self.db_queries = []
+
+    def record(self, response, expect):
+        self.latencies.append(response.elapsed * 1000)
+        key = str(response.status)
+        self.statuses[key] = self.statuses.get(key, 0) + 1
+        if response.status not in expect:
+            self.errors += 1
+        timing = response.server_timing().get('db')
+        if timing:
+            self.db_ms.append(timing.get('dur', 0.0))
+            desc = timing.get('desc', '')
+            if desc.split(' ', 1)[0].isdigit():
+                self.db_queries.append(int(desc.split(' ', 1)[0]))
+
+    def record_failure(self):
+        self.errors += 1
+        self.statuses['error'] = self.statuses.get('error', 0) + 1
+
+    def merge(self, other):
+        self.latencies.extend(other.latencies)
+        for key, count in other.statuses.items():
+            self.statuses[key] = self.statuses.get(key, 0) + count
+        self.errors += other.errors
+        self.db_ms.extend(other.db_ms)
+        self.db_queries.extend(other.db_queries)
+
+    def summary(self, duration):
+        latencies = sorted(self.latencies)
+        requests = len(latencies) + self.statuses.get('error', 0)
+        mean = sum(latencies) / len(latencies) if latencies else 0.0
+        return {
+            'requests': requests,
+            'errors': self.errors,
+            'error_rate': round(self.errors / requests, 4) if requests else 0.0,
+            'throughput_rps': round(len(latencies) / duration, 2) if duration else 0.0,
+            'latency_ms': {
+                'p50': round(percentile(latencies, 50), 2),
+                'p95': round(percentile(latencies, 95), 2),
+                'p99': round(percentile(latencies, 99), 2),
+                'mean': round(mean, 2),
+                'max': round(latencies[-1], 2) if latencies else 0.0,
+            },
+            'status': dict(sorted(self.statuses.items())),
+            'db_ms_mean': round(sum(self.db_ms) / len(self.db_ms), 2) if self.db_ms else None,
+            'db_queries_mean': (round(sum(self.db_queries) / len(self.db_queries), 2)
+                                if self.db_queries else None),
+        }
+
+
+def _worker_role(index, scenarios):
+    """虚拟用户的角色：混合模式下同时有普通用户和管理员场景时，每 ADMIN_EVERY 个虚拟用户中有一个管理员"""
+    roles = {scenario.role for scenario in scenarios} - {'anonymous'}
+    if roles == {'user', 'admin'}:
+        return 'admin' if index % ADMIN_EVERY == 0 else 'user'
+    return roles.pop() if roles else 'anonymous'
+
+
+def _worker(index, args, dataset, scenarios, deadline_box, recorders, ready, start):
+    rng = random.Random(args.seed * 1000 + index)
+    client = Client(args.base_url, timeout=args.timeout)
+    recorder = {scenario.name: Recorder() for scenario in scenarios}
+    recorders.append(recorder)
+
+    role = _worker_role(index, scenarios)
+    scenarios = [scenario for scenario in scenarios if scenario.role in ('anonymous', role)]
+    weights = [scenario.weight for scenario in scenarios]
+    try:
+        if role != 'anonymous':
+            client.login(*credentials(role, index))
+    except Exception as e:
+        print(f'工作线程 {index} 登录失败: {e}', file=sys.stderr)
+        ready.release()
+        return
+    ready.release()
+    start.wait()
+
+    while True:
+        now = time.monotonic()
+        if now >= deadline_box[1]:
+            break
+        scenario = rng.choices(scenarios, weights)[0] if len(scenarios) > 1 else scenarios[0]
+        try:
+            response = scenario.run(client, dataset, rng)
+        except Exception:
+            if now >= deadline_box[0]:
+                recorder[scenario.name].record_failure()
+            continue
+        if response.status == 400 and scenario.role != 'anonymous':
+            client.refresh_csrf()  # CSRF 令牌过期
+        # 预热阶段的请求不计入结果
+        if now >= deadline_box[0]:
+            recorder[scenario.name].record(response, scenario.expect)
+    client.close()
+
+
+def run(args, dataset, scenarios):
+    """用 args.concurrency 个虚拟用户压测给定的场景，返回 {场景名: 统计}"""
+    recorders = []
+    ready = threading.Semaphore(0)
+    start = threading.Event()
+    deadline_box = [0.0, float('inf')]  # [开始计时的时间, 结束时间]
+    threads = [threading.Thread(target=_worker, daemon=True,
+                                args=(i, args, dataset, scenarios, deadline_box,
+                                      recorders, ready, start))
+               for i in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for _ in threads:
+        ready.acquire()  # 等所有虚拟用户登录完成
+
+    now = time.monotonic()
+    deadline_box[0] = now + args.warmup
+    deadline_box[1] = now + args.warmup + args.duration
+    start.set()
+    for thread in threads:
+        thread.join()
+
+    results = {}
+    for scenario in scenarios:
+        merged = Recorder()
+        for recorder in recorders:
+            merged.merge(recorder[scenario.name])
+        results[scenario.name] = merged.summary(args.duration)
+    return results
+
+
+def _git(*cmd):
+    try:
+        return subprocess.run(['git', *cmd], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(__file__)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_table(results):
+    print(f"{'场景':<20}{'请求数':>8}{'错误':>6}{'吞吐(rps)':>11}{'p50(ms)':>10}{'p95(ms)':>10}"
+          f"{'p99(ms)':>10}{'DB(ms)':>8}")
+    for name, stats in results.items():
+        latency = stats['latency_ms']
+        db_ms = '-' if stats['db_ms_mean'] is None else f"{stats['db_ms_mean']:.1f}"
+        print(f"{name:<20}{stats['requests']:>8}{stats['errors']:>6}{stats['throughput_rps']:>11.1f}"
+              f"{latency['p50']:>10.1f}{latency['p95']:>10.1f}{latency['p99']:>10.1f}{db_ms:>8}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='压测应用的公开页面')
+    parser.add_argument('--base-url', default='http://127.0.0.1:5000')
+    parser.add_argument('--scenarios', default='all',
+                        help='逗号分隔的场景名，可选: ' + ','.join(BY_NAME))
+    parser.add_argument('--mix', action='store_true', help='按权重混合压测选中的场景')
+    parser.add_argument('--concurrency', type=int, default=8, help='虚拟用户数')
+    parser.add_argument('--duration', type=float, default=30, help='每轮计时的秒数')
+    parser.add_argument('--warmup', type=float, default=5, help='每轮预热的秒数（不计入结果）')
+    parser.add_argument('--timeout', type=float, default=30, help='单个请求的超时秒数')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--label', default='', help='写入结果的备注，例如配置说明')
+    parser.add_argument('--output', help='结果文件路径（默认写入 benchmarks/results/）')
+    args = parser.parse_args(argv)
+
+    if args.scenarios == 'all':
+        scenarios = list(SCENARIOS)
+    else:
+        unknown = [name for name in args.scenarios.split(',') if name not in BY_NAME]
+        if unknown:
+            parser.error('未知场景: ' + ', '.join(unknown))
+        scenarios = [BY_NAME[name] for name in args.scenarios.split(',')]
+
+    dataset = load_dataset()
+    print('数据规模:', ', '.join(f'{k}={v}' for k, v in dataset.counts.items()), flush=True)
+
+    started_at = time.strftime('%Y-%m-%dT%H:%M:%S%z')
+    if args.mix:
+        print(f'混合压测 {len(scenarios)} 个场景 ...', flush=True)
+        results = run(args, dataset, scenarios)
+    else:
+        results = {}
+        for scenario in scenarios:
+            print(f'压测 {scenario.name} ...', flush=True)
+            results.update(run(args, dataset, [scenario]))
+
+    commit = _git('rev-parse', '--short', 'HEAD')
+    report = {
+        'format': RESULT_FORMAT,
+        'meta': {
+            'started_at': started_at,
+            'label': args.label,
+            'git_commit': commit,
+            'git_dirty': bool(_git('status', '--porcelain', '--untracked-files=no')),
+            'base_url': args.base_url,
+            'mode': 'mix' if args.mix else 'isolated',
+            'concurrency': args.concurrency,
+            'duration': args.duration,
+            'warmup': args.warmup,
+            'seed': args.seed,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'dataset': dataset.counts,
+        },
+        'scenarios': results,
+    }
+
+    _print_table(results)
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{commit or 'unknown'}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
+    print(f'结果已写入 {output}')
+    return 1 if any(stats['errors'] for stats in results.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""压测场景：每个场景是一次（或一组）请求，按角色分配登录的虚拟用户
+
+场景函数接收 (client, ctx, rng)，返回 Response；ctx 提供数据集中的 ID 池。
+expect 为视为成功的状态码，其余状态码计为错误。
+"""
+from urllib.parse import urlencode
+
+from benchmarks.datagen import ADMIN_USERNAME, BENCH_PASSWORD, COMMENTS, NAME_PARTS, TYPES
+
+SEARCH_TERMS = NAME_PARTS[0] + ['麻婆豆腐', '烤鸭', '面']
+CITIES = ['北京市', '上海市', '广州市', '深圳市', '成都市', '杭州市', '天津市']
+SORTS = ['rating', 'name', 'reviews']
+
+
+class Scenario:
+    def __init__(self, name, run, role='anonymous', weight=1, expect=(200,)):
+        self.name = name
+        self.run = run
+        self.role = role      # anonymous、user 或 admin
+        self.weight = weight  # 混合模式中的相对比例
+        self.expect = expect
+
+
+def _index(client, ctx, rng):
+    return client.get('/')
+
+
+def _search(client, ctx, rng):
+    return client.get('/search?' + urlencode({'q': rng.choice(SEARCH_TERMS)}))
+
+
+def _list(client, ctx, rng):
+    return client.get('/restaurant/list?' + urlencode({'category_name': rng.choice(TYPES),
+                                                       'sort': rng.choice(SORTS)}))
+
+
+def _city(client, ctx, rng):
+    return client.get('/city_restaurants?' + urlencode({'city': rng.choice(CITIES)}))
+
+
+def _detail(client, ctx, rng):
+    return client.get(f'/restaurant/detail/{ctx.rest_id(rng)}')
+
+
+def _user_state(client, ctx, rng):
+    ids = ','.join(str(ctx.rest_id(rng)) for _ in range(10))
+    return client.get(f'/api/user_state?rest_ids={ids}')
+
+
+def _toggle_favorite(client, ctx, rng):
+    return client.post('/restaurant/toggle_favorite', json_body={'rest_id': ctx.rest_id(rng)},
+                       headers={'X-CSRFToken': client.csrf_token})
+
+
+def _toggle_recommend(client, ctx, rng):
+    return client.post('/review/recommend_dish', json_body={'dish_id': ctx.dish_id(rng)},
+                       headers={'X-CSRFToken': client.csrf_token})
+
+
+def _post_review(client, ctx, rng):
+    return client.post(f'/review/post/{ctx.rest_id(rng)}', form={
+        'rating': rng.randint(1, 10),
+        'comment': rng.choice(COMMENTS),
+        'csrf_token': client.csrf_token,
+    })
+
+
+def _admin_page(path):
+    def run(client, ctx, rng):
+        return client.get(path)
+    return run
+
+
+SCENARIOS = [
+    Scenario('index', _index, weight=20),
+    Scenario('search', _search, weight=10),
+    Scenario('list', _list, weight=15),
+    Scenario('city', _city, weight=5),
+    Scenario('detail', _detail, weight=30),
+    Scenario('user_state', _user_state, role='user', weight=20),
+    Scenario('favorite_toggle', _toggle_favorite, role='user', weight=3),
+    Scenario('recommend_toggle', _toggle_recommend, role='user', weight=3),
+    Scenario('review_post', _post_review, role='user', weight=1, expect=(302,)),
+    Scenario('admin_dashboard', _admin_page('/admin/dashboard'), role='admin', weight=1),
+    Scenario('admin_restaurants', _admin_page('/admin/restaurants'), role='admin', weight=1),
+    Scenario('admin_reviews', _admin_page('/admin/reviews'), role='admin', weight=1),
+    Scenario('admin_users', _admin_page('/admin/users'), role='admin', weight=1),
+]
+
+BY_NAME = {scenario.name: scenario for scenario in SCENARIOS}
+
+
+def credentials(role, worker):
+    """虚拟用户登录用的账号：每个工作线程使用不同的普通用户"""
+    if role == 'admin':
+        return ADMIN_USERNAME, BENCH_PASSWORD
+    if role == 'user':
+        return f'bench_user{worker}', BENCH_PASSWORD
+    return None
@@ -0,0 +1,35 @@
+"""需要 MySQL 的用例共用的夹具
+
+连接 TEST_MYSQL_DB 指定的数据库（已按 schema.sql 和 triggers.sql 建好表或执行过 flask migrate），
+未设置时跳过。
+"""
+import os
+
+import pytest
+
+
+@pytest.fixture
+def mysql_app():
+    """初始化了连接池的应用上下文，供直接使用 mysql.connection 的模块"""
+    if not os.environ.get('TEST_MYSQL_DB'):
+        pytest.skip('未设置 TEST_MYSQL_DB')
+    from flask import Flask
+
+    from app import mysql
+
+    app = Flask(__name__)
+    app.config.update(
+        MYSQL_HOST=os.environ.get('MYSQL_HOST', 'localhost'),
+        MYSQL_USER=os.environ.get('MYSQL_USER', 'root'),
+        MYSQL_PASSWORD=os.environ.get('MYSQL_PASSWORD', ''),
+        MYSQL_DB=os.environ['TEST_MYSQL_DB'],
+        MYSQL_CURSORCLASS='DictCursor',
+        MYSQL_POOL_MIN_SIZE=1,
+        MYSQL_POOL_MAX_SIZE=2,
+    )
+    mysql.init_app(app)
+    try:
+        with app.app_context():
+            yield app
+    finally:
+        mysql.pool.close_all()
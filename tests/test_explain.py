@@ -0,0 +1,14 @@
+"""各路由热点查询的执行计划：不允许出现全表扫描
+
+连接 TEST_MYSQL_DB 指定的数据库，未设置时跳过。数据量很小时优化器会倾向于全表扫描
+（只有预估扫描行数达到 min_rows 才算问题），应在 benchmarks.datagen 生成的数据上运行，
+例如 `python -m benchmarks.datagen --scale small --truncate`。
+"""
+import pytest
+
+explain = pytest.importorskip('app.explain')
+
+
+def test_route_queries_use_indexes(mysql_app):
+    failures = {name: problems for name, plan, problems in explain.check_plans() if problems}
+    assert failures == {}
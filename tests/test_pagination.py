@@ -0,0 +1,99 @@
+"""游标分页：评分相同（且不是有限小数）的餐厅翻页时既不跳过也不重复
+
+需要 MySQL 的用例连接 TEST_MYSQL_DB 指定的数据库（已按 schema.sql 和 triggers.sql 建好表），
+在一个事务中插入数据，结束时回滚；未设置时跳过。
+"""
+import decimal
+import os
+
+import pytest
+
+pagination = pytest.importorskip('app.pagination')
+from flask import Flask  # noqa: E402
+
+from app.routes.restaurants import LIST_SORT_ORDERS  # noqa: E402
+
+PAGE_SIZE = 2
+TIED_RESTAURANTS = 5
+RATINGS = (1, 1, 2)  # 平均 4/3，存为 1.3333
+
+
+@pytest.fixture
+def app_context():
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'test'
+    with app.app_context():
+        yield
+
+
+def test_cursor_keeps_decimal(app_context):
+    order_by = LIST_SORT_ORDERS['rating']
+    row = {'rating': decimal.Decimal('1.3333'), 'name': '川香园', 'rest_id': 7}
+    token = pagination.encode_cursor(row, order_by, 'next')
+    direction, values = pagination.decode_cursor(token, order_by)
+    assert direction == 'next'
+    assert values == [decimal.Decimal('1.3333'), '川香园', 7]
+    assert isinstance(values[0], decimal.Decimal)
+
+
+@pytest.fixture
+def tied_restaurants(app_context):
+    if not os.environ.get('TEST_MYSQL_DB'):
+        pytest.skip('未设置 TEST_MYSQL_DB')
+    import MySQLdb
+    import MySQLdb.cursors
+
+    conn = MySQLdb.connect(
+        host=os.environ.get('MYSQL_HOST', 'localhost'),
+        user=os.environ.get('MYSQL_USER', 'root'),
+        passwd=os.environ.get('MYSQL_PASSWORD', ''),
+        db=os.environ['TEST_MYSQL_DB'],
+        charset='utf8mb4',
+        cursorclass=MySQLdb.cursors.DictCursor,
+    )
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            INSERT INTO Users (username, password, email, phone, user_type)
+            VALUES ('page_test', 'x', 'page_test@example.com', '13000000000', 'user')
+        """)
+        user_id = cur.lastrowid
+        rest_ids = []
+        for i in range(TIED_RESTAURANTS):
+            cur.execute("INSERT INTO Restaurants (name, type) VALUES (%s, '测试')", (f'并列餐厅{i % 2}',))
+            rest_ids.append(cur.lastrowid)
+            for rating in RATINGS:
+                cur.execute("INSERT INTO Reviews (user_id, rest_id, rating, comment) VALUES (%s, %s, %s, '')",
+                            (user_id, rest_ids[-1], rating))
+        yield cur, rest_ids
+    finally:
+        conn.rollback()
+        cur.close()
+        conn.close()
+
+
+def _page(cur, rest_ids, cursor=None):
+    placeholders = ', '.join(['%s'] * len(rest_ids))
+    return pagination.paginate(cur, "SELECT r.* FROM Restaurants r", LIST_SORT_ORDERS['rating'],
+                               cursor=cursor, conditions=[f"r.rest_id IN ({placeholders})"],
+                               params=rest_ids, page_size=PAGE_SIZE)
+
+
+def test_tied_ratings_page_forwards_and_backwards(tied_restaurants):
+    cur, rest_ids = tied_restaurants
+    cur.execute("SELECT DISTINCT rating FROM Restaurants WHERE rest_id IN (%s, %s)", rest_ids[:2])
+    assert [row['rating'] for row in cur.fetchall()] == [decimal.Decimal('1.3333')]
+
+    pages = [_page(cur, rest_ids)]
+    while pages[-1].has_next:
+        pages.append(_page(cur, rest_ids, pages[-1].next_cursor))
+    forwards = [row['rest_id'] for page in pages for row in page.items]
+    assert sorted(forwards) == sorted(rest_ids)
+    assert len(pages) == -(-TIED_RESTAURANTS // PAGE_SIZE)
+
+    backwards = list(pages[-1].items)
+    page = pages[-1]
+    while page.has_prev:
+        page = _page(cur, rest_ids, page.prev_cursor)
+        backwards = list(page.items) + backwards
+    assert [row['rest_id'] for row in backwards] == forwards
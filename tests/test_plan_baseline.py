@@ -0,0 +1,94 @@
+"""执行计划回归：各语句的 EXPLAIN FORMAT=JSON 与 benchmarks/plan_baseline.json 中的基线比较
+
+需要 MySQL 的用例连接 TEST_MYSQL_DB 指定的数据库（已建好表），未设置时跳过。
+库中没有餐厅时先用 benchmarks.datagen 按 DATASET_SCALE、DATASET_SEED 生成数据，与基线生成时相同；
+已有数据且规模与基线相差超过一倍时跳过。SQL_CAPTURE_FILE 指向压测时记录的语句时一并检查。
+
+基线的生成方法（空库）：
+    MYSQL_DB=<库名> python -m benchmarks.datagen --scale small --seed 42
+    MYSQL_DB=<库名> flask --app run.py plan-check --update
+"""
+import os
+
+import pytest
+
+explain = pytest.importorskip('app.explain')
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             'benchmarks', 'plan_baseline.json')
+DATASET_SCALE = 'small'
+DATASET_SEED = 42
+
+
+@pytest.fixture(scope='session')
+def plan_dataset():
+    """空的 TEST_MYSQL_DB 中生成与基线相同的数据（整个测试会话只生成一次，生成后保留）"""
+    if not os.environ.get('TEST_MYSQL_DB'):
+        pytest.skip('未设置 TEST_MYSQL_DB')
+    import MySQLdb
+
+    from benchmarks import datagen
+
+    conn = MySQLdb.connect(
+        host=os.environ.get('MYSQL_HOST', 'localhost'),
+        user=os.environ.get('MYSQL_USER', 'root'),
+        passwd=os.environ.get('MYSQL_PASSWORD', ''),
+        db=os.environ['TEST_MYSQL_DB'],
+        port=int(os.environ.get('MYSQL_PORT', 3306)),
+        charset='utf8mb4',
+    )
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM Restaurants")
+        empty = cur.fetchone()[0] == 0
+        cur.close()
+        if empty:
+            datagen.generate(conn, dict(datagen.SCALES[DATASET_SCALE]), DATASET_SEED)
+            # 生成后更新统计信息，information_schema 中的行数和优化器的估计与基线生成时一致
+            cur = conn.cursor()
+            for table in explain.BASELINE_TABLES:
+                cur.execute(f"ANALYZE TABLE {table}")
+                cur.fetchall()
+            cur.close()
+    finally:
+        conn.close()
+
+
+def _plan(*tables):
+    return {'format': explain.BASELINE_FORMAT, 'dataset': {}, 'plans': {
+        '查询': {'id': 'q', 'tables': [
+            {'table': table, 'access_type': access_type, 'key': key, 'rows': rows}
+            for table, access_type, key, rows in tables
+        ]},
+    }}
+
+
+def test_compare_plans_reports_regressions():
+    baseline = _plan(('r', 'ref', 'idx_city', 50), ('d', 'ref', 'idx_rest', 10))
+    assert explain.compare_plans(baseline, baseline) == {}
+
+    current = _plan(('r', 'ALL', None, 100000), ('d', 'ref', 'idx_rest', 10))
+    assert explain.compare_plans(baseline, current) == {'查询': ['r: 访问方式 ref -> ALL', 'r: 预估扫描 50 -> 100000 行']}
+
+    # 行数翻倍但低于 min_rows 的波动不算退化
+    current = _plan(('r', 'ref', 'idx_city', 90), ('d', 'ref', 'idx_rest', 10))
+    assert explain.compare_plans(baseline, current) == {}
+
+
+def test_plans_match_baseline(plan_dataset, mysql_app):
+    assert os.path.exists(BASELINE_PATH), \
+        f'没有基线文件 {BASELINE_PATH}，按本模块说明在 datagen --scale {DATASET_SCALE} --seed {DATASET_SEED} 的数据上生成并提交'
+    baseline = explain.load_baseline(BASELINE_PATH)
+
+    captured = os.environ.get('SQL_CAPTURE_FILE')
+    if captured and not os.path.exists(captured):
+        captured = None
+    current, errors = explain.capture_plans(explain.plan_statements(captured))
+
+    for table, count in current['dataset'].items():
+        base_count = baseline['dataset'].get(table, 0)
+        if base_count and not base_count / 2 <= count <= base_count * 2:
+            pytest.skip(f'{table} 约 {count} 行，基线生成时约 {base_count} 行，数据规模不同时比较没有意义')
+
+    assert [name for name in errors if name in baseline['plans']] == []
+    assert explain.compare_plans(baseline, current) == {}